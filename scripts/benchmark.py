@@ -0,0 +1,425 @@
+"""
+Load generator and latency benchmark for a RAFT cluster
+
+Starts an N-node cluster (like start_cluster.py), drives a closed- or
+open-loop workload against it and writes a JSON report with throughput,
+latency percentiles and per-node CPU / RSS, so runs can be compared
+across commits.
+
+Example:
+    python scripts/benchmark.py --nodes 5 --duration 20 --concurrency 16 --read-ratio 0.5
+    python scripts/benchmark.py --client smart --concurrency 64 --read-ratio 0
+"""
+import argparse
+import bisect
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import grpc
+
+# Add proto and src directories to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'proto'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import raft_pb2
+import raft_pb2_grpc
+from smart_client import SmartClient, ClientError
+from admission import retry_after
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+# ==================== Cluster ====================
+
+class BenchCluster:
+    """N local nodes started as subprocesses in a scratch directory"""
+    
+    def __init__(self, num_nodes, base_port, node_args, data_dir=None):
+        self.nodes = {f"node{i}": f"localhost:{base_port + i - 1}" for i in range(1, num_nodes + 1)}
+        self.node_args = node_args
+        self.data_dir = data_dir or tempfile.mkdtemp(prefix="raft_bench_")
+        self.processes = {}
+        self.stubs = {node_id: raft_pb2_grpc.RaftServiceStub(grpc.insecure_channel(addr))
+                      for node_id, addr in self.nodes.items()}
+    
+    def start(self):
+        """Start every node"""
+        for node_id, addr in self.nodes.items():
+            peers = ",".join(f"{nid}={a}" for nid, a in self.nodes.items() if nid != node_id)
+            cmd = [
+                sys.executable,
+                os.path.join(os.path.dirname(__file__), "run_node.py"),
+                "--node-id", node_id,
+                "--port", addr.split(":")[1],
+                "--peers", peers,
+            ] + self.node_args
+            log_file = open(os.path.join(self.data_dir, f"{node_id}.log"), "w")
+            self.processes[node_id] = subprocess.Popen(cmd, cwd=self.data_dir, stdout=log_file,
+                                                       stderr=subprocess.STDOUT)
+    
+    def wait_for_leader(self, timeout=15.0):
+        """Wait until a leader has committed an entry, returning its node id"""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            for node_id, stub in self.stubs.items():
+                try:
+                    response = stub.SubmitCommand(raft_pb2.ClientRequest(command="SET __bench__ ready"),
+                                                  timeout=2.0)
+                    if response.success:
+                        return node_id
+                except grpc.RpcError:
+                    pass
+            time.sleep(0.2)
+        raise RuntimeError("No leader elected within timeout")
+    
+    def stop(self):
+        """Stop every node"""
+        for proc in self.processes.values():
+            proc.terminate()
+        for proc in self.processes.values():
+            try:
+                proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+
+class ResourceSampler:
+    """CPU time and RSS of the node processes"""
+    
+    def __init__(self, processes):
+        self.processes = processes
+        self.cpu_start = {}
+        self.peak_rss = {node_id: 0 for node_id in processes}
+    
+    @staticmethod
+    def _read(pid):
+        """Get (cpu_seconds, rss_bytes) of a process"""
+        if psutil is not None:
+            proc = psutil.Process(pid)
+            times = proc.cpu_times()
+            return times.user + times.system, proc.memory_info().rss
+        
+        # Linux /proc fallback
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        ticks = os.sysconf("SC_CLK_TCK")
+        cpu = (int(fields[11]) + int(fields[12])) / ticks
+        with open(f"/proc/{pid}/statm") as f:
+            rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        return cpu, rss
+    
+    def sample(self):
+        """Record current RSS, and CPU time the first time"""
+        for node_id, proc in self.processes.items():
+            try:
+                cpu, rss = self._read(proc.pid)
+            except (OSError, ValueError):
+                continue
+            self.cpu_start.setdefault(node_id, cpu)
+            self.peak_rss[node_id] = max(self.peak_rss[node_id], rss)
+    
+    def report(self, elapsed):
+        """CPU seconds, CPU % and peak RSS per node since the first sample"""
+        result = {}
+        for node_id, proc in self.processes.items():
+            try:
+                cpu, rss = self._read(proc.pid)
+            except (OSError, ValueError):
+                result[node_id] = None
+                continue
+            cpu_used = cpu - self.cpu_start.get(node_id, cpu)
+            result[node_id] = {
+                "cpu_seconds": round(cpu_used, 3),
+                "cpu_percent": round(100.0 * cpu_used / elapsed, 1) if elapsed else 0.0,
+                "rss_bytes": max(self.peak_rss[node_id], rss),
+            }
+        return result
+
+
+# ==================== Workload ====================
+
+class KeyChooser:
+    """Uniform or zipfian choice over a fixed key space"""
+    
+    def __init__(self, num_keys, distribution, zipf_s, rng):
+        self.keys = [f"key{i}" for i in range(num_keys)]
+        self.rng = rng
+        self.cdf = None
+        if distribution == "zipfian":
+            weights = [1.0 / (rank ** zipf_s) for rank in range(1, num_keys + 1)]
+            total = sum(weights)
+            running = 0.0
+            self.cdf = []
+            for weight in weights:
+                running += weight / total
+                self.cdf.append(running)
+    
+    def next(self):
+        """Get the next key"""
+        if self.cdf is None:
+            return self.rng.choice(self.keys)
+        index = bisect.bisect_left(self.cdf, self.rng.random())
+        return self.keys[min(index, len(self.keys) - 1)]
+
+
+class Recorder:
+    """Thread-safe latency and error collection"""
+    
+    def __init__(self):
+        self.latencies = {"read": [], "write": []}
+        self.errors = {"read": 0, "write": 0}
+        self.lock = threading.Lock()
+        self.recording = False
+    
+    def record(self, op, latency, ok):
+        """Record one operation (ignored outside the measured window)"""
+        if not self.recording:
+            return
+        with self.lock:
+            if ok:
+                self.latencies[op].append(latency)
+            else:
+                self.errors[op] += 1
+
+
+class Driver:
+    """
+    Issues operations against the cluster, following leader redirects
+    
+    With --client basic every command is its own SubmitCommand call; with
+    --client smart commands go through a shared SmartClient, which pipelines
+    and batches concurrent commands.
+    """
+    
+    def __init__(self, cluster, args):
+        self.cluster = cluster
+        self.args = args
+        self.leader = None
+        self.value = "v" * args.value_size
+        self.smart = None
+        if args.client == "smart":
+            self.smart = SmartClient(cluster.nodes, max_batch=args.max_batch, max_inflight=args.client_inflight)
+    
+    def write(self, key):
+        """SET key to a value of --value-size bytes; True on commit"""
+        request = raft_pb2.ClientRequest(command=f"SET {key} {self.value}")
+        return self._submit(request)
+    
+    def read(self, key):
+        """Read key with the configured --read-mode; True on success"""
+        if self.args.read_mode == "log":
+            return self._submit(raft_pb2.ClientRequest(command=f"GET {key}"))
+        stub = random.choice(list(self.cluster.stubs.values()))
+        try:
+            response = stub.Read(raft_pb2.ReadRequest(key=key, consistency=self.args.read_mode), timeout=5.0)
+            return response.success
+        except grpc.RpcError:
+            return False
+    
+    def _submit(self, request):
+        """Send to the cached leader, following at most a few redirects and waiting out rejections"""
+        if self.smart:
+            try:
+                self.smart.execute(request.command)
+                return True
+            except ClientError:
+                return False
+        
+        deadline = time.monotonic() + 5.0
+        attempts = 0
+        while attempts < 3:
+            node_id = self.leader or random.choice(list(self.cluster.stubs))
+            try:
+                response = self.cluster.stubs[node_id].SubmitCommand(request, timeout=5.0)
+            except grpc.RpcError as e:
+                delay = retry_after(e)
+                if delay is not None and time.monotonic() + delay < deadline:
+                    # The node is at capacity: keep it cached and back off as asked
+                    time.sleep(random.uniform(delay, 2 * delay))
+                    continue
+                self.leader = None
+                attempts += 1
+                continue
+            if response.success:
+                self.leader = node_id
+                return True
+            self.leader = response.leader_id if response.leader_id in self.cluster.stubs else None
+            attempts += 1
+        return False
+
+
+def choose_operation(chooser, read_ratio, rng):
+    """Pick the next (op, key)"""
+    op = "read" if rng.random() < read_ratio else "write"
+    return op, chooser.next()
+
+
+def run_operation(driver, recorder, op, key, start):
+    """Run one read or write and record its latency since start"""
+    ok = driver.read(key) if op == "read" else driver.write(key)
+    recorder.record(op, time.perf_counter() - start, ok)
+
+
+def closed_loop(driver, args, recorder, stop_at):
+    """Each worker sends its next request as soon as the previous one finishes"""
+    def worker(seed):
+        rng = random.Random(seed)
+        chooser = KeyChooser(args.keys, args.distribution, args.zipf_s, rng)
+        while time.perf_counter() < stop_at:
+            op, key = choose_operation(chooser, args.read_ratio, rng)
+            run_operation(driver, recorder, op, key, time.perf_counter())
+    
+    threads = [threading.Thread(target=worker, args=(args.seed + i,), daemon=True)
+               for i in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def open_loop(driver, args, recorder, stop_at):
+    """Requests arrive as a Poisson process at --rate, independent of completions"""
+    rng = random.Random(args.seed)
+    chooser = KeyChooser(args.keys, args.distribution, args.zipf_s, rng)
+    
+    with ThreadPoolExecutor(max_workers=args.max_inflight) as executor:
+        next_arrival = time.perf_counter()
+        while next_arrival < stop_at:
+            delay = next_arrival - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            # Latency is measured from the intended arrival time (no coordinated omission)
+            op, key = choose_operation(chooser, args.read_ratio, rng)
+            executor.submit(run_operation, driver, recorder, op, key, next_arrival)
+            next_arrival += rng.expovariate(args.rate)
+
+
+# ==================== Reporting ====================
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def summarize(latencies):
+    """Latency summary in milliseconds"""
+    values = sorted(latencies)
+    result = {"count": len(values)}
+    for name, fraction in (("p50", 0.50), ("p99", 0.99), ("p999", 0.999)):
+        value = percentile(values, fraction)
+        result[f"{name}_ms"] = round(value * 1000, 3) if value is not None else None
+    result["mean_ms"] = round(1000 * sum(values) / len(values), 3) if values else None
+    return result
+
+
+def git_revision():
+    """Current commit, to label results"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='RAFT cluster load generator')
+    parser.add_argument('--nodes', type=int, default=5, help='Cluster size')
+    parser.add_argument('--base-port', type=int, default=7001, help='Port of node1 (others follow)')
+    parser.add_argument('--node-args', default='', help='Extra arguments for run_node.py (quoted)')
+    parser.add_argument('--durability', choices=['always', 'batch', 'none'], default='always',
+                        help='Durability mode of the nodes (see run_node.py --durability)')
+    parser.add_argument('--mode', choices=['closed', 'open'], default='closed', help='Closed- or open-loop load')
+    parser.add_argument('--concurrency', type=int, default=8, help='Closed loop: concurrent clients')
+    parser.add_argument('--rate', type=float, default=100.0, help='Open loop: arrivals per second')
+    parser.add_argument('--max-inflight', type=int, default=256, help='Open loop: max outstanding requests')
+    parser.add_argument('--duration', type=float, default=10.0, help='Measured seconds')
+    parser.add_argument('--warmup', type=float, default=2.0, help='Unmeasured seconds before measuring')
+    parser.add_argument('--read-ratio', type=float, default=0.5, help='Fraction of operations that are reads')
+    parser.add_argument('--read-mode', choices=['log', 'stale', 'read_index'], default='log',
+                        help='Reads as GET through the log, or via the Read RPC')
+    parser.add_argument('--client', choices=['basic', 'smart'], default='basic',
+                        help='One SubmitCommand per command, or the pipelining/batching SmartClient')
+    parser.add_argument('--max-batch', type=int, default=64, help='Smart client: most commands per batch')
+    parser.add_argument('--client-inflight', type=int, default=8, help='Smart client: most batches in flight')
+    parser.add_argument('--keys', type=int, default=1000, help='Key space size')
+    parser.add_argument('--distribution', choices=['uniform', 'zipfian'], default='uniform', help='Key distribution')
+    parser.add_argument('--zipf-s', type=float, default=0.99, help='Zipfian skew')
+    parser.add_argument('--value-size', type=int, default=100, help='Value size in bytes')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed')
+    parser.add_argument('--output', help='Write the JSON report here (default: stdout)')
+    parser.add_argument('--keep-data', action='store_true', help='Keep the scratch data directory')
+    
+    args = parser.parse_args()
+    
+    cluster = BenchCluster(args.nodes, args.base_port, ["--durability", args.durability] + args.node_args.split())
+    cluster.start()
+    driver = None
+    try:
+        leader = cluster.wait_for_leader()
+        print(f"Leader: {leader}, data in {cluster.data_dir}", file=sys.stderr)
+        
+        driver = Driver(cluster, args)
+        driver.leader = leader
+        recorder = Recorder()
+        sampler = ResourceSampler(cluster.processes)
+        
+        start = time.perf_counter()
+        measure_at = start + args.warmup
+        stop_at = measure_at + args.duration
+        
+        def start_measuring():
+            time.sleep(max(0.0, measure_at - time.perf_counter()))
+            recorder.recording = True
+            sampler.sample()
+            while time.perf_counter() < stop_at:
+                time.sleep(0.5)
+                sampler.sample()
+            recorder.recording = False
+        
+        timer = threading.Thread(target=start_measuring, daemon=True)
+        timer.start()
+        
+        if args.mode == "closed":
+            closed_loop(driver, args, recorder, stop_at)
+        else:
+            open_loop(driver, args, recorder, stop_at)
+        timer.join()
+        
+        completed = len(recorder.latencies["read"]) + len(recorder.latencies["write"])
+        report = {
+            "revision": git_revision(),
+            "config": vars(args),
+            "ops": completed,
+            "errors": recorder.errors,
+            "ops_per_sec": round(completed / args.duration, 2),
+            "latency": summarize(recorder.latencies["read"] + recorder.latencies["write"]),
+            "read_latency": summarize(recorder.latencies["read"]),
+            "write_latency": summarize(recorder.latencies["write"]),
+            "nodes": sampler.report(args.duration),
+        }
+    finally:
+        if driver and driver.smart:
+            driver.smart.close()
+        cluster.stop()
+    
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+if __name__ == "__main__":
+    main()
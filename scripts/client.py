@@ -7,12 +7,15 @@ import sys
 import os
 import argparse
 import time
+from concurrent.futures import ThreadPoolExecutor
 
-# Add proto directory to path
+# Add proto and src directories to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'proto'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
 import raft_pb2
-import raft_pb2_grpc
+from router import build_router, key_of
+from transport import get_channel_pool
 
 class RaftClient:
     """Client for interacting with RAFT cluster"""
@@ -36,8 +39,8 @@ class RaftClient:
         
         self.stubs = {}
         for node_addr in self.nodes:
-            channel = grpc.insecure_channel(node_addr)
-            self.stubs[node_addr] = raft_pb2_grpc.RaftServiceStub(channel)
+            self.stubs[node_addr] = get_channel_pool().stub(node_addr)
+        self.leader_hint = None  # last known leader, kept across commands
     
     def submit_command(self, command, max_retries=5):
         """
@@ -46,19 +49,17 @@ class RaftClient:
         """
         print(f"Submitting command: {command}")
         
-        leader_hint = None
-        
         for attempt in range(max_retries):
             # Try leader hint first if we have one
             nodes_to_try = list(self.stubs.keys())
             
-            if leader_hint and leader_hint in self.node_map:
-                leader_addr = self.node_map[leader_hint]
+            if self.leader_hint and self.leader_hint in self.node_map:
+                leader_addr = self.node_map[self.leader_hint]
                 if leader_addr in nodes_to_try:
                     # Move leader to front
                     nodes_to_try.remove(leader_addr)
                     nodes_to_try.insert(0, leader_addr)
-                    print(f"Trying suggested leader: {leader_hint} ({leader_addr})")
+                    print(f"Trying suggested leader: {self.leader_hint} ({leader_addr})")
             
             for node_addr in nodes_to_try:
                 try:
@@ -68,16 +69,17 @@ class RaftClient:
                     
                     if response.success:
                         print(f"✓ Command successful: {response.message}")
+                        self.leader_hint = response.leader_id
                         return True
                     else:
                         # Update leader hint for next retry
                         if response.leader_id and response.leader_id != "unknown":
-                            if leader_hint != response.leader_id:
-                                leader_hint = response.leader_id
-                                print(f"→ Leader is: {leader_hint}")
+                            if self.leader_hint != response.leader_id:
+                                self.leader_hint = response.leader_id
+                                print(f"→ Leader is: {self.leader_hint}")
                                 # Try the leader immediately
-                                if leader_hint in self.node_map:
-                                    leader_addr = self.node_map[leader_hint]
+                                if self.leader_hint in self.node_map:
+                                    leader_addr = self.node_map[self.leader_hint]
                                     try:
                                         stub = self.stubs[leader_addr]
                                         response = stub.SubmitCommand(request, timeout=5.0)
@@ -103,6 +105,59 @@ class RaftClient:
         print("   Try: Wait a few seconds for leader election to complete")
         return False
     
+    def read(self, node_addr, key, consistency="stale"):
+        """
+        Read a key directly from one node's state machine, without the log
+        
+        Args:
+            node_addr: Address of node to read from (a learner or any voter)
+            key: Key to read
+            consistency: "stale" for a local read, "read_index" to confirm with the leader
+        """
+        try:
+            stub = self.stubs[node_addr]
+            request = raft_pb2.ReadRequest(key=key, consistency=consistency)
+            response = stub.Read(request, timeout=5.0)
+            
+            if response.success and response.found:
+                print(f"✓ {key}={response.value} (revision {response.revision}, applied index {response.applied_index})")
+                return response.value
+            print(f"✗ {response.message}")
+        
+        except Exception as e:
+            print(f"Error: {e}")
+        return None
+    
+    def scan(self, node_addr, prefix, limit=0, consistency="stale"):
+        """
+        List the keys with a prefix from one node's state machine, one page at a time
+        
+        Args:
+            node_addr: Address of node to scan
+            prefix: Key prefix to list
+            limit: Keys per page (0 for the server default)
+            consistency: "stale" for a local read, "read_index" to confirm with the leader
+        """
+        try:
+            stub = self.stubs[node_addr]
+            start = ""
+            while True:
+                request = raft_pb2.ScanRequest(prefix=prefix, start=start, limit=limit, consistency=consistency)
+                response = stub.Scan(request, timeout=5.0)
+                if not response.success:
+                    print(f"✗ {response.message}")
+                    return
+                for item in response.items:
+                    print(f"  {item.key}={item.value}")
+                if not response.next_key:
+                    return
+                if input(f"More from '{response.next_key}'? [Y/n] ").strip().lower() == "n":
+                    return
+                start = response.next_key
+        
+        except Exception as e:
+            print(f"Error: {e}")
+    
     def isolate_node(self, node_addr, isolated_from):
         """
         Tell a node to isolate itself from other nodes (for testing)
@@ -124,6 +179,65 @@ class RaftClient:
         except Exception as e:
             print(f"Error: {e}")
 
+class MultiRaftClient(RaftClient):
+    """Client for a Multi-Raft cluster, routing each key to its group's leader"""
+    
+    def __init__(self, nodes, router):
+        """
+        Initialize client
+        
+        Args:
+            nodes: List of "host:port" addresses or dict of {node_id: address}
+            router: Same key router the nodes were started with
+        """
+        super().__init__(nodes)
+        self.router = router
+        self.group_leaders = {}  # {group_id: leader node_id}
+    
+    def submit_command(self, command, max_retries=5):
+        """
+        Submit a command to the leader of the group owning its key
+        """
+        group_id = self.router.group_for(key_of(command))
+        request = raft_pb2.ClientRequest(command=command, group_id=group_id)
+        
+        for attempt in range(max_retries):
+            nodes_to_try = list(self.stubs.keys())
+            
+            leader_id = self.group_leaders.get(group_id)
+            if leader_id in self.node_map and self.node_map[leader_id] in nodes_to_try:
+                nodes_to_try.remove(self.node_map[leader_id])
+                nodes_to_try.insert(0, self.node_map[leader_id])
+            
+            for node_addr in nodes_to_try:
+                try:
+                    response = self.stubs[node_addr].SubmitCommand(request, timeout=5.0)
+                except grpc.RpcError:
+                    continue
+                
+                if response.success:
+                    self.group_leaders[group_id] = response.leader_id
+                    print(f"✓ [group {group_id}] {response.message}")
+                    return True
+                
+                if response.leader_id in self.node_map and response.leader_id != "unknown":
+                    # Follow the redirect straight away
+                    self.group_leaders[group_id] = response.leader_id
+                    try:
+                        leader_addr = self.node_map[response.leader_id]
+                        response = self.stubs[leader_addr].SubmitCommand(request, timeout=5.0)
+                        if response.success:
+                            print(f"✓ [group {group_id}] {response.message}")
+                            return True
+                    except grpc.RpcError:
+                        pass
+            
+            if attempt < max_retries - 1:
+                time.sleep(1.0)
+        
+        print(f"✗ Failed to submit command to group {group_id}")
+        return False
+
 def interactive_mode(client):
     """Interactive command-line interface"""
     print("\n" + "=" * 60)
@@ -133,6 +247,9 @@ def interactive_mode(client):
     print("  SET <key> <value>  - Set a key-value pair")
     print("  GET <key>          - Get value for a key")
     print("  DELETE <key>       - Delete a key")
+    print("  CAS <key> <revision> <value> - Set a key only if its revision matches (0 = new key)")
+    print("  read <addr> <key> [stale|read_index] - Read from one node without the log")
+    print("  scan <addr> <prefix> [limit] - List keys from one node without the log")
     print("  status             - Check cluster status")
     print("  exit               - Exit")
     print("=" * 60)
@@ -153,6 +270,29 @@ def interactive_mode(client):
                 check_cluster_status(client)
                 continue
             
+            if command.lower().startswith("read "):
+                parts = command.split()
+                if len(parts) < 3:
+                    print("Usage: read <addr> <key> [stale|read_index]")
+                    continue
+                consistency = parts[3] if len(parts) > 3 else "stale"
+                if parts[1] not in client.stubs:
+                    print(f"Unknown node {parts[1]}")
+                    continue
+                client.read(parts[1], parts[2], consistency)
+                continue
+            
+            if command.lower().startswith("scan "):
+                parts = command.split()
+                if len(parts) < 3 or (len(parts) > 3 and not parts[3].isdigit()):
+                    print("Usage: scan <addr> <prefix> [limit]")
+                    continue
+                if parts[1] not in client.stubs:
+                    print(f"Unknown node {parts[1]}")
+                    continue
+                client.scan(parts[1], parts[2], int(parts[3]) if len(parts) > 3 else 0)
+                continue
+            
             client.submit_command(command)
         
         except KeyboardInterrupt:
@@ -161,40 +301,49 @@ def interactive_mode(client):
         except EOFError:
             break
 
-def check_cluster_status(client):
+def get_node_status(stub, group_id=0, timeout=1.0):
+    """Get one node's status with the read-only GetStatus RPC (None if unreachable)"""
+    try:
+        return stub.GetStatus(raft_pb2.StatusRequest(group_id=group_id), timeout=timeout)
+    except grpc.RpcError:
+        return None
+
+def check_cluster_status(client, group_id=0):
     """Check which nodes are reachable and who is leader"""
     print("\nChecking cluster status...")
     print("-" * 60)
     
+    # Probe all nodes in parallel
+    with ThreadPoolExecutor(max_workers=len(client.stubs)) as executor:
+        futures = {addr: executor.submit(get_node_status, stub, group_id)
+                   for addr, stub in client.stubs.items()}
+        statuses = {addr: future.result() for addr, future in futures.items()}
+    
     leader_found = None
     reachable_nodes = 0
     
-    for node_addr, stub in client.stubs.items():
-        try:
-            request = raft_pb2.ClientRequest(command="GET __status__")
-            response = stub.SubmitCommand(request, timeout=2.0)
-            
-            reachable_nodes += 1
-            node_name = None
-            for nid, addr in client.node_map.items():
-                if addr == node_addr:
-                    node_name = nid
-                    break
-            
-            if response.success or response.leader_id == (node_name or ""):
-                print(f"✓ {node_addr} ({node_name}) - LEADER")
-                leader_found = node_name
-            else:
-                leader_info = response.leader_id if response.leader_id != "unknown" else "unknown"
-                print(f"✓ {node_addr} ({node_name}) - Follower (leader: {leader_info})")
-        
-        except Exception as e:
+    for node_addr, status in statuses.items():
+        if status is None:
             node_name = None
             for nid, addr in client.node_map.items():
                 if addr == node_addr:
                     node_name = nid
                     break
             print(f"✗ {node_addr} ({node_name}) - Unreachable")
+            continue
+        
+        reachable_nodes += 1
+        role = "Learner" if status.learner else status.role.capitalize()
+        print(f"✓ {node_addr} ({status.node_id}) - {role.upper() if status.role == 'leader' else role} "
+              f"term={status.term} commit={status.commit_index} applied={status.last_applied} "
+              f"log={status.log_length} leader={status.leader_id or 'unknown'}")
+        
+        if status.role == "leader":
+            leader_found = status.node_id
+            for peer in status.peers:
+                kind = "" if peer.voter else " (learner)"
+                print(f"    {peer.peer_id}{kind}: match={peer.match_index} next={peer.next_index} "
+                      f"lag={status.log_length - peer.match_index}")
     
     print("-" * 60)
     print(f"Reachable nodes: {reachable_nodes}/{len(client.stubs)}")
@@ -210,11 +359,18 @@ def main():
                        help='Comma-separated list of node addresses')
     parser.add_argument('--command', help='Single command to execute (optional)')
     parser.add_argument('--isolate', help='Isolate node (format: node_addr:node_id1,node_id2)')
+    parser.add_argument('--groups', type=int, default=0, help='Number of Raft groups (Multi-Raft cluster)')
+    parser.add_argument('--router', choices=['hash', 'range'], default='hash', help='Key router for Multi-Raft')
+    parser.add_argument('--range-splits', default='', help='Comma-separated split keys for the range router')
     
     args = parser.parse_args()
     
     nodes = args.nodes.split(',')
-    client = RaftClient(nodes)
+    if args.groups > 0:
+        splits = args.range_splits.split(',') if args.range_splits else []
+        client = MultiRaftClient(nodes, build_router(args.router, args.groups, splits))
+    else:
+        client = RaftClient(nodes)
     
     if args.isolate:
         # Parse isolation command
@@ -0,0 +1,230 @@
+"""
+Storage-layer microbenchmarks (no gRPC, no cluster)
+
+Measures RaftState and KeyValueStore operations at several log and store
+sizes and reports ops/sec and bytes written per op. Saves are also measured
+under each durability mode (always / batch / none), so the cost of fsync
+shows up next to the rest. With --baseline, the
+run is compared against an earlier --output file and the script exits
+non-zero if any metric regressed by more than --threshold.
+
+Example:
+    python scripts/microbench.py --output baseline.json
+    python scripts/microbench.py --baseline baseline.json --threshold 0.2
+"""
+import argparse
+import json
+import shutil
+import sys
+import os
+import tempfile
+import time
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from raft_state import RaftState, LogEntry
+from kvstore import KeyValueStore
+from durability import DurabilityPolicy, DURABILITY_MODES
+
+VALUE = "v" * 100
+
+def parse_sizes(text):
+    """Parse "1000,10k,1M" into [1000, 10000, 1000000]"""
+    sizes = []
+    for part in text.split(','):
+        part = part.strip().lower()
+        scale = {"k": 1000, "m": 1000000}.get(part[-1:], 1)
+        sizes.append(int(float(part.rstrip("km")) * scale))
+    return sizes
+
+def measure(operation, io_stats, min_iterations, max_seconds):
+    """
+    Run operation repeatedly for up to max_seconds (at least min_iterations times)
+    
+    Returns:
+        {"ops_per_sec", "bytes_per_op", "iterations"}
+    """
+    bytes_before = io_stats()["bytes_written"]
+    iterations = 0
+    start = time.perf_counter()
+    while iterations < min_iterations or time.perf_counter() - start < max_seconds:
+        operation(iterations)
+        iterations += 1
+    elapsed = time.perf_counter() - start
+    return {
+        "ops_per_sec": round(iterations / elapsed, 2),
+        "bytes_per_op": round((io_stats()["bytes_written"] - bytes_before) / iterations, 1),
+        "iterations": iterations,
+    }
+
+def make_state(data_dir, num_entries):
+    """RaftState with num_entries entries already persisted"""
+    state = RaftState("bench", data_dir)
+    state.current_term = 1
+    state.log = [LogEntry(1, f"SET key{i} {VALUE}", i) for i in range(1, num_entries + 1)]
+    state._save_state()
+    return state
+
+def make_store(data_dir, num_keys):
+    """KeyValueStore with num_keys keys already persisted"""
+    store = KeyValueStore("bench", data_dir)
+    store.data = {f"key{i}": VALUE for i in range(num_keys)}
+    store._save()
+    store._load()  # builds the sorted key index
+    return store
+
+def bench_state(num_entries, args):
+    """RaftState benchmarks at one log size"""
+    results = {}
+    data_dir = tempfile.mkdtemp(prefix="raft_microbench_")
+    try:
+        state = make_state(data_dir, num_entries)
+        results["state.append_log"] = measure(
+            lambda i: state.append_log(1, f"SET bench{i} {VALUE}"),
+            state.get_io_stats, args.min_iterations, args.max_seconds)
+        
+        state = make_state(data_dir, num_entries)
+        batch = args.batch_size
+        
+        def append_batch(i):
+            prev_index = len(state.log)
+            entries = [LogEntry(1, f"SET bench{i} {VALUE}", prev_index + j) for j in range(1, batch + 1)]
+            state.append_entries(prev_index, 1, entries)
+        
+        results[f"state.append_entries[batch={batch}]"] = measure(
+            append_batch, state.get_io_stats, args.min_iterations, args.max_seconds)
+        
+        state = make_state(data_dir, num_entries)
+        results["state._load_state"] = measure(
+            lambda i: state._load_state(), state.get_io_stats, args.min_iterations, args.max_seconds)
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+    return results
+
+def bench_store(num_keys, args):
+    """KeyValueStore benchmarks at one store size"""
+    results = {}
+    data_dir = tempfile.mkdtemp(prefix="raft_microbench_")
+    try:
+        store = make_store(data_dir, num_keys)
+        results["kv.apply_command[SET]"] = measure(
+            lambda i: store.apply_command(f"SET key{i % num_keys} {VALUE}"),
+            store.get_io_stats, args.min_iterations, args.max_seconds)
+        results["kv._save"] = measure(
+            lambda i: store._save(), store.get_io_stats, args.min_iterations, args.max_seconds)
+        results["kv._load"] = measure(
+            lambda i: store._load(), store.get_io_stats, args.min_iterations, args.max_seconds)
+        # Listing 100 keys: a page of the sorted index vs. filtering a copy of the store
+        results["kv.scan[prefix,limit=100]"] = measure(
+            lambda i: store.scan(prefix=f"key{i % 10}", limit=100),
+            store.get_io_stats, args.min_iterations, args.max_seconds)
+        results["kv.get_all+filter[limit=100]"] = measure(
+            lambda i: sorted(key for key in store.get_all() if key.startswith(f"key{i % 10}"))[:100],
+            store.get_io_stats, args.min_iterations, args.max_seconds)
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+    return results
+
+def bench_durability(mode, args):
+    """Saves of a 1k-entry log and a 1k-key store under one durability mode"""
+    results = {}
+    data_dir = tempfile.mkdtemp(prefix="raft_microbench_")
+    policy = DurabilityPolicy("bench", mode)
+    try:
+        state = make_state(data_dir, 1000)
+        state.durability = policy
+        store = make_store(data_dir, 1000)
+        store.durability = policy
+        benchmarks = {
+            "state.append_log": (lambda i: state.append_log(1, f"SET bench{i} {VALUE}"), state.get_io_stats),
+            "kv.apply_command[SET]": (lambda i: store.apply_command(f"SET key{i % 1000} {VALUE}"),
+                                      store.get_io_stats),
+        }
+        for name, (operation, io_stats) in benchmarks.items():
+            fsyncs_before = policy.get_stats()["fsyncs"]
+            result = measure(operation, io_stats, args.min_iterations, args.max_seconds)
+            policy.flush()
+            result["fsyncs_per_op"] = round((policy.get_stats()["fsyncs"] - fsyncs_before) / result["iterations"], 2)
+            results[f"durability.{name}[mode={mode}]"] = result
+    finally:
+        policy.close()
+        shutil.rmtree(data_dir, ignore_errors=True)
+    return results
+
+def compare(results, baseline, threshold):
+    """
+    Compare results against a baseline
+    
+    Returns:
+        List of regression descriptions (empty if none)
+    """
+    regressions = []
+    for name, current in sorted(results.items()):
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        
+        ops_change = current["ops_per_sec"] / previous["ops_per_sec"] - 1 if previous["ops_per_sec"] else 0.0
+        marker = ""
+        if ops_change < -threshold:
+            regressions.append(f"{name}: ops/sec {previous['ops_per_sec']} -> {current['ops_per_sec']}")
+            marker = "  ✗"
+        if previous["bytes_per_op"] and current["bytes_per_op"] > previous["bytes_per_op"] * (1 + threshold):
+            regressions.append(f"{name}: bytes/op {previous['bytes_per_op']} -> {current['bytes_per_op']}")
+            marker = "  ✗"
+        print(f"  {name:<50} ops/sec {ops_change:+7.1%}{marker}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Storage-layer microbenchmarks')
+    parser.add_argument('--log-sizes', default='1k,10k,100k',
+                        help='Log sizes in entries, e.g. 1k,100k,10M')
+    parser.add_argument('--kv-sizes', default='1k,10k,100k',
+                        help='Store sizes in keys, e.g. 1k,100k,1M')
+    parser.add_argument('--batch-size', type=int, default=10, help='Entries per append_entries call')
+    parser.add_argument('--durability-modes', default=','.join(DURABILITY_MODES),
+                        help='Durability modes to measure saves under, e.g. always,none')
+    parser.add_argument('--min-iterations', type=int, default=3, help='Minimum iterations per benchmark')
+    parser.add_argument('--max-seconds', type=float, default=1.0, help='Time budget per benchmark')
+    parser.add_argument('--output', help='Write results as JSON (usable as a later --baseline)')
+    parser.add_argument('--baseline', help='Compare against results from an earlier --output')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Allowed relative regression before failing (0.2 = 20%%)')
+    
+    args = parser.parse_args()
+    
+    results = {}
+    for num_entries in parse_sizes(args.log_sizes):
+        for name, result in bench_state(num_entries, args).items():
+            results[f"{name}[log={num_entries}]"] = result
+    for num_keys in parse_sizes(args.kv_sizes):
+        for name, result in bench_store(num_keys, args).items():
+            results[f"{name}[keys={num_keys}]"] = result
+    for mode in args.durability_modes.split(','):
+        results.update(bench_durability(mode.strip(), args))
+    
+    print(f"{'Benchmark':<52} {'ops/sec':>12} {'bytes/op':>12} {'fsyncs/op':>10}")
+    for name, result in results.items():
+        fsyncs = f"{result['fsyncs_per_op']:>10.2f}" if "fsyncs_per_op" in result else ""
+        print(f"{name:<52} {result['ops_per_sec']:>12.1f} {result['bytes_per_op']:>12.0f} {fsyncs}")
+    
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"results": results}, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        print(f"\nChange vs {args.baseline} (threshold {args.threshold:.0%}):")
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n✗ {len(regressions)} regression(s):")
+            for regression in regressions:
+                print(f"    {regression}")
+            sys.exit(1)
+        print("\n✓ No regressions")
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,10 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
 from node import RaftNode
+from multi_raft import MultiRaftNode
+from router import build_router
+from logger import setup_logging, shutdown_logging
+from metrics import MetricsServer
 
 def parse_peers(peers_str):
     """Parse peers string into dictionary"""
@@ -28,25 +32,114 @@ def main():
     parser.add_argument('--election-timeout-min', type=int, default=150, help='Min election timeout (ms)')
     parser.add_argument('--election-timeout-max', type=int, default=300, help='Max election timeout (ms)')
     parser.add_argument('--heartbeat-interval', type=int, default=50, help='Heartbeat interval (ms)')
+    parser.add_argument('--quiesce-interval', type=int, default=500, help='Idle leader heartbeat interval (ms, 0 disables)')
+    parser.add_argument('--compression', default='zlib', choices=['none', 'zlib', 'gzip'],
+                        help='Codec for large AppendEntries batches')
+    parser.add_argument('--compression-threshold', type=int, default=64 * 1024,
+                        help='Smallest AppendEntries entry payload to compress (bytes)')
+    parser.add_argument('--replication', default='stream', choices=['stream', 'unary'],
+                        help='Send AppendEntries over a long-lived stream per peer, or one call each')
+    parser.add_argument('--durability', default='always', choices=['always', 'batch', 'none'],
+                        help='fsync every save, group commit every --durability-interval, or never (benchmarks only)')
+    parser.add_argument('--durability-interval', type=int, default=10, help='Group commit interval for batch durability (ms)')
+    parser.add_argument('--forward-proposals', action='store_true',
+                        help='Followers forward client commands to the leader instead of redirecting')
+    parser.add_argument('--max-uncommitted-entries', type=int, default=10000,
+                        help='Reject proposals once the leader has this many uncommitted entries (0 disables)')
+    parser.add_argument('--max-uncommitted-bytes', type=int, default=64 * 1024 * 1024,
+                        help='Reject proposals once the leader has this many uncommitted command bytes (0 disables)')
+    parser.add_argument('--max-client-rpcs', type=int, default=32,
+                        help='Client RPCs served at once; more are rejected with RESOURCE_EXHAUSTED')
+    parser.add_argument('--max-watchers', type=int, default=64, help='Watch streams served at once')
+    parser.add_argument('--watch-capacity', type=int, default=4096,
+                        help='Applied mutations kept for watchers to catch up on or resume from')
+    parser.add_argument('--max-expiry-batch', type=int, default=1000,
+                        help='Most keys the leader deletes for their TTL in one EXPIRE entry')
+    parser.add_argument('--history-window', type=int, default=0,
+                        help='Log indexes of superseded versions kept for reads at earlier revisions')
+    parser.add_argument('--value-log-threshold', type=int, default=0,
+                        help='Keep SET values of at least this many bytes in a separate value log (0 disables)')
+    parser.add_argument('--learners', default='', help='Comma-separated non-voting learners (format: id=host:port,id2=host:port)')
+    parser.add_argument('--learner', action='store_true', help='Run this node as a non-voting learner')
+    parser.add_argument('--log-level', default='WARNING', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                        help='Minimum log level (DEBUG logs every RPC and applied entry)')
+    parser.add_argument('--log-format', default='text', choices=['text', 'json'], help='Log record format')
+    parser.add_argument('--metrics-port', type=int, default=0, help='Serve Prometheus metrics on this port (0 disables)')
+    parser.add_argument('--groups', type=int, default=0, help='Host this many Raft groups (Multi-Raft); 0 for a single group')
+    parser.add_argument('--router', choices=['hash', 'range'], default='hash', help='Key router for Multi-Raft')
+    parser.add_argument('--range-splits', default='', help='Comma-separated split keys for the range router')
     
     args = parser.parse_args()
     
     peers = parse_peers(args.peers)
+    setup_logging(args.log_level, args.log_format)
     
-    node = RaftNode(
-        node_id=args.node_id,
-        host=args.host,
-        port=args.port,
-        peers=peers,
-        election_timeout_range=(args.election_timeout_min, args.election_timeout_max),
-        heartbeat_interval=args.heartbeat_interval
-    )
+    if args.groups > 0 and (args.learner or args.learners):
+        parser.error("Learners are not supported with --groups")
+    
+    if args.groups > 0:
+        splits = args.range_splits.split(',') if args.range_splits else []
+        node = MultiRaftNode(
+            node_id=args.node_id,
+            host=args.host,
+            port=args.port,
+            peers=peers,
+            num_groups=args.groups,
+            router=build_router(args.router, args.groups, splits),
+            election_timeout_range=(args.election_timeout_min, args.election_timeout_max),
+            heartbeat_interval=args.heartbeat_interval,
+            quiesce_interval=args.quiesce_interval,
+            compression=args.compression,
+            compression_threshold=args.compression_threshold,
+            durability=args.durability,
+            durability_interval=args.durability_interval,
+            forward_proposals=args.forward_proposals,
+            max_uncommitted_entries=args.max_uncommitted_entries,
+            max_uncommitted_bytes=args.max_uncommitted_bytes,
+            max_client_rpcs=args.max_client_rpcs,
+            max_watchers=args.max_watchers,
+            watch_capacity=args.watch_capacity,
+            max_expiry_batch=args.max_expiry_batch,
+            history_window=args.history_window,
+            value_log_threshold=args.value_log_threshold
+        )
+    else:
+        node = RaftNode(
+            node_id=args.node_id,
+            host=args.host,
+            port=args.port,
+            peers=peers,
+            election_timeout_range=(args.election_timeout_min, args.election_timeout_max),
+            heartbeat_interval=args.heartbeat_interval,
+            learners=parse_peers(args.learners),
+            learner=args.learner,
+            quiesce_interval=args.quiesce_interval,
+            compression=args.compression,
+            compression_threshold=args.compression_threshold,
+            streaming=args.replication == 'stream',
+            durability=args.durability,
+            durability_interval=args.durability_interval,
+            forward_proposals=args.forward_proposals,
+            max_uncommitted_entries=args.max_uncommitted_entries,
+            max_uncommitted_bytes=args.max_uncommitted_bytes,
+            max_client_rpcs=args.max_client_rpcs,
+            max_watchers=args.max_watchers,
+            watch_capacity=args.watch_capacity,
+            max_expiry_batch=args.max_expiry_batch,
+            history_window=args.history_window,
+            value_log_threshold=args.value_log_threshold
+        )
+    
+    if args.metrics_port:
+        MetricsServer(node.metrics_registry, args.host, args.metrics_port).start()
     
     try:
         node.start()
         node.wait_for_termination()
     except KeyboardInterrupt:
         node.stop()
+    finally:
+        shutdown_logging()
 
 if __name__ == "__main__":
     main()
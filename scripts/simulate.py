@@ -0,0 +1,69 @@
+"""
+Run randomized RAFT scenarios in the deterministic simulator
+
+Each scenario runs an in-memory cluster under message loss, reordering,
+crashes, restarts and partitions while checking Raft's safety properties.
+A failing scenario can be replayed exactly with --seed.
+
+Example:
+    python scripts/simulate.py --scenarios 1000
+    python scripts/simulate.py --seed 42 --scenarios 1 --verbose
+"""
+import argparse
+import sys
+import os
+import time
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from simulator import run_scenario
+
+def main():
+    parser = argparse.ArgumentParser(description='Randomized RAFT simulation and safety check')
+    parser.add_argument('--scenarios', type=int, default=100, help='Number of scenarios to run')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the first scenario')
+    parser.add_argument('--nodes', type=int, default=5, help='Cluster size')
+    parser.add_argument('--duration', type=float, default=2.0, help='Virtual seconds of faults per scenario')
+    parser.add_argument('--max-drop-rate', type=float, default=0.05, help='Upper bound of the message drop rate')
+    parser.add_argument('--no-faults', action='store_true', help='Run without crashes and partitions')
+    parser.add_argument('--verbose', action='store_true', help='Print every scenario')
+    
+    args = parser.parse_args()
+    
+    totals = {"virtual_seconds": 0.0, "delivered": 0, "committed": 0, "terms": 0}
+    failures = []
+    start = time.perf_counter()
+    
+    for seed in range(args.seed, args.seed + args.scenarios):
+        result = run_scenario(seed, num_nodes=args.nodes, duration=args.duration,
+                              faults=not args.no_faults, max_drop_rate=args.max_drop_rate)
+        for key in totals:
+            totals[key] += result[key]
+        
+        if args.verbose:
+            print(f"seed {seed}: committed={result['committed']} terms={result['terms']} "
+                  f"leader={result['leader']} delivered={result['delivered']} dropped={result['dropped']}")
+        if result["violations"]:
+            failures.append(seed)
+            print(f"✗ seed {seed}: SAFETY VIOLATION")
+            for violation in result["violations"]:
+                print(f"    {violation}")
+    
+    elapsed = time.perf_counter() - start
+    print("\n" + "=" * 70)
+    print(f"Scenarios:        {args.scenarios} in {elapsed:.1f}s "
+          f"({60 * args.scenarios / elapsed:.0f}/min)")
+    print(f"Virtual time:     {totals['virtual_seconds']:.0f}s ({totals['virtual_seconds'] / elapsed:.0f}x real time)")
+    print(f"Messages:         {totals['delivered']} delivered ({totals['delivered'] / elapsed:.0f}/s)")
+    print(f"Entries committed: {totals['committed']}, terms: {totals['terms']}")
+    print("=" * 70)
+    
+    if failures:
+        print(f"\n✗ {len(failures)} scenario(s) violated safety. Replay with:")
+        print(f"    python scripts/simulate.py --seed {failures[0]} --scenarios 1 --verbose")
+        sys.exit(1)
+    print("\n✓ No safety violations")
+
+if __name__ == "__main__":
+    main()
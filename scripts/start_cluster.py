@@ -1,6 +1,7 @@
 """
 Start a RAFT cluster with 5 nodes
 """
+import argparse
 import subprocess
 import sys
 import os
@@ -16,6 +17,15 @@ NODES = {
     "node5": {"host": "localhost", "port": 5005},
 }
 
+# Non-voting learners (filled from --learners), ports continue after the voters
+LEARNERS = {}
+
+# Number of Raft groups per node (filled from --groups, 0 = single group)
+GROUPS = 0
+
+# Log level passed to every node (filled from --log-level)
+LOG_LEVEL = "WARNING"
+
 processes = []
 
 def signal_handler(sig, frame):
@@ -39,9 +49,9 @@ def signal_handler(sig, frame):
     print("Cluster stopped")
     sys.exit(0)
 
-def start_node(node_id, config):
+def start_node(node_id, config, learner=False):
     """Start a single RAFT node"""
-    # Build peers list (all nodes except this one)
+    # Build peers list (all voting nodes except this one)
     peers = []
     for nid, ncfg in NODES.items():
         if nid != node_id:
@@ -55,15 +65,42 @@ def start_node(node_id, config):
         "--node-id", node_id,
         "--host", config["host"],
         "--port", str(config["port"]),
-        "--peers", peers_str
+        "--peers", peers_str,
+        "--log-level", LOG_LEVEL
     ]
     
-    print(f"Starting {node_id} at {config['host']}:{config['port']}...")
+    if GROUPS:
+        cmd.extend(["--groups", str(GROUPS)])
+    
+    if learner:
+        cmd.append("--learner")
+    elif LEARNERS:
+        learners_str = ",".join(f"{nid}={ncfg['host']}:{ncfg['port']}" for nid, ncfg in LEARNERS.items())
+        cmd.extend(["--learners", learners_str])
+    
+    role = " (learner)" if learner else ""
+    print(f"Starting {node_id}{role} at {config['host']}:{config['port']}...")
     proc = subprocess.Popen(cmd)
     return proc
 
 def main():
     """Start all nodes in the cluster"""
+    parser = argparse.ArgumentParser(description='Start a local RAFT cluster')
+    parser.add_argument('--learners', type=int, default=0, help='Number of non-voting learners to start')
+    parser.add_argument('--groups', type=int, default=0, help='Raft groups per node (Multi-Raft, hash routed)')
+    parser.add_argument('--log-level', default='WARNING', help='Node log level (DEBUG, INFO, WARNING, ERROR)')
+    args = parser.parse_args()
+    if args.groups and args.learners:
+        parser.error("Learners are not supported with --groups")
+    
+    global GROUPS, LOG_LEVEL
+    GROUPS = args.groups
+    LOG_LEVEL = args.log_level
+    
+    last_port = max(cfg["port"] for cfg in NODES.values())
+    for i in range(1, args.learners + 1):
+        LEARNERS[f"learner{i}"] = {"host": "localhost", "port": last_port + i}
+    
     print("=" * 60)
     print("RAFT Cluster Startup")
     print("=" * 60)
@@ -77,12 +114,19 @@ def main():
         processes.append(proc)
         time.sleep(0.5)  # Stagger startup
     
+    for node_id, config in LEARNERS.items():
+        proc = start_node(node_id, config, learner=True)
+        processes.append(proc)
+        time.sleep(0.5)
+    
     print("\n" + "=" * 60)
     print("Cluster started successfully!")
     print("=" * 60)
     print(f"Total nodes: {len(NODES)}")
     for node_id, config in NODES.items():
         print(f"  {node_id}: {config['host']}:{config['port']}")
+    for node_id, config in LEARNERS.items():
+        print(f"  {node_id}: {config['host']}:{config['port']} (learner)")
     print("\nPress Ctrl+C to stop the cluster")
     print("=" * 60 + "\n")
     
@@ -0,0 +1,90 @@
+"""
+Admission control for client requests
+
+Client RPCs wait for their commands to commit, holding a gRPC worker the
+whole time. Without limits a burst of clients can take every worker, and
+AppendEntries and RequestVote then queue behind them until elections time
+out. The server therefore runs CONSENSUS_WORKERS workers for consensus RPCs
+plus a fixed number of client slots, and a client RPC that finds every slot
+taken is rejected right away instead of queueing.
+
+The leader also caps how far its log may run ahead of the commit index
+(see RaftNode.max_uncommitted_entries / max_uncommitted_bytes). Rejected
+requests fail with RESOURCE_EXHAUSTED and a retry-after hint in the
+trailing metadata; clients should wait that long before retrying.
+"""
+import threading
+from typing import Optional
+
+import grpc
+
+
+# gRPC workers left for consensus RPCs (votes, AppendEntries, replication streams)
+CONSENSUS_WORKERS = 10
+
+# Trailing metadata key of the retry-after hint, in milliseconds
+RETRY_AFTER_KEY = "retry-after-ms"
+
+
+class Overloaded(Exception):
+    """A client request was rejected because the node is at capacity"""
+    
+    def __init__(self, message: str, retry_after: float):
+        """
+        Args:
+            message: Why the request was rejected
+            retry_after: Seconds the client should wait before retrying
+        """
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ClientSlots:
+    """A fixed number of gRPC workers client RPCs may occupy at once"""
+    
+    def __init__(self, size: int, retry_after: float, kind: str = "client"):
+        """
+        Args:
+            size: Client RPCs allowed to run at once
+            retry_after: Hint in seconds for clients rejected while every slot is taken
+            kind: What the slots are for (for the rejection message)
+        """
+        self.size = size
+        self.retry_after = retry_after
+        self.kind = kind
+        self.semaphore = threading.BoundedSemaphore(size)
+    
+    def acquire(self):
+        """
+        Take a slot without waiting
+        
+        Raises:
+            Overloaded: If every slot is taken
+        """
+        if not self.semaphore.acquire(blocking=False):
+            raise Overloaded(f"All {self.size} {self.kind} slots busy", self.retry_after)
+    
+    def release(self):
+        """Give a slot back"""
+        self.semaphore.release()
+
+
+def reject(context, error: Overloaded):
+    """Fail an RPC with RESOURCE_EXHAUSTED and the error's retry-after hint (never returns)"""
+    context.set_trailing_metadata(((RETRY_AFTER_KEY, str(int(error.retry_after * 1000))),))
+    context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, str(error))
+
+
+def retry_after(error: grpc.RpcError) -> Optional[float]:
+    """
+    Get the retry-after hint of a RESOURCE_EXHAUSTED error
+    
+    Returns:
+        Seconds to wait before retrying, or None if the error is not a rejection
+    """
+    if not isinstance(error, grpc.Call) or error.code() != grpc.StatusCode.RESOURCE_EXHAUSTED:
+        return None
+    for key, value in error.trailing_metadata() or ():
+        if key == RETRY_AFTER_KEY:
+            return int(value) / 1000.0
+    return 0.0
@@ -0,0 +1,181 @@
+"""
+Durable file writes for RaftState, KeyValueStore and ValueLog
+
+The first two rewrite a whole file on every save. The new content goes to a
+temporary file that then replaces the real one with os.replace, so a crash
+leaves either the old file or the new one, never a torn mix. The
+durability mode decides when the content reaches the disk:
+
+- always: fsync the file (and its directory, for the rename) before the
+  save returns, so nothing acknowledged is lost in a crash. Raft assumes this.
+- batch: group commit. A save only queues the new content and returns. A
+  background thread runs once per interval and writes, fsyncs and renames
+  the latest queued content of each file, then fsyncs each directory once,
+  so any number of saves in an interval cost one fsync per file. A crash
+  loses every save queued since the last group commit (up to one interval
+  plus the time the commit takes), including acknowledged writes, log
+  entries and votes; files are never torn. Until the commit the files on
+  disk hold the older content.
+- none: never fsync and leave flushing to the OS. A crash can leave a torn
+  or empty file. For benchmarks only.
+
+The value log is appended to instead. sync_append fsyncs appends before
+it returns in every mode but none, also in batch mode: saved log entries
+refer to the appended values, so a value must reach the disk before any
+save that refers to it can.
+"""
+import os
+import threading
+import time
+from typing import Dict
+
+from logger import get_logger
+
+
+DURABILITY_MODES = ("always", "batch", "none")
+
+
+class DurabilityPolicy:
+    """Atomic file replacement with a configurable fsync policy"""
+    
+    def __init__(self, node_id: str, mode: str = "always", batch_interval: float = 0.01, metrics=None):
+        """
+        Initialize the policy
+        
+        Args:
+            node_id: Node the files belong to (for logging)
+            mode: "always", "batch" or "none" (see module docstring)
+            batch_interval: Seconds between group commits in batch mode
+            metrics: Optional NodeMetrics to report fsync timings to
+        """
+        if mode not in DURABILITY_MODES:
+            raise ValueError(f"Unknown durability mode '{mode}' (expected one of {', '.join(DURABILITY_MODES)})")
+        
+        self.mode = mode
+        self.batch_interval = batch_interval
+        self.metrics = metrics
+        self.logger = get_logger("Durability", node_id)
+        self.lock = threading.Lock()
+        self.pending = {}  # batch: {path: latest content} queued for the next group commit
+        self.flush_lock = threading.Lock()  # one group commit at a time, in order
+        self.stats = {"fsyncs": 0}
+        
+        self.running = mode == "batch"
+        self.flush_thread = None
+        if self.running:
+            self.flush_thread = threading.Thread(target=self._flush_loop, daemon=True)
+            self.flush_thread.start()
+    
+    def write(self, path: str, content, now: bool = False):
+        """
+        Replace the file at path with content (str, or bytes for a binary file)
+        
+        In batch mode the content is only queued for the next group commit.
+        
+        Args:
+            path: File to replace
+            content: New content of the file
+            now: Replace the file before returning even in batch mode (for a
+                file that is reopened right away)
+        
+        Raises:
+            OSError: If the file could not be written (the old file is left intact)
+        """
+        if self.mode != "batch":
+            self._replace(path, content)
+            if self.mode == "always":
+                self._fsync_directory(os.path.dirname(path))
+        elif not now:
+            with self.lock:
+                self.pending[path] = content
+        else:
+            with self.flush_lock:
+                with self.lock:
+                    self.pending.pop(path, None)  # superseded
+                self._replace(path, content)
+                self._fsync_directory(os.path.dirname(path))
+    
+    def _replace(self, path: str, content):
+        """Write content to a temporary file and rename it over path (fsyncing it first unless mode is none)"""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb' if isinstance(content, bytes) else 'w') as f:
+            f.write(content)
+            if self.mode != "none":
+                # The content must be on disk before the rename can expose it
+                f.flush()
+                self._fsync(f.fileno())
+        os.replace(tmp_path, path)
+    
+    def sync_append(self, f):
+        """
+        Make what was appended to an open file durable (unless the mode is none)
+        
+        Raises:
+            OSError: If the data could not be written
+        """
+        f.flush()
+        if self.mode != "none":
+            self._fsync(f.fileno())
+    
+    def flush(self):
+        """
+        Group commit of batch mode: write the latest queued content of each file
+        
+        A file that cannot be written keeps its old content and is logged;
+        the other files are still committed.
+        
+        Raises:
+            OSError: If a directory could not be fsynced
+        """
+        with self.flush_lock:
+            with self.lock:
+                pending, self.pending = self.pending, {}
+            
+            directories = set()
+            for path, content in pending.items():
+                try:
+                    self._replace(path, content)
+                except OSError as e:
+                    self.logger.error(f"Error saving {path}: {e}")
+                    continue
+                directories.add(os.path.dirname(path))
+            for directory in directories:
+                self._fsync_directory(directory)
+    
+    def close(self):
+        """Stop the batch flusher after a final group commit"""
+        self.running = False
+        if self.flush_thread:
+            self.flush_thread.join(timeout=1.0)
+        self.flush()
+    
+    def get_stats(self) -> Dict[str, int]:
+        """Get a copy of the fsync counter"""
+        with self.lock:
+            return dict(self.stats)
+    
+    def _flush_loop(self):
+        """Run a group commit once per interval (batch mode)"""
+        while self.running:
+            time.sleep(self.batch_interval)
+            try:
+                self.flush()
+            except OSError as e:
+                self.logger.error(f"Error flushing to disk: {e}")
+    
+    def _fsync_directory(self, directory: str):
+        """fsync a directory so a rename in it survives a crash"""
+        fd = os.open(directory or ".", os.O_RDONLY)
+        try:
+            self._fsync(fd)
+        finally:
+            os.close(fd)
+    
+    def _fsync(self, fd: int):
+        """fsync a file descriptor, counting and timing it"""
+        start = time.perf_counter()
+        os.fsync(fd)
+        with self.lock:
+            self.stats["fsyncs"] += 1
+        if self.metrics:
+            self.metrics.fsync_seconds.observe(time.perf_counter() - start)
@@ -1,53 +1,230 @@
 """
 Simple file-based key-value store for RAFT committed logs
+
+The data file also records the log index the store has applied up to and
+the client session table, written together in one atomic replace, so a
+restarted node resumes applying after that index instead of replaying the
+whole log. Every applied mutation is also published, with its log index,
+to the store's WatchHub for the Watch RPC.
+
+Next to the data dict the store keeps its keys in a sorted list, so range
+and prefix scans (SCAN, PREFIX, the Scan RPC) find their first key with a
+binary search and read only the keys they return.
+
+Keys set with "SET key value TTL seconds" expire at the timestamp of their
+SET entry plus the TTL. Time always comes from the log (the leader stamps
+every entry), so every replica agrees on which keys are expired. Deadlines
+are also kept in a min-heap: the leader pops the keys that are due from it,
+without looking at any other key, and deletes them through the log with one
+EXPIRE entry per batch. Until that entry applies, reads already treat the
+keys as missing.
+
+Every key also carries its revision: the log index of the write that set
+it. "CAS key revision value" writes only if the key's revision still
+matches (0 = the key must not exist), so optimistic updates need neither a
+lock nor a read through the log first. With a history window the store
+also keeps the versions superseded in that many recent log indexes, and
+any replica that has applied a revision can answer reads as of it
+(get_at). Older versions are compacted whenever the store saves its state,
+which doubles as its snapshot.
+
+In value-log mode (see value_log.py) large values are held as references
+into the node's ValueLog, and every read resolves them.
 """
+import bisect
+import heapq
 import json
+import math
 import os
 import threading
-from typing import Optional, Dict
+import time
+from collections import deque
+from typing import Deque, Optional, Dict, List, Tuple
+
+from logger import get_logger
+from durability import DurabilityPolicy
+from watch import WatchHub
+
+
+DEFAULT_SCAN_LIMIT = 100  # keys per page when the request gives no limit
+MAX_SCAN_LIMIT = 1000  # most keys per page
+
+
+def prefix_end(prefix: str) -> str:
+    """
+    Smallest string greater than every string starting with prefix
+    
+    Returns:
+        The exclusive upper bound of a prefix scan ("" if there is none)
+    """
+    prefix = prefix.rstrip(chr(0x10FFFF))
+    if not prefix:
+        return ""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def split_ttl(value: str) -> Tuple[str, float]:
+    """
+    Split a "value TTL seconds" argument of SET or CAS
+    
+    Only a trailing TTL followed by a number is taken as a TTL; other text
+    ending in "TTL <word>" is part of the value.
+    
+    Returns:
+        (value, TTL in seconds); the TTL is 0 if the argument has none
+    
+    Raises:
+        ValueError: If the TTL is a number but not a positive one
+    """
+    words = value.rsplit(maxsplit=2)
+    if len(words) < 3 or words[1].upper() != "TTL":
+        return value, 0.0
+    try:
+        ttl = float(words[2])
+    except ValueError:
+        return value, 0.0
+    if not math.isfinite(ttl):
+        return value, 0.0
+    if ttl <= 0:
+        raise ValueError("TTL must be a positive number of seconds")
+    return words[0], ttl
+
+
+class MissingValue(Exception):
+    """A value log reference's value is missing (lost in a crash)"""
+
+
+class RevisionCompacted(Exception):
+    """A read asked for a revision whose versions were compacted"""
+    
+    def __init__(self, message: str, horizon: int):
+        """
+        Args:
+            message: What was asked for
+            horizon: Earliest revision reads may still ask for
+        """
+        super().__init__(message)
+        self.horizon = horizon
 
 
 class KeyValueStore:
     """Thread-safe file-based key-value storage"""
     
-    def __init__(self, node_id: str, data_dir: str = "data"):
+    def __init__(self, node_id: str, data_dir: str = "data", metrics=None,
+                 session_timeout: float = 3600.0, durability: DurabilityPolicy = None,
+                 watch_capacity: int = 4096, history_window: int = 0, value_log=None):
         """
         Initialize the key-value store
         
         Args:
             node_id: Unique identifier for this node
             data_dir: Directory to store data files
+            metrics: Optional NodeMetrics to report save timings to
+            session_timeout: Seconds (of leader time) after which an idle client session expires
+            durability: How saves reach the disk (default: fsync on every save)
+            watch_capacity: Applied mutations kept for watchers to catch up on
+            history_window: Log indexes of superseded versions kept for reads at
+                earlier revisions (0 = keep none)
+            value_log: Optional ValueLog that values held as references live in
         """
         self.node_id = node_id
         self.data_dir = data_dir
         self.db_file = os.path.join(data_dir, f"node_{node_id}_db.json")
+        self.logger = get_logger("KVStore", node_id)
+        self.metrics = metrics
+        self.durability = durability or DurabilityPolicy(node_id, metrics=metrics)
+        self.value_log = value_log
         self.lock = threading.RLock()
         self.data: Dict[str, str] = {}
+        self.sorted_keys: List[str] = []  # keys of data in order, for scans
+        self.expiry: Dict[str, float] = {}  # {key: deadline} of keys set with a TTL
+        self.expiry_heap: List[Tuple[float, str]] = []  # (deadline, key), may hold stale pairs
+        self.revisions: Dict[str, int] = {}  # {key: log index of its last write}
+        
+        # Versions superseded in the last history_window log indexes (see get_at)
+        self.history_window = history_window
+        self.history: Dict[str, List[Tuple[int, Optional[str]]]] = {}  # {key: [(revision, value or None if deleted)]}
+        self.superseded: Deque[Tuple[int, str]] = deque()  # (index, key) as versions join the history
+        self.history_horizon = 0  # reads before this revision may miss compacted versions
+        self.applied_index = 0  # highest log index reflected in data (and sessions)
+        
+        # Client sessions: {client_id: {"acked": seq, "results": {seq: result}, "last_active": time}}
+        self.sessions: Dict[str, dict] = {}
+        self.session_timeout = session_timeout
+        self.last_expiry = 0.0
+        
+        # Disk I/O counters (see get_io_stats)
+        self.io_stats = {"db_writes": 0, "bytes_written": 0}
         
         # Create data directory if it doesn't exist
         os.makedirs(data_dir, exist_ok=True)
         
         # Load existing data
         self._load()
+        
+        # Change feed; mutations applied before this restart cannot be watched
+        self.watch_hub = WatchHub(watch_capacity, self.applied_index)
+        # Nor can earlier revisions be read: the history is not saved
+        self.history_horizon = self.applied_index
     
     def _load(self):
-        """Load data from disk"""
+        """Load data, applied index and sessions from disk"""
         try:
             if os.path.exists(self.db_file):
                 with open(self.db_file, 'r') as f:
-                    self.data = json.load(f)
-                print(f"[KVStore-{self.node_id}] Loaded {len(self.data)} entries from disk")
+                    content = json.load(f)
+                if isinstance(content.get("data"), dict):
+                    self.data = content["data"]
+                    self.applied_index = content.get("applied_index", 0)
+                    self.last_expiry = content.get("last_expiry", 0.0)
+                    self.expiry = content.get("expiry", {})
+                    self.revisions = content.get("revisions", {})
+                    # JSON object keys are strings; sequence numbers are ints
+                    self.sessions = {
+                        client_id: dict(session, results={int(seq): result for seq, result in session["results"].items()})
+                        for client_id, session in content.get("sessions", {}).items()
+                    }
+                else:
+                    # Older files hold only the data (values are strings, so never a "data" dict)
+                    self.data = content
+                self.sorted_keys = sorted(self.data)
+                self._rebuild_expiry_heap()
+                self.logger.info(f"Loaded {len(self.data)} entries from disk, applied index {self.applied_index}")
         except Exception as e:
-            print(f"[KVStore-{self.node_id}] Error loading data: {e}")
+            self.logger.error(f"Error loading data: {e}")
             self.data = {}
+            self.sorted_keys = []
+            self.expiry = {}
+            self.expiry_heap = []
+            self.revisions = {}
+            self.applied_index = 0
+            self.sessions = {}
     
     def _save(self):
-        """Save data to disk"""
+        """Save data, applied index and sessions to disk (atomically, see DurabilityPolicy)"""
+        start = time.perf_counter()
         try:
-            with open(self.db_file, 'w') as f:
-                json.dump(self.data, f, indent=2)
+            content = json.dumps({
+                "applied_index": self.applied_index,
+                "last_expiry": self.last_expiry,
+                "sessions": self.sessions,
+                "expiry": self.expiry,
+                "revisions": self.revisions,
+                "data": self.data,
+            }, indent=2)
+            self.durability.write(self.db_file, content)
+            self.io_stats["db_writes"] += 1
+            self.io_stats["bytes_written"] += len(content)
         except Exception as e:
-            print(f"[KVStore-{self.node_id}] Error saving data: {e}")
+            self.logger.error(f"Error saving data: {e}")
+        
+        if self.metrics:
+            self.metrics.kv_save_seconds.observe(time.perf_counter() - start)
+    
+    def get_io_stats(self) -> Dict[str, int]:
+        """Get a copy of the disk write counters"""
+        with self.lock:
+            return dict(self.io_stats)
     
     def set(self, key: str, value: str) -> bool:
         """
@@ -61,25 +238,62 @@ class KeyValueStore:
             True if successful
         """
         with self.lock:
-            self.data[key] = value
+            self._put(key, value)
             self._save()
-            print(f"[KVStore-{self.node_id}] SET {key}={value}")
+            self.logger.debug("SET %s=%s", key, value)
             return True
     
-    def get(self, key: str) -> Optional[str]:
+    def get(self, key: str, now: float = 0.0) -> Optional[str]:
         """
         Get value for a key
         
         Args:
             key: Key to retrieve
+            now: Current time; a key whose TTL has passed by then counts as
+                missing (0 = ignore TTLs)
             
         Returns:
             Value if key exists, None otherwise
         """
         with self.lock:
-            value = self.data.get(key)
-            print(f"[KVStore-{self.node_id}] GET {key}={value}")
-            return value
+            value = None if self._expired(key, now) else self.data.get(key)
+            self.logger.debug("GET %s=%s", key, value)
+            return self.resolve_value(value)
+    
+    def revision(self, key: str) -> int:
+        """Get the log index of a key's last write (0 if the key does not exist)"""
+        with self.lock:
+            return self.revisions.get(key, 0) if key in self.data else 0
+    
+    def get_at(self, key: str, revision: int) -> Tuple[Optional[str], int]:
+        """
+        Get the value a key had once the log was applied up to a revision
+        
+        Every replica that has applied the revision gives the same answer,
+        so such reads need no leader. Expired keys count as present until
+        their EXPIRE entry.
+        
+        Args:
+            key: Key to retrieve
+            revision: Log index to read as of (at most applied_index)
+            
+        Returns:
+            (value or None if the key did not exist, revision of that value)
+        
+        Raises:
+            RevisionCompacted: If revision is before history_horizon
+        """
+        with self.lock:
+            if revision < self.history_horizon:
+                raise RevisionCompacted(
+                    f"Revision {revision} is compacted (history starts at {self.history_horizon})",
+                    self.history_horizon)
+            if key in self.data and self.revisions.get(key, 0) <= revision:
+                return self.resolve_value(self.data[key]), self.revisions.get(key, 0)
+            for version, value in reversed(self.history.get(key, [])):
+                if version <= revision:
+                    return self.resolve_value(value), version if value is not None else 0
+            return None, 0
     
     def delete(self, key: str) -> bool:
         """
@@ -93,63 +307,390 @@ class KeyValueStore:
         """
         with self.lock:
             if key in self.data:
-                del self.data[key]
+                self._remove(key)
                 self._save()
-                print(f"[KVStore-{self.node_id}] DELETE {key}")
+                self.logger.debug("DELETE %s", key)
                 return True
             return False
     
-    def apply_command(self, command: str) -> str:
+    def scan(self, start: str = "", end: str = "", prefix: str = "",
+             limit: int = DEFAULT_SCAN_LIMIT, now: float = 0.0) -> Tuple[List[Tuple[str, str]], str]:
+        """
+        Get one page of the keys in [start, end) that start with prefix, in order
+        
+        Costs O(log n + limit): the first key is found by binary search in the
+        sorted key index and the store is not copied.
+        
+        Args:
+            start: First key to return (inclusive); "" to start at the beginning
+            end: Key to stop before; "" for no upper bound
+            prefix: Only return keys starting with this
+            limit: Most keys to return (at most MAX_SCAN_LIMIT; 0 for DEFAULT_SCAN_LIMIT)
+            now: Current time; keys whose TTL has passed by then are left out, so
+                a page may hold fewer than limit keys (0 = ignore TTLs)
+            
+        Returns:
+            ([(key, value), ...], next_key) - pass next_key as start to get the
+            next page; it is "" after the last page
+        """
+        limit = min(limit or DEFAULT_SCAN_LIMIT, MAX_SCAN_LIMIT)
+        if prefix:
+            start = max(start, prefix)
+            upper = prefix_end(prefix)
+            if upper and (not end or upper < end):
+                end = upper
+        
+        with self.lock:
+            first = bisect.bisect_left(self.sorted_keys, start)
+            stop = bisect.bisect_left(self.sorted_keys, end) if end else len(self.sorted_keys)
+            last = min(stop, first + limit)
+            items = [(key, self.resolve_value(self.data[key])) for key in self.sorted_keys[first:last]
+                     if not self._expired(key, now)]
+            next_key = self.sorted_keys[last] if last < stop else ""
+            return items, next_key
+    
+    def resolve_value(self, value: Optional[str]) -> Optional[str]:
+        """
+        Get the value a stored value stands for (reading it from the value log if it is a reference)
+        
+        Raises:
+            MissingValue: If the reference's value is missing from the value log
+        """
+        if value is None or self.value_log is None:
+            return value
+        return self.value_log.resolve(value)
+    
+    def _describe(self, key: str, value: str) -> str:
+        """
+        Describe a write in its result: "key=value", or only the key for a value
+        in the value log (results are cached with the session, and reading the
+        value back would cost a read on every apply)
+        """
+        if self.value_log is not None and self.value_log.holds(value):
+            return key
+        return f"{key}={value}"
+    
+    def due_expiries(self, now: float, limit: int) -> List[str]:
+        """
+        Get keys whose TTL has passed, earliest deadline first
+        
+        Costs O(k log n) for k due keys: only the top of the expiry heap is
+        read. The keys stay in the store until an EXPIRE command deletes them.
+        
+        Args:
+            now: Current time
+            limit: Most keys to return
+        
+        Returns:
+            Up to limit expired keys
+        """
+        with self.lock:
+            due = {}
+            while self.expiry_heap and self.expiry_heap[0][0] <= now and len(due) < limit:
+                deadline, key = heapq.heappop(self.expiry_heap)
+                if self.expiry.get(key) == deadline:
+                    due.setdefault(key, deadline)
+            # Due keys stay in the heap until their EXPIRE applies; stale pairs are dropped
+            for key, deadline in due.items():
+                heapq.heappush(self.expiry_heap, (deadline, key))
+            return list(due)
+    
+    def _expired(self, key: str, now: float) -> bool:
+        """True if key has a TTL that has passed at now (never when now is 0)"""
+        deadline = self.expiry.get(key)
+        return bool(now and deadline and deadline <= now)
+    
+    def _put(self, key: str, value: str, deadline: float = 0.0, revision: int = 0):
+        """
+        Set a key in memory, adding it to the sorted key index if it is new
+        
+        Args:
+            key: Key to set
+            value: Value to store
+            deadline: Time the key expires at (0 = never; clears an earlier TTL)
+            revision: Log index of the write (0 if not from the log)
+        """
+        if key in self.data:
+            self._retire(key, revision)
+        else:
+            bisect.insort(self.sorted_keys, key)
+            if key in self.history:
+                self.superseded.append((revision, key))  # the deletion marker
+        self.data[key] = value
+        self.revisions[key] = revision
+        if deadline:
+            self.expiry[key] = deadline
+            heapq.heappush(self.expiry_heap, (deadline, key))
+            # Overwritten deadlines stay in the heap until popped; followers never pop
+            if len(self.expiry_heap) > 2 * len(self.expiry) + 64:
+                self._rebuild_expiry_heap()
+        else:
+            self.expiry.pop(key, None)
+    
+    def _remove(self, key: str, revision: int = 0):
+        """Delete an existing key in memory and from the sorted key index, at a log index"""
+        self._retire(key, revision, deleted=True)
+        del self.data[key]
+        del self.sorted_keys[bisect.bisect_left(self.sorted_keys, key)]
+        self.expiry.pop(key, None)
+        self.revisions.pop(key, None)
+    
+    def _retire(self, key: str, index: int, deleted: bool = False):
+        """Move the current version of a key into the history, superseded at index"""
+        if not self.history_window:
+            self.history_horizon = max(self.history_horizon, index)
+            return
+        versions = self.history.setdefault(key, [])
+        versions.append((self.revisions.get(key, 0), self.data[key]))
+        if deleted:
+            versions.append((index, None))
+        self.superseded.append((index, key))
+    
+    def _compact_history(self):
+        """Drop the versions superseded more than history_window indexes before applied_index"""
+        cutoff = self.applied_index - self.history_window
+        while self.superseded and self.superseded[0][0] <= cutoff:
+            index, key = self.superseded.popleft()
+            versions = self.history[key]
+            del versions[0]
+            # A lone deletion marker says no more than a missing key does
+            if not versions or (len(versions) == 1 and versions[0][1] is None and key not in self.data):
+                del self.history[key]
+            self.history_horizon = max(self.history_horizon, index)
+    
+    def _rebuild_expiry_heap(self):
+        """Rebuild the expiry heap from the current deadlines, dropping stale pairs"""
+        self.expiry_heap = [(deadline, key) for key, deadline in self.expiry.items()]
+        heapq.heapify(self.expiry_heap)
+    
+    def apply_command(self, command: str, client_id: str = "", sequence: int = 0,
+                      acked: int = 0, timestamp: float = 0.0, index: int = 0) -> str:
         """
         Apply a command to the store
         
+        A command sent in a client session is applied at most once: a
+        duplicate (retry) of a sequence number already applied is answered
+        with the cached result instead.
+        
         Args:
             command: Command string in format "SET key value" or "GET key" or "DELETE key"
+            client_id: Client session of the command ("" for none)
+            sequence: Client's sequence number of the command
+            acked: Client has responses for every sequence up to this (their results are dropped)
+            timestamp: Leader's clock when the command was appended
+            index: Log index of the command, saved with the data it changes (0 if not from the log)
             
         Returns:
             Result message
         """
+        return self.apply_batch([(command, client_id, sequence, acked, timestamp, index)])[0]
+    
+    def apply_batch(self, commands: List[tuple]) -> List[str]:
+        """
+        Apply several commands in order with at most one save
+        
+        Args:
+            commands: (command, client_id, sequence, acked, timestamp, index) tuples,
+                as the arguments of apply_command
+            
+        Returns:
+            Result message of each command
+        """
+        with self.lock:
+            results = []
+            changes = []
+            for command, client_id, sequence, acked, timestamp, index in commands:
+                result, command_changes = self._apply(command, client_id, sequence, acked, timestamp, index)
+                results.append(result)
+                changes.extend((index, *change) for change in command_changes)
+                if index:
+                    self.applied_index = index
+            # Commands that change nothing are not saved: replaying them after a restart is harmless
+            if changes:
+                self._compact_history()
+                self._save()
+                self.watch_hub.publish(changes)
+            return results
+    
+    def _apply(self, command: str, client_id: str, sequence: int, acked: int, timestamp: float,
+               index: int = 0):
+        """
+        Apply a command in memory
+        
+        Returns:
+            (result message, [(op, key, value), ...] of the changes)
+        """
+        if not client_id:
+            return self._execute(command, timestamp, index)
+        
+        with self.lock:
+            self._expire_sessions(timestamp)
+            session = self.sessions.setdefault(client_id, {"acked": 0, "results": {}, "last_active": timestamp})
+            session["last_active"] = max(session["last_active"], timestamp)
+            if acked > session["acked"]:
+                session["acked"] = acked
+                session["results"] = {seq: result for seq, result in session["results"].items() if seq > acked}
+            
+            cached = self._cached_result(session, sequence)
+            if cached is not None:
+                if self.metrics:
+                    self.metrics.duplicate_commands.inc()
+                self.logger.debug("Duplicate %s #%s not re-applied", client_id, sequence)
+                return cached, []
+            
+            result, changes = self._execute(command, timestamp, index)
+            session["results"][sequence] = result
+            return result, changes
+    
+    def session_result(self, client_id: str, sequence: int) -> Optional[str]:
+        """
+        Get the result of a session command if it was already applied
+        
+        Returns:
+            The cached result, or None if the command has not been applied
+        """
+        with self.lock:
+            session = self.sessions.get(client_id)
+            return self._cached_result(session, sequence) if session else None
+    
+    def _cached_result(self, session: dict, sequence: int) -> Optional[str]:
+        """Result of an already applied sequence number, or None"""
+        if sequence in session["results"]:
+            return session["results"][sequence]
+        if sequence <= session["acked"]:
+            return "ERROR: Duplicate of an acknowledged request"
+        return None
+    
+    def _expire_sessions(self, now: float):
+        """Drop idle sessions (now comes from the log, so every replica expires the same ones)"""
+        if now - self.last_expiry < self.session_timeout / 10:
+            return
+        self.last_expiry = now
+        for client_id in [c for c, s in self.sessions.items() if now - s["last_active"] > self.session_timeout]:
+            del self.sessions[client_id]
+            self.logger.debug("Expired session %s", client_id)
+    
+    def _execute(self, command: str, timestamp: float = 0.0, index: int = 0):
+        """
+        Execute a command against the data in memory (the caller saves)
+        
+        Args:
+            command: Command string
+            timestamp: Leader's clock when the command was appended, used as
+                the current time for TTLs (0 = ignore TTLs)
+            index: Log index of the command, the revision of what it writes
+        
+        Returns:
+            (result message, [(op, key, value), ...] of the changes)
+        """
         parts = command.split(maxsplit=2)
         if not parts:
-            return "ERROR: Empty command"
+            return "ERROR: Empty command", []
         
         cmd = parts[0].upper()
         
         if cmd == "SET":
             if len(parts) < 3:
-                return "ERROR: SET requires key and value"
-            key, value = parts[1], parts[2]
-            self.set(key, value)
-            return f"OK: SET {key}={value}"
+                return "ERROR: SET requires key and value", []
+            key = parts[1]
+            try:
+                value, ttl = split_ttl(parts[2])  # SET key value [TTL seconds]
+            except ValueError as e:
+                return f"ERROR: {e}", []
+            self._put(key, value, timestamp + ttl if ttl else 0.0, index)
+            self.logger.debug("SET %s=%s", key, value)
+            return f"OK: SET {self._describe(key, value)}", [("SET", key, value)]
+        
+        elif cmd == "CAS":
+            # CAS key revision value [TTL seconds]; revision 0 = the key must not exist
+            args = command.split(maxsplit=3)
+            if len(args) < 4 or not args[2].isdigit():
+                return "ERROR: CAS requires key, revision and value", []
+            key, expected = args[1], int(args[2])
+            try:
+                value, ttl = split_ttl(args[3])
+            except ValueError as e:
+                return f"ERROR: {e}", []
+            current = self.revisions.get(key, 0) if key in self.data and not self._expired(key, timestamp) else 0
+            if current != expected:
+                return f"ERROR: CAS {key} revision is {current}, expected {expected}", []
+            self._put(key, value, timestamp + ttl if ttl else 0.0, index)
+            self.logger.debug("CAS %s=%s at %s", key, value, index)
+            return f"OK: CAS {self._describe(key, value)} revision {index}", [("SET", key, value)]
         
         elif cmd == "GET":
             if len(parts) < 2:
-                return "ERROR: GET requires key"
+                return "ERROR: GET requires key", []
             key = parts[1]
-            value = self.get(key)
+            try:
+                value = self.get(key, timestamp)
+            except MissingValue as e:
+                return f"ERROR: {e}", []
             if value is not None:
-                return f"OK: {value}"
-            return f"ERROR: Key '{key}' not found"
+                return f"OK: {value}", []
+            return f"ERROR: Key '{key}' not found", []
         
         elif cmd == "DELETE":
             if len(parts) < 2:
-                return "ERROR: DELETE requires key"
+                return "ERROR: DELETE requires key", []
             key = parts[1]
-            if self.delete(key):
-                return f"OK: Deleted {key}"
-            return f"ERROR: Key '{key}' not found"
+            if key in self.data:
+                self._remove(key, index)
+                self.logger.debug("DELETE %s", key)
+                return f"OK: Deleted {key}", [("DELETE", key, "")]
+            return f"ERROR: Key '{key}' not found", []
+        
+        elif cmd == "EXPIRE":
+            # EXPIRE key ...; proposed by the leader, deletes the keys whose TTL has passed
+            expired = [key for key in command.split()[1:] if key in self.data and self._expired(key, timestamp)]
+            for key in expired:
+                self._remove(key, index)
+            if expired and self.metrics:
+                self.metrics.expired_keys.inc(len(expired))
+            self.logger.debug("EXPIRE %s keys", len(expired))
+            return f"OK: Expired {len(expired)} keys", [("EXPIRE", key, "") for key in expired]
+        
+        elif cmd == "SCAN":
+            # SCAN start end [limit]; the next page starts at the returned "next" key
+            args = command.split()[1:]
+            if len(args) not in (2, 3) or (len(args) == 3 and not args[2].isdigit()):
+                return "ERROR: SCAN requires start, end and an optional limit", []
+            limit = int(args[2]) if len(args) == 3 else DEFAULT_SCAN_LIMIT
+            items, next_key = self.scan(start=args[0], end=args[1], limit=limit, now=timestamp)
+            return "OK: " + json.dumps({"items": items, "next": next_key}), []
+        
+        elif cmd == "PREFIX":
+            # PREFIX prefix [limit [start]]; pass the returned "next" key as start for the next page
+            args = command.split()[1:]
+            if not 1 <= len(args) <= 3 or (len(args) >= 2 and not args[1].isdigit()):
+                return "ERROR: PREFIX requires a prefix and an optional limit and start", []
+            limit = int(args[1]) if len(args) >= 2 else DEFAULT_SCAN_LIMIT
+            start = args[2] if len(args) == 3 else ""
+            items, next_key = self.scan(start=start, prefix=args[0], limit=limit, now=timestamp)
+            return "OK: " + json.dumps({"items": items, "next": next_key}), []
+        
+        elif cmd == "NOOP":
+            return "OK: NOOP", []
         
         else:
-            return f"ERROR: Unknown command '{cmd}'"
+            return f"ERROR: Unknown command '{cmd}'", []
     
     def get_all(self) -> Dict[str, str]:
         """Get all key-value pairs"""
         with self.lock:
-            return self.data.copy()
+            if self.value_log is None:
+                return self.data.copy()
+            return {key: self.resolve_value(value) for key, value in self.data.items()}
     
     def clear(self):
         """Clear all data (for testing)"""
         with self.lock:
             self.data = {}
+            self.sorted_keys = []
+            self.expiry = {}
+            self.expiry_heap = []
+            self.revisions = {}
+            self.history = {}
+            self.superseded.clear()
             self._save()
-            print(f"[KVStore-{self.node_id}] Cleared all data")
+            self.logger.info("Cleared all data")
@@ -0,0 +1,98 @@
+"""
+Structured, leveled logging for RAFT nodes
+
+Records go through a queue so hot paths (often holding state.lock) never
+block on console I/O; a background listener thread does the writing.
+"""
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import time
+
+# Root of all RAFT loggers, e.g. "raft.Node.node1", "raft.State.node1"
+ROOT_LOGGER = "raft"
+
+_listener = None
+
+
+class _TextFormatter(logging.Formatter):
+    """Human-readable format: time level [Component-node] message"""
+    
+    def format(self, record):
+        timestamp = time.strftime("%H:%M:%S", time.localtime(record.created))
+        component = getattr(record, "component", record.name)
+        node_id = getattr(record, "node_id", "-")
+        line = (f"{timestamp}.{int(record.msecs):03d} {record.levelname:<7} "
+                f"[{component}-{node_id}] {record.getMessage()}")
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+class _JsonFormatter(logging.Formatter):
+    """One JSON object per line, for log shippers"""
+    
+    def format(self, record):
+        data = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "component": getattr(record, "component", record.name),
+            "node": getattr(record, "node_id", None),
+            "msg": record.getMessage(),
+        }
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data)
+
+
+def get_logger(component: str, node_id: str) -> logging.LoggerAdapter:
+    """
+    Get the logger for one component of a node
+    
+    Args:
+        component: Component name ("Node", "State", "KVStore", ...)
+        node_id: Node identifier
+    
+    Returns:
+        Logger adapter tagging every record with component and node id
+    """
+    logger = logging.getLogger(f"{ROOT_LOGGER}.{component}.{node_id}")
+    return logging.LoggerAdapter(logger, {"component": component, "node_id": node_id})
+
+
+def setup_logging(level: str = "WARNING", fmt: str = "text", stream=None):
+    """
+    Route all RAFT loggers through a queue-backed handler
+    
+    Args:
+        level: Minimum level name (DEBUG, INFO, WARNING, ERROR)
+        fmt: "text" or "json"
+        stream: Output stream (default: stdout)
+    """
+    global _listener
+    
+    if _listener is not None:
+        _listener.stop()
+    
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(_JsonFormatter() if fmt == "json" else _TextFormatter())
+    
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger(ROOT_LOGGER)
+    root.handlers = [logging.handlers.QueueHandler(log_queue)]
+    root.setLevel(level.upper())
+    root.propagate = False
+    
+    _listener = logging.handlers.QueueListener(log_queue, handler)
+    _listener.start()
+
+
+def shutdown_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,297 @@
+"""
+Low-overhead metrics for RAFT nodes, exported in Prometheus text format
+
+Counters, gauges and fixed-bucket histograms each take one small lock per
+update, so they are cheap enough to leave on in production.
+"""
+import bisect
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Default latency buckets in seconds (100us .. 10s)
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Default size buckets (entries per batch, bytes, ...)
+SIZE_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 5000)
+
+# Compression ratio buckets (uncompressed / compressed size)
+RATIO_BUCKETS = (1, 1.25, 1.5, 2, 3, 4, 6, 8, 12, 16, 32)
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...], extra: str = "") -> str:
+    """Render a label tuple as {a="1",b="2"}"""
+    parts = [f'{key}="{value}"' for key, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    """Monotonically increasing value"""
+    
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+    
+    def inc(self, amount=1):
+        """Increase the counter"""
+        with self._lock:
+            self.value += amount
+    
+    def samples(self, name, labels):
+        return [f"{name}{_format_labels(labels)} {self.value}"]
+
+
+class Gauge:
+    """Value that can go up and down"""
+    
+    def __init__(self):
+        self.value = 0
+    
+    def set(self, value):
+        """Set the current value"""
+        self.value = value
+    
+    def samples(self, name, labels):
+        return [f"{name}{_format_labels(labels)} {self.value}"]
+
+
+class Histogram:
+    """Distribution of observations over fixed buckets"""
+    
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+    
+    def observe(self, value):
+        """Record one observation"""
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[slot] += 1
+            self.sum += value
+            self.count += 1
+    
+    def samples(self, name, labels):
+        with self._lock:
+            counts = list(self.counts)
+            total, count = self.sum, self.count
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            bucket_labels = _format_labels(labels, 'le="%s"' % bound)
+            lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+        bucket_labels = _format_labels(labels, 'le="+Inf"')
+        lines.append(f"{name}_bucket{bucket_labels} {count}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+        lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Collection of named, labelled metrics for one process"""
+    
+    def __init__(self):
+        # {name: (type, help, {labels: metric})}
+        self._metrics: Dict[str, Tuple[str, str, Dict[tuple, object]]] = {}
+        self._collectors: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+    
+    def _get(self, kind: str, name: str, help_text: str, labels: Optional[dict], factory):
+        key = tuple(sorted((labels or {}).items()))
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = (kind, help_text, {})
+            series = self._metrics[name][2]
+            if key not in series:
+                series[key] = factory()
+            return series[key]
+    
+    def counter(self, name: str, help_text: str, labels: dict = None) -> Counter:
+        """Get or create a counter"""
+        return self._get("counter", name, help_text, labels, Counter)
+    
+    def gauge(self, name: str, help_text: str, labels: dict = None) -> Gauge:
+        """Get or create a gauge"""
+        return self._get("gauge", name, help_text, labels, Gauge)
+    
+    def histogram(self, name: str, help_text: str, labels: dict = None,
+                  buckets=LATENCY_BUCKETS) -> Histogram:
+        """Get or create a histogram"""
+        return self._get("histogram", name, help_text, labels, lambda: Histogram(buckets))
+    
+    def add_collector(self, collector: Callable[[], None]):
+        """Register a callback that refreshes gauges right before rendering"""
+        with self._lock:
+            self._collectors.append(collector)
+    
+    def render(self) -> str:
+        """Render all metrics in Prometheus text exposition format"""
+        for collector in list(self._collectors):
+            collector()
+        
+        lines = []
+        with self._lock:
+            metrics = [(name, kind, help_text, dict(series))
+                       for name, (kind, help_text, series) in sorted(self._metrics.items())]
+        for name, kind, help_text, series in metrics:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, metric in series.items():
+                lines.extend(metric.samples(name, labels))
+        return "\n".join(lines) + "\n"
+
+
+class InstrumentedRLock:
+    """
+    Re-entrant lock recording how long threads wait for it and hold it
+    
+    Only the outermost acquisition of a thread is measured.
+    """
+    
+    def __init__(self, wait_histogram: Histogram, hold_histogram: Histogram):
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self.wait_histogram = wait_histogram
+        self.hold_histogram = hold_histogram
+    
+    def acquire(self, blocking=True, timeout=-1):
+        local = self._local
+        depth = getattr(local, "depth", 0)
+        if depth:
+            self._lock.acquire()
+            local.depth = depth + 1
+            return True
+        
+        start = time.perf_counter()
+        acquired = self._lock.acquire(blocking, timeout)
+        if acquired:
+            local.acquired_at = time.perf_counter()
+            local.depth = 1
+            self.wait_histogram.observe(local.acquired_at - start)
+        return acquired
+    
+    def release(self):
+        local = self._local
+        local.depth -= 1
+        if local.depth == 0:
+            held = time.perf_counter() - local.acquired_at
+            self._lock.release()
+            self.hold_histogram.observe(held)
+        else:
+            self._lock.release()
+    
+    def __enter__(self):
+        self.acquire()
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+class NodeMetrics:
+    """All instruments of one Raft node (or one group of a Multi-Raft node)"""
+    
+    def __init__(self, registry: MetricsRegistry, node_id: str, group_id: int = 0):
+        self.registry = registry
+        labels = {"node": node_id, "group": str(group_id)}
+        self.labels = labels
+        
+        self.proposal_commit_seconds = registry.histogram(
+            "raft_proposal_commit_seconds", "Time from SubmitCommand append to commit on the leader", labels)
+        self.commit_apply_seconds = registry.histogram(
+            "raft_commit_apply_seconds", "Time from commit to apply to the key-value store", labels)
+        self.append_entries_rpc_seconds = registry.histogram(
+            "raft_append_entries_rpc_seconds", "AppendEntries RPC round-trip latency", labels)
+        self.append_entries_batch_size = registry.histogram(
+            "raft_append_entries_batch_entries", "Entries per AppendEntries request", labels, SIZE_BUCKETS)
+        self.append_entries_bytes = registry.counter(
+            "raft_append_entries_payload_bytes_total", "Entry payload bytes sent in AppendEntries (after compression)",
+            labels)
+        self.compression_ratio = registry.histogram(
+            "raft_append_entries_compression_ratio", "Uncompressed / compressed size of compressed batches",
+            labels, RATIO_BUCKETS)
+        self.compression_decisions = {
+            decision: registry.counter(
+                "raft_append_entries_compression_total", "AppendEntries batches by compression decision",
+                {**labels, "decision": decision})
+            for decision in ("compressed", "below_threshold", "incompressible")
+        }
+        self.state_save_seconds = registry.histogram(
+            "raft_state_save_seconds", "Time spent in RaftState._save_state", labels)
+        self.kv_save_seconds = registry.histogram(
+            "raft_kvstore_save_seconds", "Time spent in KeyValueStore._save", labels)
+        self.fsync_seconds = registry.histogram(
+            "raft_fsync_seconds", "Time spent in fsync of state and store files", labels)
+        self.lock_wait_seconds = registry.histogram(
+            "raft_state_lock_wait_seconds", "Time spent waiting for state.lock", labels)
+        self.lock_hold_seconds = registry.histogram(
+            "raft_state_lock_hold_seconds", "Time state.lock is held per acquisition", labels)
+        self.elections = registry.counter(
+            "raft_elections_total", "Elections started by this node", labels)
+        self.elections_won = registry.counter(
+            "raft_elections_won_total", "Elections won by this node", labels)
+        self.term_changes = registry.counter(
+            "raft_term_changes_total", "Times the current term changed", labels)
+        self.forwarded_proposals = registry.counter(
+            "raft_forwarded_proposals_total", "Client requests a follower forwarded to the leader", labels)
+        self.rejected_proposals = {
+            reason: registry.counter(
+                "raft_rejected_proposals_total", "Commands rejected by the leader's admission limits",
+                {**labels, "reason": reason})
+            for reason in ("uncommitted_entries", "uncommitted_bytes")
+        }
+        self.watch_disconnects = registry.counter(
+            "raft_watch_disconnects_total", "Watchers disconnected for falling behind the change feed", labels)
+        self.expired_keys = registry.counter(
+            "raft_expired_keys_total", "Keys deleted by an EXPIRE entry because their TTL passed", labels)
+        self.duplicate_commands = registry.counter(
+            "raft_duplicate_commands_total", "Session commands answered from the session table, not re-applied",
+            labels)
+    
+    def instrumented_lock(self) -> InstrumentedRLock:
+        """Create a state lock reporting wait and hold times"""
+        return InstrumentedRLock(self.lock_wait_seconds, self.lock_hold_seconds)
+    
+    def gauge(self, name: str, help_text: str, **extra_labels) -> Gauge:
+        """Get a gauge carrying this node's labels plus extra ones"""
+        return self.registry.gauge(name, help_text, {**self.labels, **extra_labels})
+
+
+class MetricsServer:
+    """Serves GET /metrics over HTTP from a background thread"""
+    
+    def __init__(self, registry: MetricsRegistry, host: str, port: int):
+        registry_ref = registry
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry_ref.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, format, *args):
+                pass  # Keep scrapes out of the node's log
+        
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+    
+    def start(self):
+        """Start serving"""
+        self.thread.start()
+    
+    def stop(self):
+        """Stop serving"""
+        self.httpd.shutdown()
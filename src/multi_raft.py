@@ -0,0 +1,354 @@
+"""
+Multi-Raft - many independent Raft groups hosted in one process
+"""
+import grpc
+from concurrent import futures
+import threading
+import time
+import sys
+import os
+
+# Add proto directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'proto'))
+
+import raft_pb2
+import raft_pb2_grpc
+
+from node import RaftNode, RaftServicer
+from router import HashRouter, key_of
+from logger import get_logger
+from metrics import MetricsRegistry
+from transport import GrpcTransport, SERVER_OPTIONS
+from admission import CONSENSUS_WORKERS
+
+
+class MultiRaftNode:
+    """
+    Hosts one replica of every Raft group behind a single gRPC server
+    
+    Each group is a full RaftNode with its own RaftState and KeyValueStore,
+    stored under data/group_<id>/. Groups share the peer channels, and the
+    heartbeats of all groups led by this process are coalesced into one
+    BatchAppendEntries RPC per peer.
+    """
+    
+    def __init__(self, node_id: str, host: str, port: int, peers: dict, num_groups: int,
+                 router=None, election_timeout_range=(150, 300), heartbeat_interval=50,
+                 data_dir: str = "data", quiesce_interval=500, compression: str = "zlib",
+                 compression_threshold: int = 64 * 1024, durability: str = "always",
+                 durability_interval=10, forward_proposals: bool = False,
+                 max_uncommitted_entries: int = 10000, max_uncommitted_bytes: int = 64 * 1024 * 1024,
+                 max_client_rpcs: int = 32, max_watchers: int = 64, watch_capacity: int = 4096,
+                 max_expiry_batch: int = 1000, history_window: int = 0, value_log_threshold: int = 0,
+                 transport=None):
+        """
+        Initialize the Multi-Raft node
+        
+        Args:
+            node_id: Unique identifier for this node
+            host: Host address
+            port: Port number
+            peers: Dictionary of {node_id: "host:port"} for all peers (excluding self)
+            num_groups: Number of Raft groups hosted (group ids 0..num_groups-1)
+            router: Key router deciding which group owns a key (default: HashRouter)
+            election_timeout_range: Range for random election timeout in ms
+            heartbeat_interval: Leader heartbeat interval in ms
+            data_dir: Base directory for per-group persistent state
+            quiesce_interval: Slow heartbeat interval in ms for idle groups (0 disables)
+            compression: Codec for large AppendEntries batches ("zlib", "gzip" or "none")
+            compression_threshold: Smallest entry payload in bytes worth compressing
+            durability: When saves are fsynced: "always", "batch" or "none" (see durability.py)
+            durability_interval: Group fsync interval in ms for "batch"
+            forward_proposals: Followers forward client commands to their group's leader
+            max_uncommitted_entries: Per group, most entries a leader's log may run ahead
+                of its commit index (0 = no limit)
+            max_uncommitted_bytes: Per group, most command bytes a leader's log may run
+                ahead of its commit index (0 = no limit)
+            max_client_rpcs: Client RPCs served at once, for all groups together
+            max_watchers: Watch streams served at once, for all groups together
+            watch_capacity: Per group, applied mutations kept for watchers to catch up on
+            max_expiry_batch: Most keys a leader deletes for their TTL in one EXPIRE entry
+            history_window: Per group, log indexes of superseded versions kept for
+                reads at earlier revisions (0 = keep none)
+            value_log_threshold: Smallest value in bytes kept in each group's value log
+                (0 = no value log)
+            transport: Transport shared by all groups (default: a new GrpcTransport
+                connected to peers)
+        """
+        self.node_id = node_id
+        self.host = host
+        self.port = port
+        self.address = f"{host}:{port}"
+        self.peers = peers
+        self.heartbeat_interval = heartbeat_interval / 1000.0
+        self.max_client_rpcs = max_client_rpcs
+        self.max_watchers = max_watchers
+        self.router = router or HashRouter(num_groups)
+        self.logger = get_logger("MultiRaft", node_id)
+        self.metrics_registry = MetricsRegistry()
+        
+        if self.router.num_groups != num_groups:
+            raise ValueError(f"Router covers {self.router.num_groups} groups, expected {num_groups}")
+        
+        # gRPC connections to peers, shared by all groups
+        if transport is not None:
+            self.transport = transport
+        else:
+            self.transport = GrpcTransport()
+            for peer_id, peer_address in peers.items():
+                self.transport.connect(peer_id, peer_address)
+        self.inflight = {}  # {peer_id: send time} of outstanding BatchAppendEntries RPCs
+        self.inflight_lock = threading.Lock()
+        
+        self.groups = {}
+        for group_id in range(num_groups):
+            self.groups[group_id] = RaftNode(
+                node_id, host, port, peers,
+                election_timeout_range=election_timeout_range,
+                heartbeat_interval=heartbeat_interval,
+                group_id=group_id,
+                data_dir=os.path.join(data_dir, f"group_{group_id}"),
+                transport=self.transport,
+                quiesce_interval=quiesce_interval,
+                compression=compression,
+                compression_threshold=compression_threshold,
+                durability=durability,
+                durability_interval=durability_interval,
+                forward_proposals=forward_proposals,
+                max_uncommitted_entries=max_uncommitted_entries,
+                max_uncommitted_bytes=max_uncommitted_bytes,
+                watch_capacity=watch_capacity,
+                max_expiry_batch=max_expiry_batch,
+                history_window=history_window,
+                value_log_threshold=value_log_threshold,
+                metrics_registry=self.metrics_registry
+            )
+        
+        # One wake-up event shared by all groups, so any proposal wakes the sender
+        self.replicate_event = threading.Event()
+        for group in self.groups.values():
+            group.replicate_event = self.replicate_event
+        
+        self.running = False
+        self.heartbeat_thread = None
+        self.server = None
+    
+    def _group(self, group_id: int) -> RaftNode:
+        """Get a hosted group, raising for unknown group ids"""
+        group = self.groups.get(group_id)
+        if group is None:
+            raise ValueError(f"Unknown group {group_id}")
+        return group
+    
+    # ==================== RPC Handlers ====================
+    
+    def handle_request_vote(self, request):
+        """Dispatch RequestVote RPC to its group"""
+        return self._group(request.group_id).handle_request_vote(request)
+    
+    def handle_append_entries(self, request):
+        """Dispatch AppendEntries RPC to its group"""
+        return self._group(request.group_id).handle_append_entries(request)
+    
+    def handle_batch_append_entries(self, request):
+        """Handle coalesced AppendEntries RPCs for several groups"""
+        responses = [self.handle_append_entries(r) for r in request.requests]
+        return raft_pb2.BatchAppendEntriesResponse(responses=responses)
+    
+    def handle_submit_command(self, request):
+        """Dispatch client command to its group after checking key ownership"""
+        owner = self.router.group_for(key_of(request.command))
+        if request.group_id not in self.groups or owner != request.group_id:
+            return raft_pb2.ClientResponse(
+                success=False,
+                message=f"Key belongs to group {owner}",
+                leader_id="unknown",
+                group_id=owner
+            )
+        return self.groups[owner].handle_submit_command(request)
+    
+    def handle_submit_batch(self, request):
+        """Dispatch a command batch to its group if the group owns every key"""
+        owners = {self.router.group_for(key_of(command)) for command in request.commands}
+        if request.group_id not in self.groups or owners - {request.group_id}:
+            return raft_pb2.ClientBatchResponse(
+                success=False,
+                message=f"Keys belong to groups {sorted(owners)}",
+                leader_id="unknown",
+                group_id=request.group_id
+            )
+        return self.groups[request.group_id].handle_submit_batch(request)
+    
+    def handle_read(self, request):
+        """Dispatch local read to the group owning the key"""
+        owner = self.router.group_for(request.key)
+        if request.group_id not in self.groups or owner != request.group_id:
+            return raft_pb2.ReadResponse(
+                success=False,
+                message=f"Key belongs to group {owner}",
+                group_id=owner
+            )
+        return self.groups[owner].handle_read(request)
+    
+    def handle_scan(self, request):
+        """Dispatch a scan to its group (keys are spread over groups, so a full scan asks each one)"""
+        return self._group(request.group_id).handle_scan(request)
+    
+    def handle_read_index(self, request):
+        """Dispatch ReadIndex RPC to its group"""
+        return self._group(request.group_id).handle_read_index(request)
+    
+    def handle_watch(self, request, active):
+        """Dispatch a Watch stream to its group (a prefix spanning groups needs one watch per group)"""
+        return self._group(request.group_id).handle_watch(request, active)
+    
+    def handle_get_status(self, request):
+        """Dispatch GetStatus RPC to its group"""
+        return self._group(request.group_id).handle_get_status(request)
+    
+    def handle_isolate(self, request):
+        """Isolate every hosted group from the given nodes (for testing)"""
+        self.transport.isolate(request.isolated_nodes)
+        self.logger.warning(f"Isolated from: {set(request.isolated_nodes)}")
+        return raft_pb2.IsolateResponse(
+            success=True,
+            message=f"Isolated {len(self.groups)} groups from {len(request.isolated_nodes)} nodes"
+        )
+    
+    # ==================== Coalesced Heartbeats ====================
+    
+    def _send_batch_append_entries(self, peer_id: str, groups, on_done):
+        """
+        Send one BatchAppendEntries RPC covering the given groups led here, without waiting
+        
+        Like RaftNode._send_append_entries_async, a peer with a batch
+        outstanding that is younger than a heartbeat interval is skipped.
+        
+        Args:
+            peer_id: Peer to send to
+            groups: Groups due for a heartbeat
+            on_done: callback(acked) once the RPC finished or was skipped - acked
+                lists the groups whose leadership the peer acknowledged
+        """
+        with self.inflight_lock:
+            sent_at = time.monotonic()
+            if sent_at - self.inflight.get(peer_id, float("-inf")) < self.heartbeat_interval:
+                on_done([])
+                return
+            self.inflight[peer_id] = sent_at
+        
+        pending = []
+        for group in groups:
+            built = group._build_append_entries(peer_id)
+            if built is not None:
+                group._compress_entries(built[0])
+                pending.append((group, built))
+        
+        if not pending:
+            with self.inflight_lock:
+                del self.inflight[peer_id]
+            on_done([])
+            return
+        
+        request = raft_pb2.BatchAppendEntriesRequest(requests=[built[0] for _, built in pending])
+        start = time.perf_counter()
+        
+        def on_response(response):
+            with self.inflight_lock:
+                if self.inflight.get(peer_id) == sent_at:
+                    del self.inflight[peer_id]
+            if response is None:
+                on_done([])  # Silently ignore RPC failures
+                return
+            elapsed = time.perf_counter() - start
+            
+            acked = []
+            for (group, (_, next_index, num_entries)), group_response in zip(pending, response.responses):
+                group.metrics.append_entries_rpc_seconds.observe(elapsed)
+                group.metrics.append_entries_batch_size.observe(num_entries)
+                if group._handle_append_entries_response(peer_id, next_index, num_entries, group_response):
+                    acked.append(group)
+            on_done(acked)
+        
+        self.transport.send(peer_id, "BatchAppendEntries", request, 0.5, on_response)
+    
+    def _send_heartbeat_round(self, due):
+        """
+        Send one BatchAppendEntries to every peer in parallel without waiting
+        
+        Each group's round ends (see RaftNode._end_heartbeat_round) once every
+        peer has answered, so a slow or dead peer delays neither the others
+        nor the next round.
+        """
+        quiescent = {group.group_id: group.quiescent_round for group in due}
+        progress = {"pending": len(self.peers), "acks": {group.group_id: 0 for group in due}}
+        progress_lock = threading.Lock()
+        
+        def on_done(acked):
+            with progress_lock:
+                progress["pending"] -= 1
+                for group in acked:
+                    progress["acks"][group.group_id] += 1
+                finished = progress["pending"] == 0
+            if finished:
+                for group in due:
+                    group._end_heartbeat_round(progress["acks"][group.group_id], quiescent[group.group_id])
+        
+        for peer_id in self.peers:
+            self._send_batch_append_entries(peer_id, due, on_done)
+    
+    def _heartbeat_sender(self):
+        """Coalesced heartbeat thread for all groups, skipping quiesced ones"""
+        while self.running:
+            due = [group for group in self.groups.values() if group._begin_heartbeat_round()]
+            if due:
+                self._send_heartbeat_round(due)
+            
+            self.replicate_event.wait(self.heartbeat_interval)
+    
+    # ==================== Server Management ====================
+    
+    def start(self):
+        """Start all groups and the shared gRPC server"""
+        self.running = True
+        
+        for group in self.groups.values():
+            group._start_threads(heartbeats=False)
+        
+        self.heartbeat_thread = threading.Thread(target=self._heartbeat_sender, daemon=True)
+        self.heartbeat_thread.start()
+        
+        workers = CONSENSUS_WORKERS + self.max_client_rpcs + self.max_watchers
+        self.server = grpc.server(futures.ThreadPoolExecutor(max_workers=workers), options=SERVER_OPTIONS)
+        raft_pb2_grpc.add_RaftServiceServicer_to_server(RaftServicer(self), self.server)
+        self.server.add_insecure_port(f'{self.host}:{self.port}')
+        self.server.start()
+        
+        self.logger.info(f"Started {len(self.groups)} groups at {self.address}")
+    
+    def stop(self):
+        """Stop all groups and the server, closing the groups' files once nothing can save to them"""
+        self.logger.info("Stopping...")
+        self.running = False
+        
+        for group in self.groups.values():
+            group.running = False
+        
+        if self.server:
+            self.server.stop(grace=1).wait()
+        self.replicate_event.set()
+        if self.heartbeat_thread:
+            self.heartbeat_thread.join(timeout=2.0)
+        for group in self.groups.values():
+            group._join_threads()
+        for group in self.groups.values():
+            if group.value_log:
+                group.value_log.close()
+            group.durability.close()
+        
+        self.logger.info("Stopped")
+    
+    def wait_for_termination(self):
+        """Wait for server termination"""
+        if self.server:
+            self.server.wait_for_termination()
@@ -8,6 +8,8 @@ import time
 import random
 import sys
 import os
+from collections import deque
+from typing import Optional
 
 # Add proto directory to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'proto'))
@@ -19,8 +21,16 @@ try:
 except ImportError:
     print("Warning: gRPC proto files not generated yet. Run generate_proto.py first.")
 
-from raft_state import RaftState, NodeState, LogEntry
-from kvstore import KeyValueStore
+from raft_state import RaftState, NodeState, LogEntry, NOOP_COMMAND
+from kvstore import KeyValueStore, MissingValue, RevisionCompacted
+from durability import DurabilityPolicy
+from value_log import ValueLog
+from logger import get_logger
+from metrics import MetricsRegistry, NodeMetrics
+from transport import GrpcTransport, TransportError, SERVER_OPTIONS
+from compression import CODECS, compress_entries, decompress_entries
+from admission import CONSENSUS_WORKERS, ClientSlots, Overloaded, reject, retry_after
+from watch import WatchExpired
 
 
 class RaftNode:
@@ -29,7 +39,17 @@ class RaftNode:
     """
     
     def __init__(self, node_id: str, host: str, port: int, peers: dict, 
-                 election_timeout_range=(150, 300), heartbeat_interval=50):
+                 election_timeout_range=(150, 300), heartbeat_interval=50,
+                 learners: dict = None, learner: bool = False,
+                 group_id: int = 0, data_dir: str = "data", transport=None,
+                 quiesce_interval=500, metrics_registry: MetricsRegistry = None,
+                 clock=None, rng=None, defer_save=None, compression: str = "zlib",
+                 compression_threshold: int = 64 * 1024, streaming: bool = True,
+                 durability: str = "always", durability_interval=10,
+                 forward_proposals: bool = False, max_uncommitted_entries: int = 10000,
+                 max_uncommitted_bytes: int = 64 * 1024 * 1024, max_client_rpcs: int = 32,
+                 max_watchers: int = 64, watch_capacity: int = 4096, max_expiry_batch: int = 1000,
+                 history_window: int = 0, value_log_threshold: int = 0):
         """
         Initialize RAFT node
         
@@ -40,29 +60,125 @@ class RaftNode:
             peers: Dictionary of {node_id: "host:port"} for all peers (excluding self)
             election_timeout_range: Range for random election timeout in ms
             heartbeat_interval: Leader heartbeat interval in ms
+            learners: Dictionary of {node_id: "host:port"} for non-voting learners
+            learner: True if this node is a non-voting learner itself
+            group_id: Raft group this node belongs to (0 for a single-group cluster)
+            data_dir: Directory for persistent state and key-value data
+            transport: Transport to reach peers through (default: a new GrpcTransport
+                connected to peers and learners)
+            quiesce_interval: Slow heartbeat interval in ms once an idle leader's peers
+                are caught up (0 disables quiescence)
+            metrics_registry: Registry to report metrics to (shared by Multi-Raft groups)
+            clock: Function returning the current time in seconds (default: time.time)
+            rng: random.Random for election timeouts (default: a new unseeded one)
+            defer_save: Function given the leader's save of new proposals to run it
+                later (default: run it right away on the proposing thread)
+            compression: Codec for large AppendEntries batches ("zlib", "gzip" or "none")
+            compression_threshold: Smallest entry payload in bytes worth compressing
+            streaming: Replicate over a long-lived stream per peer (default transport only)
+            durability: When saves are fsynced: "always", "batch" or "none" (see durability.py)
+            durability_interval: Group fsync interval in ms for "batch"
+            forward_proposals: As a follower, forward client commands to the leader and
+                relay its response instead of redirecting the client
+            max_uncommitted_entries: Most entries the leader's log may run ahead of the
+                commit index before new proposals are rejected (0 = no limit)
+            max_uncommitted_bytes: Most command bytes the leader's log may run ahead of
+                the commit index before new proposals are rejected (0 = no limit)
+            max_client_rpcs: Client RPCs served at once; the server keeps
+                CONSENSUS_WORKERS more workers for consensus RPCs
+            max_watchers: Watch streams served at once (each holds a server worker)
+            watch_capacity: Applied mutations kept for watchers to catch up on or resume from
+            max_expiry_batch: Most keys the leader deletes for their TTL in one EXPIRE entry
+            history_window: Log indexes of superseded versions kept for reads at
+                earlier revisions (0 = keep none)
+            value_log_threshold: Smallest SET or CAS value in bytes kept in the value log
+                instead of the Raft log and the store (0 = no value log, see value_log.py)
         """
         self.node_id = node_id
         self.host = host
         self.port = port
         self.address = f"{host}:{port}"
-        self.peers = peers  # {node_id: address}
+        self.peers = peers  # {node_id: address} of voting members
+        self.learners = learners or {}  # {node_id: address} of non-voting learners
+        self.peer_ids = list(self.peers) + list(self.learners)  # everyone the leader replicates to
+        self.is_learner = learner
+        self.group_id = group_id
+        self.logger = get_logger("Node", node_id if group_id == 0 else f"{node_id}/g{group_id}")
+        
+        # Time and randomness (injectable for deterministic simulation)
+        self.clock = clock or time.time
+        self.rng = rng or random.Random()
+        self.defer_save = defer_save
         
         # Timing parameters (in milliseconds)
         self.election_timeout_range = election_timeout_range
         self.heartbeat_interval = heartbeat_interval / 1000.0  # Convert to seconds
         self.election_timeout = self._get_random_election_timeout()
         
-        # RAFT state and storage
-        self.state = RaftState(node_id)
-        self.kvstore = KeyValueStore(node_id)
+        # AppendEntries compression
+        if compression != "none" and compression not in CODECS:
+            raise ValueError(f"Unknown compression {compression!r}")
+        self.compression = compression
+        self.compression_threshold = compression_threshold
+        
+        # Quiescence: an idle leader heartbeats at quiesce_interval instead
+        self.quiesce_interval = quiesce_interval / 1000.0
+        self.quiesced = False  # leader is currently heartbeating slowly
+        self.quiescent_round = False  # current heartbeat round announces quiescence
+        self.last_round_time = 0.0
+        self.replicate_event = threading.Event()  # set by new proposals to wake the leader
+        self.leader_quiesce_interval = 0.0  # follower: leader's announced slow interval
         
-        # Network isolation for testing
-        self.isolated_nodes = set()
-        self.isolation_lock = threading.Lock()
+        # Proposal forwarding: during an election a follower holds a command
+        # while waiting for a leader. Noticing the old leader is gone and
+        # electing a new one takes a few election timeouts.
+        self.forward_proposals = forward_proposals
+        self.forward_hold = 10 * election_timeout_range[1] / 1000.0
         
-        # gRPC connections to peers
-        self.peer_stubs = {}
-        self._connect_to_peers()
+        # Admission control (see admission.py)
+        self.max_uncommitted_entries = max_uncommitted_entries
+        self.max_uncommitted_bytes = max_uncommitted_bytes
+        self.max_client_rpcs = max_client_rpcs
+        self.max_watchers = max_watchers
+        
+        # Key TTLs: the leader deletes expired keys with one EXPIRE entry in flight at a time
+        self.max_expiry_batch = max_expiry_batch
+        self.expiry_entry = (0, 0)  # (term, index) of the last EXPIRE entry proposed
+        
+        # Metrics
+        self.metrics_registry = metrics_registry or MetricsRegistry()
+        self.metrics = NodeMetrics(self.metrics_registry, node_id, group_id)
+        self.metrics_registry.add_collector(self._collect_metrics)
+        self.proposal_times = {}  # leader: {log index: time appended}
+        self.inflight = {}  # leader: {peer_id: send time} of outstanding AppendEntries RPCs
+        self.commit_marks = deque()  # (commit_index, time) each time commit advanced
+        
+        # RAFT state and storage
+        self.durability = DurabilityPolicy(node_id, durability, durability_interval / 1000.0, self.metrics)
+        self.value_log = None
+        if value_log_threshold:
+            self.value_log = ValueLog(node_id, os.path.join(data_dir, f"node_{node_id}_values.log"),
+                                      value_log_threshold, self.durability)
+        self.state = RaftState(node_id, data_dir, self.metrics, self.clock, self.durability)
+        self.kvstore = KeyValueStore(node_id, data_dir, self.metrics, durability=self.durability,
+                                     watch_capacity=watch_capacity, history_window=history_window,
+                                     value_log=self.value_log)
+        self._restore_applied_index()
+        if self.value_log:
+            # Values of entries lost in a crash or truncated by a leader
+            self.value_log.collect_garbage(
+                [entry.command for entry in self.state.log] + list(self.kvstore.data.values()))
+            # Admission counts loaded entries by their values, not their references
+            for entry in self.state.log:
+                entry.size = self.value_log.inline_size(entry.command)
+            self.state.recount_uncommitted_bytes()
+        
+        # Connections to peers
+        if transport is not None:
+            self.transport = transport
+        else:
+            self.transport = GrpcTransport(streaming=streaming)
+            self._connect_to_peers()
         
         # Threading
         self.running = False
@@ -73,31 +189,42 @@ class RaftNode:
         # Server
         self.server = None
     
+    def _restore_applied_index(self):
+        """Resume applying after the index the store saved (everything up to it is committed)"""
+        applied = self.kvstore.applied_index
+        if applied > len(self.state.log):
+            self.logger.warning(f"Store applied index {applied} is past the log ({len(self.state.log)} entries)")
+            applied = len(self.state.log)
+        self.state.last_applied = applied
+        self.state.commit_index = applied
+    
     def _get_random_election_timeout(self):
         """Get random election timeout"""
-        return random.randint(*self.election_timeout_range) / 1000.0  # Convert to seconds
+        return self.rng.randint(*self.election_timeout_range) / 1000.0  # Convert to seconds
     
     def _connect_to_peers(self):
-        """Establish gRPC connections to all peers"""
-        for peer_id, peer_address in self.peers.items():
+        """Establish gRPC connections to all peers and learners"""
+        for peer_id, peer_address in {**self.peers, **self.learners}.items():
             try:
-                channel = grpc.insecure_channel(peer_address)
-                self.peer_stubs[peer_id] = raft_pb2_grpc.RaftServiceStub(channel)
-                print(f"[Node-{self.node_id}] Connected to peer {peer_id} at {peer_address}")
+                self.transport.connect(peer_id, peer_address)
+                self.logger.debug("Connected to peer %s at %s", peer_id, peer_address)
             except Exception as e:
-                print(f"[Node-{self.node_id}] Error connecting to {peer_id}: {e}")
-    
-    def _is_isolated_from(self, peer_id: str) -> bool:
-        """Check if this node is isolated from a peer"""
-        with self.isolation_lock:
-            return peer_id in self.isolated_nodes
+                self.logger.error(f"Error connecting to {peer_id}: {e}")
     
     # ==================== RPC Handlers ====================
     
     def handle_request_vote(self, request):
         """Handle RequestVote RPC"""
         with self.state.lock:
-            print(f"[Node-{self.node_id}] Received RequestVote from {request.candidate_id} for term {request.term}")
+            self.logger.debug("Received RequestVote from %s for term %s", request.candidate_id, request.term)
+            
+            if self.is_learner:
+                # Learners never vote
+                return raft_pb2.RequestVoteResponse(
+                    term=self.state.current_term,
+                    vote_granted=False,
+                    group_id=self.group_id
+                )
             
             # Update term if needed
             if request.term > self.state.current_term:
@@ -124,32 +251,35 @@ class RaftNode:
                     vote_granted = True
                     self.state.set_voted_for(request.candidate_id)
                     self.state.update_heartbeat()  # Reset election timer
-                    print(f"[Node-{self.node_id}] Granted vote to {request.candidate_id}")
+                    self.logger.info(f"Granted vote to {request.candidate_id}")
             
             return raft_pb2.RequestVoteResponse(
                 term=self.state.current_term,
-                vote_granted=vote_granted
+                vote_granted=vote_granted,
+                group_id=self.group_id
             )
     
     def handle_append_entries(self, request):
         """Handle AppendEntries RPC (log replication and heartbeat)"""
+        received = decompress_entries(request)
+        
         with self.state.lock:
-            # Update term if needed
-            if request.term > self.state.current_term:
-                self.state.become_follower(request.term, request.leader_id)
-            
             success = False
             
             if request.term < self.state.current_term:
                 # Leader's term is outdated
-                print(f"[Node-{self.node_id}] Rejected AppendEntries: stale term {request.term}")
+                self.logger.debug("Rejected AppendEntries: stale term %s", request.term)
             else:
-                # Valid leader
+                # Valid leader (updates the term and persists only if it increased)
                 self.state.become_follower(request.term, request.leader_id)
-                self.state.update_heartbeat()
+                self.leader_quiesce_interval = request.quiesce_interval_ms / 1000.0
                 
-                # Try to append entries
-                entries = [LogEntry(e.term, e.command, e.index) for e in request.entries]
+                # Try to append entries, writing their large values only once they pass the log check
+                entries = []
+                if self.state.matches_log(request.prev_log_index, request.prev_log_term):
+                    entries = [LogEntry(e.term, command, e.index, e.client_id, e.sequence, e.acked,
+                                        e.timestamp, len(e.command))
+                               for e, command in zip(received, self._externalize([e.command for e in received]))]
                 success = self.state.append_entries(
                     request.prev_log_index, 
                     request.prev_log_term, 
@@ -158,139 +288,824 @@ class RaftNode:
                 
                 if success:
                     # Update commit index
+                    old_commit_index = self.state.commit_index
                     self.state.update_commit_index(request.leader_commit)
+                    if self.state.commit_index > old_commit_index:
+                        self._on_commit_advanced(old_commit_index)
                     
                     if entries:
-                        print(f"[Node-{self.node_id}] Appended {len(entries)} entries from leader")
+                        self.logger.debug("Appended %s entries from leader", len(entries))
                 else:
-                    print(f"[Node-{self.node_id}] Failed to append entries")
+                    self.logger.debug("Failed to append entries")
             
             return raft_pb2.AppendEntriesResponse(
                 term=self.state.current_term,
-                success=success
+                success=success,
+                group_id=self.group_id
             )
     
+    def handle_batch_append_entries(self, request):
+        """Handle coalesced AppendEntries RPCs (one per group, all for this node)"""
+        responses = [self.handle_append_entries(r) for r in request.requests]
+        return raft_pb2.BatchAppendEntriesResponse(responses=responses)
+    
     def handle_submit_command(self, request):
-        """Handle client command submission"""
-        # Check if leader (without holding lock for entire operation)
-        with self.state.lock:
-            if self.state.state != NodeState.LEADER:
-                # Not the leader, redirect to current leader
+        """
+        Handle client command submission
+        
+        Commands with a client_id are deduplicated: a retry of a command that
+        was already applied is answered from the session table, and the
+        response carries the state machine result.
+        """
+        if request.client_id:
+            cached = self.kvstore.session_result(request.client_id, request.sequence)
+            if cached is not None:
+                self.metrics.duplicate_commands.inc()
+                return raft_pb2.ClientResponse(
+                    success=True,
+                    message="Duplicate of an applied command",
+                    leader_id=self.node_id,
+                    group_id=self.group_id,
+                    result=cached
+                )
+        
+        index = self.propose(request.command, request.client_id, request.sequence, request.acked)
+        if index is None and self.forward_proposals and not request.forwarded:
+            response = self._forward_to_leader("SubmitCommand", request)
+            if response is not None:
+                return response
+            # This node may have won the election while holding the request
+            index = self.propose(request.command, request.client_id, request.sequence, request.acked)
+        if index is None:
+            # Not the leader, redirect to current leader
+            with self.state.lock:
                 return raft_pb2.ClientResponse(
                     success=False,
                     message="Not the leader",
-                    leader_id=self.state.current_leader or "unknown"
+                    leader_id=self.state.current_leader or "unknown",
+                    group_id=self.group_id
                 )
-            
-            # Append command to log
-            index = self.state.append_log(self.state.current_term, request.command)
-            print(f"[Node-{self.node_id}] Leader received command: {request.command}, index={index}")
         
-        # Wait for commit (release lock so heartbeat thread can work)
-        timeout = 5.0  # 5 second timeout
+        if not self._wait_for_commit(index, index, applied=bool(request.client_id)):
+            return raft_pb2.ClientResponse(
+                success=False,
+                message="Timeout waiting for commit",
+                leader_id=self.node_id,
+                group_id=self.group_id
+            )
+        
+        result = ""
+        if request.client_id:
+            result = self.kvstore.session_result(request.client_id, request.sequence)
+            if result is None:
+                # Our entry was overwritten by another leader before it committed
+                return raft_pb2.ClientResponse(
+                    success=False,
+                    message="Command lost in a leader change",
+                    leader_id=self.state.current_leader or "unknown",
+                    group_id=self.group_id
+                )
+        return raft_pb2.ClientResponse(
+            success=True,
+            message=f"Command committed at index {index}",
+            leader_id=self.node_id,
+            group_id=self.group_id,
+            result=result
+        )
+    
+    def handle_submit_batch(self, request):
+        """Handle a batch of client commands, appended to the log together"""
+        if not request.commands:
+            return raft_pb2.ClientBatchResponse(success=False, message="Empty batch", group_id=self.group_id)
+        
+        sequences = range(request.first_sequence, request.first_sequence + len(request.commands))
+        if request.client_id:
+            cached = [self.kvstore.session_result(request.client_id, sequence) for sequence in sequences]
+            if None not in cached:
+                self.metrics.duplicate_commands.inc(len(cached))
+                return raft_pb2.ClientBatchResponse(
+                    success=True,
+                    message="Duplicate of applied commands",
+                    leader_id=self.node_id,
+                    group_id=self.group_id,
+                    results=cached
+                )
+        
+        first_index = self.propose_batch(list(request.commands), request.client_id,
+                                         request.first_sequence, request.acked)
+        if first_index is None and self.forward_proposals and not request.forwarded:
+            response = self._forward_to_leader("SubmitBatch", request)
+            if response is not None:
+                return response
+            first_index = self.propose_batch(list(request.commands), request.client_id,
+                                             request.first_sequence, request.acked)
+        if first_index is None:
+            with self.state.lock:
+                return raft_pb2.ClientBatchResponse(
+                    success=False,
+                    message="Not the leader",
+                    leader_id=self.state.current_leader or "unknown",
+                    group_id=self.group_id
+                )
+        
+        last_index = first_index + len(request.commands) - 1
+        if not self._wait_for_commit(first_index, last_index, applied=bool(request.client_id)):
+            return raft_pb2.ClientBatchResponse(
+                success=False,
+                message="Timeout waiting for commit",
+                leader_id=self.node_id,
+                group_id=self.group_id
+            )
+        
+        results = []
+        if request.client_id:
+            results = [self.kvstore.session_result(request.client_id, sequence) for sequence in sequences]
+            if None in results:
+                return raft_pb2.ClientBatchResponse(
+                    success=False,
+                    message="Commands lost in a leader change",
+                    leader_id=self.state.current_leader or "unknown",
+                    group_id=self.group_id
+                )
+        return raft_pb2.ClientBatchResponse(
+            success=True,
+            message=f"Commands committed at indexes {first_index}-{last_index}",
+            leader_id=self.node_id,
+            first_index=first_index,
+            group_id=self.group_id,
+            results=results
+        )
+    
+    def _forward_to_leader(self, method: str, request):
+        """
+        Forward a client request this follower cannot append to the leader
+        
+        While no leader is known (an election is running), or the known one
+        cannot be reached, the request is held for up to forward_hold seconds
+        instead of failing right away. Only failures where the leader never
+        got the request are retried: no known leader, or UNAVAILABLE. After
+        any other failure (such as a timeout) the leader may have applied the
+        request, so it is answered as failed rather than sent again. The
+        forwarded copy is marked so the receiver never forwards it again.
+        
+        Args:
+            method: "SubmitCommand" or "SubmitBatch"
+            request: The client's request
+        
+        Returns:
+            The leader's response to relay (or a failure whose outcome is
+            unknown), or None if there was no leader to forward to (or this
+            node became the leader itself)
+        
+        Raises:
+            Overloaded: If the leader rejected the request
+        """
+        forwarded = type(request)()
+        forwarded.CopyFrom(request)
+        forwarded.forwarded = True
+        
+        deadline = time.monotonic() + self.forward_hold
+        while True:
+            with self.state.lock:
+                if self.state.state == NodeState.LEADER:
+                    return None
+                leader_id = self.state.current_leader
+            if leader_id in self.peers:
+                try:
+                    # The leader waits up to 5s for the commit before answering
+                    response = self.transport.call(leader_id, method, forwarded, timeout=6.0)
+                    self.metrics.forwarded_proposals.inc()
+                    return response
+                except TransportError as e:
+                    hint = retry_after(e.__cause__)
+                    if hint is not None:
+                        # The leader is at capacity; the client should back off, not us
+                        raise Overloaded(f"Leader {leader_id} is at capacity", hint) from e
+                    self.logger.debug("Forwarding %s to %s failed: %s", method, leader_id, e)
+                    # No cause: refused before sending (isolated or backing off)
+                    if isinstance(e.__cause__, grpc.Call) and e.__cause__.code() != grpc.StatusCode.UNAVAILABLE:
+                        response_type = (raft_pb2.ClientResponse if method == "SubmitCommand"
+                                         else raft_pb2.ClientBatchResponse)
+                        return response_type(
+                            success=False,
+                            message=f"Forwarding to leader {leader_id} failed with {e.__cause__.code().name} "
+                                    f"after sending; it may have been applied",
+                            leader_id=leader_id,
+                            group_id=self.group_id
+                        )
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(0.01)
+    
+    def _wait_for_commit(self, first_index: int, last_index: int, applied: bool = False,
+                         timeout: float = 5.0) -> bool:
+        """
+        Wait until last_index is committed, or applied (without holding the lock)
+        
+        Returns:
+            True if committed; on timeout the proposals stop being timed
+        """
         start_time = time.time()
         while time.time() - start_time < timeout:
             with self.state.lock:
-                if self.state.commit_index >= index:
-                    return raft_pb2.ClientResponse(
-                        success=True,
-                        message=f"Command committed at index {index}",
-                        leader_id=self.node_id
-                    )
+                reached = self.state.last_applied if applied else self.state.commit_index
+                if reached >= last_index:
+                    return True
             time.sleep(0.05)  # Short sleep to avoid busy-waiting
         
-        return raft_pb2.ClientResponse(
-            success=False,
-            message="Timeout waiting for commit",
-            leader_id=self.node_id
-        )
+        with self.state.lock:
+            for index in range(first_index, last_index + 1):
+                self.proposal_times.pop(index, None)
+        return False
     
-    def handle_isolate(self, request):
-        """Handle isolation request (for testing)"""
-        with self.isolation_lock:
-            self.isolated_nodes = set(request.isolated_nodes)
-            print(f"[Node-{self.node_id}] Isolated from: {self.isolated_nodes}")
-            return raft_pb2.IsolateResponse(
+    def propose(self, command: str, client_id: str = "", sequence: int = 0, acked: int = 0):
+        """
+        Append a client command to the log if this node is the leader
+        
+        Args:
+            command: Command for the state machine
+            client_id: Optional client session of the command
+            sequence: Client's sequence number of the command
+            acked: Client has responses for every sequence up to this
+        
+        Returns:
+            Log index of the new entry, or None if not the leader
+        
+        Raises:
+            Overloaded: If the log is too far ahead of the commit index
+        """
+        term = self._accept([command])
+        if term is None:
+            return None
+        size = len(command)
+        command = self._externalize([command])[0]
+        
+        with self.state.lock:
+            if self.state.state != NodeState.LEADER or self.state.current_term != term:
+                return None
+            
+            # Append command to log, stamped with our clock for expiry on every replica
+            now = self.clock()
+            session = {}
+            if client_id:
+                session = dict(client_id=client_id, sequence=sequence, acked=acked)
+            index = self.state.append_log(self.state.current_term, command, persist=False,
+                                          timestamp=now, size=size, **session)
+            self.proposal_times[index] = now
+            self.logger.debug("Leader received command: %s, index=%s", command, index)
+        
+        # Leave quiescence and replicate right away, while we save our own copy
+        self.replicate_event.set()
+        self._save_proposals()
+        return index
+    
+    def propose_batch(self, commands: list, client_id: str = "", first_sequence: int = 0, acked: int = 0):
+        """
+        Append several client commands to the log with one save
+        
+        Args:
+            commands: Commands for the state machine
+            client_id: Optional client session; command i gets sequence first_sequence + i
+            first_sequence: Sequence number of commands[0]
+            acked: Client has responses for every sequence up to this
+        
+        Returns:
+            Log index of the first new entry, or None if not the leader
+        
+        Raises:
+            Overloaded: If the log is too far ahead of the commit index
+        """
+        if not commands:
+            raise ValueError("Empty command batch")
+        term = self._accept(commands)
+        if term is None:
+            return None
+        sizes = [len(command) for command in commands]
+        commands = self._externalize(commands)
+        
+        with self.state.lock:
+            if self.state.state != NodeState.LEADER or self.state.current_term != term:
+                return None
+            
+            now = self.clock()
+            first_index = self.state.append_logs(self.state.current_term, commands, client_id,
+                                                 first_sequence, acked, now, persist=False, sizes=sizes)
+            for index in range(first_index, first_index + len(commands)):
+                self.proposal_times[index] = now
+            self.logger.debug("Leader received %s commands, first index=%s", len(commands), first_index)
+        
+        self.replicate_event.set()
+        self._save_proposals()
+        return first_index
+    
+    def _accept(self, commands: list) -> Optional[int]:
+        """
+        Check that this node may append client commands
+        
+        Called before their values go to the value log, so rejected commands
+        write nothing. The caller appends only if the term is still current.
+        
+        Returns:
+            The current term if this node is the leader and admits the
+            commands, None if it is not the leader
+        
+        Raises:
+            Overloaded: If the log is too far ahead of the commit index
+        """
+        with self.state.lock:
+            if self.state.state != NodeState.LEADER:
+                return None
+            self._admit(commands)
+            return self.state.current_term
+    
+    def _admit(self, commands: list):
+        """
+        Check the uncommitted tail of the log has room for new commands
+        
+        Must be called with state.lock held. Commands are always admitted
+        when nothing is uncommitted, so a single batch over the limits still
+        gets through on its own.
+        
+        Raises:
+            Overloaded: If appending would exceed max_uncommitted_entries or
+                max_uncommitted_bytes
+        """
+        uncommitted = len(self.state.log) - self.state.commit_index
+        if uncommitted == 0:
+            return
+        
+        if self.max_uncommitted_entries and uncommitted + len(commands) > self.max_uncommitted_entries:
+            self.metrics.rejected_proposals["uncommitted_entries"].inc(len(commands))
+            raise Overloaded(f"{uncommitted} uncommitted entries", self.heartbeat_interval)
+        
+        if self.max_uncommitted_bytes:
+            pending = self.state.uncommitted_bytes  # commands as proposed (see LogEntry.size)
+            if pending + sum(len(command) for command in commands) > self.max_uncommitted_bytes:
+                self.metrics.rejected_proposals["uncommitted_bytes"].inc(len(commands))
+                raise Overloaded(f"{pending} uncommitted bytes", self.heartbeat_interval)
+    
+    def _externalize(self, commands: list) -> list:
+        """
+        Move the large values of commands into the value log, if there is one
+        
+        The values are synced before returning, so no saved log entry ever
+        refers to a value that is not on disk.
+        """
+        if not self.value_log:
+            return commands
+        commands = [self.value_log.externalize(command) for command in commands]
+        self.value_log.sync()
+        return commands
+    
+    def _save_proposals(self):
+        """
+        Save newly proposed entries to the leader's disk
+        
+        Runs in parallel with their replication: the heartbeat thread already
+        sends them. The leader counts toward the quorum only for entries that
+        are on its disk, so commit may advance once this write finishes.
+        With defer_save (the simulator's disk) the write runs whenever that
+        decides, or never if the node crashes first.
+        """
+        if self.defer_save:
+            self.defer_save(self._write_proposals)
+        else:
+            self._write_proposals()
+    
+    def _write_proposals(self):
+        """Write the log, then count the leader's now durable entries toward commit"""
+        if self.state.save_log():
+            self._advance_commit_index()
+    
+    def handle_read(self, request):
+        """Handle a read served from the local key-value store, latest or as of a revision"""
+        error = self._prepare_read(request.consistency)
+        if error is None and request.revision and not self._wait_for_apply(request.revision):
+            error = f"Timeout waiting to apply revision {request.revision}"
+        
+        with self.state.lock:
+            if error is None:
+                try:
+                    if request.revision:
+                        value, revision = self.kvstore.get_at(request.key, request.revision)
+                    else:
+                        value = self.kvstore.get(request.key, self.clock())
+                        revision = self.kvstore.revision(request.key) if value is not None else 0
+                except (RevisionCompacted, MissingValue) as e:
+                    error = str(e)
+            if error is not None:
+                return raft_pb2.ReadResponse(
+                    success=False,
+                    message=error,
+                    leader_id=self.state.current_leader or "unknown",
+                    group_id=self.group_id
+                )
+            
+            return raft_pb2.ReadResponse(
                 success=True,
-                message=f"Isolated from {len(self.isolated_nodes)} nodes"
+                found=value is not None,
+                value=value or "",
+                message="OK" if value is not None else f"Key '{request.key}' not found",
+                leader_id=self.state.current_leader or "unknown",
+                applied_index=self.state.last_applied,
+                group_id=self.group_id,
+                revision=revision
             )
     
+    def handle_scan(self, request):
+        """Handle a range or prefix scan served from the local key-value store, one page at a time"""
+        error = self._prepare_read(request.consistency)
+        if error is not None:
+            with self.state.lock:
+                return raft_pb2.ScanResponse(
+                    success=False,
+                    message=error,
+                    leader_id=self.state.current_leader or "unknown",
+                    group_id=self.group_id
+                )
+        
+        with self.state.lock:
+            try:
+                items, next_key = self.kvstore.scan(request.start, request.end, request.prefix,
+                                                    request.limit, self.clock())
+            except MissingValue as e:
+                return raft_pb2.ScanResponse(
+                    success=False,
+                    message=str(e),
+                    leader_id=self.state.current_leader or "unknown",
+                    group_id=self.group_id
+                )
+            return raft_pb2.ScanResponse(
+                success=True,
+                items=[raft_pb2.KeyValue(key=key, value=value) for key, value in items],
+                next_key=next_key,
+                message=f"{len(items)} keys",
+                leader_id=self.state.current_leader or "unknown",
+                applied_index=self.state.last_applied,
+                group_id=self.group_id
+            )
+    
+    def _prepare_read(self, consistency: str) -> Optional[str]:
+        """
+        Wait until a local read at the given consistency may be served
+        
+        Args:
+            consistency: "stale" (or "") reads right away; "read_index" first waits
+                until this node has applied the leader's read index
+        
+        Returns:
+            None if the read may be served, otherwise why it may not
+        """
+        if consistency not in ("", "stale", "read_index"):
+            return f"Unknown consistency '{consistency}'"
+        if consistency == "stale" or not consistency:
+            return None
+        
+        read_index, message = self._get_read_index()
+        if read_index is None:
+            return message
+        if not self._wait_for_apply(read_index):
+            return "Timeout waiting to apply read index"
+        return None
+    
+    def _wait_for_apply(self, index: int, timeout: float = 5.0) -> bool:
+        """Wait until the state machine has applied index (True) or timeout passes (False)"""
+        start_time = time.time()
+        while True:
+            with self.state.lock:
+                if self.state.last_applied >= index:
+                    return True
+            if time.time() - start_time >= timeout:
+                return False
+            time.sleep(0.01)
+    
+    def handle_read_index(self, request):
+        """Handle ReadIndex RPC from a follower or learner"""
+        read_index, message = self._get_read_index()
+        with self.state.lock:
+            return raft_pb2.ReadIndexResponse(
+                success=read_index is not None,
+                read_index=read_index or 0,
+                term=self.state.current_term,
+                leader_id=self.state.current_leader or "unknown",
+                group_id=self.group_id
+            )
+    
+    def _get_read_index(self):
+        """
+        Get a commit index that is safe to serve a linearizable read at
+        
+        Returns:
+            (read_index, message) - read_index is None if it could not be obtained
+        """
+        with self.state.lock:
+            is_leader = self.state.state == NodeState.LEADER
+            leader_id = self.state.current_leader
+        
+        if is_leader:
+            with self.state.lock:
+                # Leader must have committed an entry from its own term
+                commit_entry = self.state.get_log_entry(self.state.commit_index)
+                if commit_entry is None or commit_entry.term != self.state.current_term:
+                    return None, "Leader has not committed an entry in its term yet"
+                read_index = self.state.commit_index
+            
+            if not self._confirm_leadership():
+                return None, "Could not confirm leadership"
+            return read_index, "OK"
+        
+        # Forward to the leader over the peer channel
+        if not leader_id or leader_id not in self.peers:
+            return None, "No known leader"
+        
+        try:
+            response = self.transport.call(
+                leader_id, "ReadIndex",
+                raft_pb2.ReadIndexRequest(requester_id=self.node_id, group_id=self.group_id),
+                timeout=1.0
+            )
+        except TransportError as e:
+            return None, str(e)
+        
+        if not response.success:
+            return None, f"Leader {leader_id} refused ReadIndex"
+        return response.read_index, "OK"
+    
+    def _confirm_leadership(self, timeout: float = 0.5) -> bool:
+        """
+        Send a heartbeat round and check a majority still accepts us as leader
+        
+        The heartbeats go to every voter at once, and the check returns as soon
+        as a majority has acknowledged (or can no longer), so a read waits for
+        the quorum's round-trip rather than the sum of every peer's.
+        """
+        quorum = (len(self.peers) + 1) // 2 + 1
+        done = threading.Condition()
+        tally = {"acks": 1, "replies": 0}  # the leader acks itself
+        
+        def on_done(acked):
+            with done:
+                tally["acks"] += 1 if acked else 0
+                tally["replies"] += 1
+                done.notify_all()
+        
+        for peer_id in self.peers:
+            self._send_append_entries(peer_id, timeout, on_done)
+        with done:
+            done.wait_for(lambda: tally["acks"] >= quorum or tally["replies"] == len(self.peers), timeout)
+            confirmed = tally["acks"] >= quorum
+        
+        with self.state.lock:
+            if self.state.state != NodeState.LEADER:
+                return False
+        return confirmed
+    
+    def handle_get_status(self, request):
+        """Handle GetStatus RPC (read-only, does not touch the log)"""
+        with self.state.lock:
+            peers = []
+            if self.state.state == NodeState.LEADER:
+                for peer_id, match_index in self.state.match_index.items():
+                    peers.append(raft_pb2.PeerProgress(
+                        peer_id=peer_id,
+                        next_index=self.state.next_index.get(peer_id, 0),
+                        match_index=match_index,
+                        voter=peer_id in self.peers
+                    ))
+            
+            return raft_pb2.StatusResponse(
+                node_id=self.node_id,
+                role=self.state.state.value,
+                term=self.state.current_term,
+                leader_id=self.state.current_leader or "",
+                commit_index=self.state.commit_index,
+                last_applied=self.state.last_applied,
+                log_length=len(self.state.log),
+                peers=peers,
+                learner=self.is_learner,
+                group_id=self.group_id
+            )
+    
+    def handle_watch(self, request, active):
+        """
+        Stream the applied mutations of a key or prefix (Watch RPC)
+        
+        Any node can serve watchers from its own applied state, so they can be
+        spread over followers and learners.
+        
+        Args:
+            request: WatchRequest
+            active: Function returning False once the client has gone away
+        
+        Yields:
+            WatchResponse with the matching events of each read, in log order
+        
+        Raises:
+            WatchExpired: If events from from_index are gone, or the watcher fell behind
+            MissingValue: If an event's value is missing from the value log
+        """
+        hub = self.kvstore.watch_hub
+        cursor = hub.cursor(request.from_index)
+        key = request.key
+        with hub.condition:
+            hub.watchers += 1
+        try:
+            while self.running and active():
+                try:
+                    events, cursor = hub.read(cursor, timeout=1.0)
+                except WatchExpired:
+                    self.metrics.watch_disconnects.inc()
+                    raise
+                matching = [raft_pb2.WatchEvent(index=index, type=op, key=event_key,
+                                                value=self.kvstore.resolve_value(value))
+                            for index, op, event_key, value in events
+                            if (event_key.startswith(key) if request.prefix else event_key == key)]
+                if matching:
+                    yield raft_pb2.WatchResponse(events=matching, group_id=self.group_id)
+        finally:
+            with hub.condition:
+                hub.watchers -= 1
+    
+    def handle_isolate(self, request):
+        """Handle isolation request (for testing): drop outgoing traffic to the given nodes"""
+        self.transport.isolate(request.isolated_nodes)
+        self.logger.warning(f"Isolated from: {set(request.isolated_nodes)}")
+        return raft_pb2.IsolateResponse(
+            success=True,
+            message=f"Isolated from {len(set(request.isolated_nodes))} nodes"
+        )
+    
     # ==================== Leader Election ====================
     
     def _start_election(self):
-        """Start a new election"""
+        """Start a new election (votes are counted as responses arrive)"""
         with self.state.lock:
             self.state.become_candidate()
+            self.metrics.elections.inc()
+            self.leader_quiesce_interval = 0.0
             current_term = self.state.current_term
             last_log_index, last_log_term = self.state.get_last_log_info()
             
-            print(f"[Node-{self.node_id}] Starting election for term {current_term}")
+            self.logger.info(f"Starting election for term {current_term}")
+            self._check_election_won(current_term)
         
-        # Request votes from all peers
-        votes_received = 1  # Vote for self
-        votes_needed = (len(self.peers) + 1) // 2 + 1
+        request = raft_pb2.RequestVoteRequest(
+            term=current_term,
+            candidate_id=self.node_id,
+            last_log_index=last_log_index,
+            last_log_term=last_log_term,
+            group_id=self.group_id
+        )
+        
+        # Request votes from all voting peers in parallel
+        for peer_id in self.peers:
+            self.transport.send(
+                peer_id, "RequestVote", request, 0.5,
+                lambda response, peer_id=peer_id: self._handle_vote_response(peer_id, current_term, response)
+            )
+    
+    def _handle_vote_response(self, peer_id: str, term: int, response):
+        """Count a RequestVote response (None if the RPC failed)"""
+        if response is None:
+            self.logger.debug("No vote response from %s", peer_id)
+            return
         
-        for peer_id, stub in self.peer_stubs.items():
-            if self._is_isolated_from(peer_id):
-                continue
+        with self.state.lock:
+            if response.term > self.state.current_term:
+                # Discovered higher term, step down
+                self.state.become_follower(response.term)
+                return
             
-            try:
-                request = raft_pb2.RequestVoteRequest(
-                    term=current_term,
-                    candidate_id=self.node_id,
-                    last_log_index=last_log_index,
-                    last_log_term=last_log_term
-                )
-                
-                response = stub.RequestVote(request, timeout=0.5)
-                
-                with self.state.lock:
-                    if response.term > self.state.current_term:
-                        # Discovered higher term, step down
-                        self.state.become_follower(response.term)
-                        return
-                    
-                    if response.vote_granted and self.state.state == NodeState.CANDIDATE:
-                        self.state.record_vote(peer_id)
-                        votes_received += 1
-                        print(f"[Node-{self.node_id}] Received vote from {peer_id} ({votes_received}/{votes_needed})")
-                        
-                        if votes_received >= votes_needed:
-                            # Won election
-                            self.state.become_leader(list(self.peers.keys()))
-                            print(f"[Node-{self.node_id}] WON ELECTION for term {current_term}")
-                            return
+            if (response.vote_granted and self.state.state == NodeState.CANDIDATE and
+                    self.state.current_term == term):
+                self.state.record_vote(peer_id)
+                self.logger.debug("Received vote from %s (%s votes)", peer_id, len(self.state.votes_received))
+                self._check_election_won(term)
+    
+    def _check_election_won(self, term: int):
+        """Become leader once a majority of voters has voted for us (called with state.lock held)"""
+        if self.state.state == NodeState.CANDIDATE and self.state.has_majority(len(self.peers) + 1):
+            self.state.become_leader(self.peer_ids)
+            self.metrics.elections_won.inc()
+            self.logger.info(f"WON ELECTION for term {term}")
             
-            except Exception as e:
-                print(f"[Node-{self.node_id}] Error requesting vote from {peer_id}: {e}")
+            # An entry of the new term lets entries of earlier terms commit without
+            # waiting for the next client command (Raft paper, section 8)
+            self.state.append_log(term, NOOP_COMMAND)
+            self.replicate_event.set()
     
     def _election_timer(self):
         """Election timer thread"""
         while self.running:
             time.sleep(0.01)  # Check every 10ms
             
-            with self.state.lock:
-                if self.state.state == NodeState.LEADER:
-                    continue
-                
-                if self.state.time_since_heartbeat() > self.election_timeout:
-                    # Election timeout - start election
-                    self.election_timeout = self._get_random_election_timeout()
-            
             # Start election outside of lock to avoid deadlock
-            if self.state.state != NodeState.LEADER and self.state.time_since_heartbeat() > self.election_timeout:
+            if self._election_due():
                 self._start_election()
     
+    def _election_due(self) -> bool:
+        """Check the election timeout, picking a new random timeout when it fired"""
+        if self.is_learner:
+            # Learners never start elections
+            return False
+        
+        with self.state.lock:
+            if self.state.state == NodeState.LEADER:
+                return False
+            if self.state.time_since_heartbeat() <= self._current_election_timeout():
+                return False
+            
+            # Election timeout - start election
+            self.election_timeout = self._get_random_election_timeout()
+            return True
+    
+    def _current_election_timeout(self) -> float:
+        """Election timeout, extended while the leader has announced quiescence"""
+        return self.election_timeout + 3 * self.leader_quiesce_interval
+    
     # ==================== Log Replication ====================
     
-    def _send_append_entries(self, peer_id: str, stub):
-        """Send AppendEntries RPC to a peer"""
-        if self._is_isolated_from(peer_id):
+    def _send_append_entries(self, peer_id: str, timeout: float, on_done):
+        """
+        Send AppendEntries RPC to a peer now, even if another one is outstanding
+        
+        Args:
+            peer_id: Peer to send to
+            timeout: Seconds to wait for the response
+            on_done: callback(acked) - acked is True if the peer responded and
+                still accepts this node as leader
+        """
+        built = self._build_append_entries(peer_id)
+        if built is None:
+            on_done(False)
             return
+        request, next_index, num_entries = built
+        self._compress_entries(request)
+        
+        start = time.perf_counter()
         
+        def on_response(response):
+            if response is None:
+                on_done(False)  # Silently ignore RPC failures
+                return
+            self.metrics.append_entries_rpc_seconds.observe(time.perf_counter() - start)
+            on_done(self._handle_append_entries_response(peer_id, next_index, num_entries, response))
+        
+        self.metrics.append_entries_batch_size.observe(num_entries)
+        self.transport.send(peer_id, "AppendEntries", request, timeout, on_response)
+    
+    def _send_append_entries_async(self, peer_id: str, on_done=None):
+        """
+        Send AppendEntries RPC to a peer without waiting for the response
+        
+        While a request to the peer is outstanding and younger than a
+        heartbeat interval, the peer is skipped (an older one is presumed
+        lost). A peer that is still behind after a response gets the next
+        request right away instead of at the next heartbeat.
+        
+        Args:
+            peer_id: Peer to send to
+            on_done: Optional callback(acked) once the RPC finished or was skipped
+        """
+        with self.state.lock:
+            sent_at = self.clock()
+            busy = sent_at - self.inflight.get(peer_id, float("-inf")) < self.heartbeat_interval
+            built = None if busy else self._build_append_entries(peer_id)
+            if built is not None:
+                self.inflight[peer_id] = sent_at
+        if built is None:
+            if on_done:
+                on_done(False)
+            return
+        request, next_index, num_entries = built
+        self._compress_entries(request)
+        
+        def on_response(response):
+            with self.state.lock:
+                if self.inflight.get(peer_id) == sent_at:
+                    del self.inflight[peer_id]
+                acked = response is not None and self._handle_append_entries_response(
+                    peer_id, next_index, num_entries, response)
+                behind = (acked and self.state.state == NodeState.LEADER and
+                          self.state.next_index[peer_id] <= len(self.state.log))
+            if on_done:
+                on_done(acked)
+            if behind:
+                self._send_append_entries_async(peer_id)
+        
+        self.metrics.append_entries_batch_size.observe(num_entries)
+        self.transport.send(peer_id, "AppendEntries", request, 0.5, on_response)
+    
+    def _build_append_entries(self, peer_id: str):
+        """
+        Build the next AppendEntries request for a peer
+        
+        Returns:
+            (request, next_index, num_entries), or None if not the leader
+        """
         with self.state.lock:
             if self.state.state != NodeState.LEADER:
-                return
+                return None
             
             next_index = self.state.next_index[peer_id]
             prev_log_index = next_index - 1
@@ -308,8 +1123,12 @@ class RaftNode:
                     entry = self.state.log[i]
                     entries.append(raft_pb2.LogEntry(
                         term=entry.term,
-                        command=entry.command,
-                        index=entry.index
+                        command=self.value_log.internalize(entry.command) if self.value_log else entry.command,
+                        index=entry.index,
+                        client_id=entry.client_id,
+                        sequence=entry.sequence,
+                        acked=entry.acked,
+                        timestamp=entry.timestamp
                     ))
             
             request = raft_pb2.AppendEntriesRequest(
@@ -318,113 +1137,330 @@ class RaftNode:
                 prev_log_index=prev_log_index,
                 prev_log_term=prev_log_term,
                 entries=entries,
-                leader_commit=self.state.commit_index
+                leader_commit=self.state.commit_index,
+                group_id=self.group_id,
+                quiesce_interval_ms=int(self.quiesce_interval * 1000) if self.quiescent_round else 0
             )
+            return request, next_index, len(entries)
+    
+    def _compress_entries(self, request) -> bool:
+        """Compress a built request's entries if large enough (call without state.lock)"""
+        return compress_entries(request, self.compression, self.compression_threshold, self.metrics)
+    
+    def _handle_append_entries_response(self, peer_id: str, next_index: int,
+                                        num_entries: int, response) -> bool:
+        """
+        Process a peer's AppendEntries response
         
-        try:
-            response = stub.AppendEntries(request, timeout=0.5)
+        Returns:
+            True if the peer still accepts this node as leader
+        """
+        with self.state.lock:
+            if response.term > self.state.current_term:
+                # Discovered higher term, step down
+                self.state.become_follower(response.term)
+                return False
             
-            with self.state.lock:
-                if response.term > self.state.current_term:
-                    # Discovered higher term, step down
-                    self.state.become_follower(response.term)
-                    return
-                
-                if self.state.state != NodeState.LEADER:
-                    return
+            if self.state.state != NodeState.LEADER or response.term < self.state.current_term:
+                # Response to a request from an earlier term
+                return False
+            
+            if response.success:
+                # Update next_index and match_index (responses may arrive out of order)
+                match_index = max(self.state.match_index[peer_id], next_index + num_entries - 1)
+                self.state.match_index[peer_id] = match_index
+                self.state.next_index[peer_id] = match_index + 1
                 
-                if response.success:
-                    # Update next_index and match_index
-                    self.state.next_index[peer_id] = next_index + len(entries)
-                    self.state.match_index[peer_id] = next_index + len(entries) - 1
-                    
-                    # Try to advance commit_index
-                    self._advance_commit_index()
-                else:
-                    # Decrement next_index and retry
-                    self.state.next_index[peer_id] = max(1, next_index - 1)
-        
-        except Exception as e:
-            pass  # Silently ignore RPC failures
+                # Try to advance commit_index
+                self._advance_commit_index()
+            else:
+                # Decrement next_index and retry
+                self.state.next_index[peer_id] = max(1, next_index - 1)
+            
+            return True
     
     def _advance_commit_index(self):
-        """Advance commit index if majority of followers have replicated"""
+        """Advance commit index if majority of voting followers have replicated"""
         with self.state.lock:
             if self.state.state != NodeState.LEADER:
                 return
             
+            old_commit_index = self.state.commit_index
+            
             # Find highest index replicated on majority
             for n in range(self.state.commit_index + 1, len(self.state.log) + 1):
                 if self.state.get_log_entry(n).term != self.state.current_term:
                     continue
                 
-                replicated_count = 1  # Leader has it
-                for peer_id in self.peers:
+                # The leader counts once its own write finished (see _save_proposals)
+                replicated_count = 1 if self.state.durable_index >= n else 0
+                for peer_id in self.peers:  # Learners don't count toward quorum
                     if self.state.match_index[peer_id] >= n:
                         replicated_count += 1
                 
                 if replicated_count > (len(self.peers) + 1) // 2:
                     self.state.commit_index = n
-                    print(f"[Node-{self.node_id}] Advanced commit_index to {n}")
+                    self.logger.debug("Advanced commit_index to %s", n)
+            
+            if self.state.commit_index > old_commit_index:
+                self._on_commit_advanced(old_commit_index)
+    
+    def _on_commit_advanced(self, old_commit_index: int):
+        """Record commit timing for latency metrics (called with state.lock held)"""
+        now = self.clock()
+        self.commit_marks.append((self.state.commit_index, now))
+        for index in range(old_commit_index + 1, self.state.commit_index + 1):
+            proposed_at = self.proposal_times.pop(index, None)
+            if proposed_at is not None:
+                self.metrics.proposal_commit_seconds.observe(now - proposed_at)
     
     def _heartbeat_sender(self):
         """Leader heartbeat thread"""
         while self.running:
-            with self.state.lock:
-                if self.state.state == NodeState.LEADER:
-                    # Send AppendEntries to all peers
-                    for peer_id, stub in self.peer_stubs.items():
-                        self._send_append_entries(peer_id, stub)
+            if self._begin_heartbeat_round():
+                self._send_heartbeat_round()
             
-            time.sleep(self.heartbeat_interval)
+            # A new proposal sets the event and ends the wait early
+            self.replicate_event.wait(self.heartbeat_interval)
+    
+    def _begin_heartbeat_round(self) -> bool:
+        """
+        Decide whether a heartbeat round is due, and whether it announces quiescence
+        
+        Returns:
+            True if the leader should send a round now
+        """
+        with self.state.lock:
+            woken = self.replicate_event.is_set()
+            self.replicate_event.clear()
+            
+            if self.state.state != NodeState.LEADER:
+                self.quiesced = False
+                return False
+            
+            now = self.clock()
+            if self.quiesced and not woken and now - self.last_round_time < self.quiesce_interval:
+                return False
+            
+            self.last_round_time = now
+            self.quiescent_round = self.quiesce_interval > 0 and self._is_caught_up()
+            return True
+    
+    def _send_heartbeat_round(self):
+        """
+        Send AppendEntries to every peer in parallel without waiting
+        
+        A slow or dead peer cannot delay the heartbeats of the others; the
+        round ends (see _end_heartbeat_round) once every peer has answered.
+        """
+        quiescent = self.quiescent_round
+        progress = {"pending": len(self.peer_ids), "acks": 0}
+        progress_lock = threading.Lock()
+        
+        def on_done(acked):
+            with progress_lock:
+                progress["pending"] -= 1
+                progress["acks"] += 1 if acked else 0
+                finished = progress["pending"] == 0
+            if finished:
+                self._end_heartbeat_round(progress["acks"], quiescent)
+        
+        for peer_id in self.peer_ids:
+            self._send_append_entries_async(peer_id, on_done)
+    
+    def _end_heartbeat_round(self, acks: int, quiescent: bool = None):
+        """
+        Slow down only once every peer acknowledged a quiescent round
+        
+        Args:
+            acks: Peers that accepted the round
+            quiescent: Whether the round announced quiescence (default: the current round's)
+        """
+        if quiescent is None:
+            quiescent = self.quiescent_round
+        with self.state.lock:
+            was_quiesced = self.quiesced
+            self.quiesced = quiescent and acks == len(self.peer_ids)
+            if self.quiesced != was_quiesced:
+                self.logger.info(f"{'Entered' if self.quiesced else 'Left'} quiescence")
+    
+    def _is_caught_up(self) -> bool:
+        """True if everything is committed and every peer has the whole log"""
+        with self.state.lock:
+            last_index = len(self.state.log)
+            return (self.state.commit_index == last_index and
+                    all(match == last_index for match in self.state.match_index.values()))
     
     def _apply_committed_entries(self):
         """Apply committed log entries to state machine"""
         while self.running:
             time.sleep(0.1)
+            self._apply_ready()
+            self._propose_expiries()
+    
+    def _apply_ready(self):
+        """Apply every committed entry that has not been applied yet, with one store save"""
+        with self.state.lock:
+            # A leader's entries can commit on the followers' acks alone while
+            # its own write (see _save_proposals) is still in progress; the
+            # store must never get ahead of the log on disk
+            last_index = min(self.state.commit_index, self.state.durable_index)
+            if self.state.last_applied >= last_index:
+                return
+            indexes = range(self.state.last_applied + 1, last_index + 1)
+            entries = [entry for entry in map(self.state.get_log_entry, indexes) if entry]
+            results = self.kvstore.apply_batch([
+                (entry.command, entry.client_id, entry.sequence, entry.acked, entry.timestamp, entry.index)
+                for entry in entries
+            ])
+            self.state.last_applied = last_index
             
-            with self.state.lock:
-                while self.state.last_applied < self.state.commit_index:
-                    self.state.last_applied += 1
-                    entry = self.state.get_log_entry(self.state.last_applied)
-                    
-                    if entry:
-                        print(f"[Node-{self.node_id}] Applying: {entry.command}")
-                        result = self.kvstore.apply_command(entry.command)
-                        print(f"[Node-{self.node_id}] Result: {result}")
+            for entry, result in zip(entries, results):
+                self.logger.debug("Applied: %s, result: %s", entry.command, result)
+                self._observe_apply(entry.index)
+    
+    def _propose_expiries(self):
+        """
+        As the leader, propose the deletion of keys whose TTL has passed
+        
+        Due keys come from the top of the store's expiry heap, at most
+        max_expiry_batch of them per EXPIRE entry, and the next entry is only
+        proposed once the previous one has been applied, so mass expiry
+        adds one entry per batch rather than one per key.
+        """
+        with self.state.lock:
+            if self.state.state != NodeState.LEADER:
+                return
+            term, index = self.expiry_entry
+            entry = self.state.get_log_entry(index) if index > self.state.last_applied else None
+            if entry is not None and entry.term == term:
+                return  # previous batch not applied yet (and not overwritten by another leader)
+            term = self.state.current_term
+        
+        keys = self.kvstore.due_expiries(self.clock(), self.max_expiry_batch)
+        if not keys:
+            return
+        try:
+            index = self.propose("EXPIRE " + " ".join(keys))
+        except Overloaded:
+            return  # retried on a later round
+        if index is not None:
+            self.expiry_entry = (term, index)
+            self.logger.debug("Proposed expiry of %s keys at index %s", len(keys), index)
+    
+    def _observe_apply(self, index: int):
+        """Record commit-to-apply latency for an applied index"""
+        while self.commit_marks and self.commit_marks[0][0] < index:
+            self.commit_marks.popleft()
+        if self.commit_marks:
+            self.metrics.commit_apply_seconds.observe(self.clock() - self.commit_marks[0][1])
+    
+    def _collect_metrics(self):
+        """Refresh state gauges and per-peer replication lag before a scrape"""
+        with self.state.lock:
+            last_index = len(self.state.log)
+            self.metrics.gauge("raft_current_term", "Current term").set(self.state.current_term)
+            self.metrics.gauge("raft_commit_index", "Highest committed log index").set(self.state.commit_index)
+            self.metrics.gauge("raft_last_applied", "Highest applied log index").set(self.state.last_applied)
+            self.metrics.gauge("raft_log_length", "Entries in the log").set(last_index)
+            self.metrics.gauge("raft_durable_index", "Last log index saved to disk").set(self.state.durable_index)
+            self.metrics.gauge("raft_client_sessions", "Client sessions in the session table").set(
+                len(self.kvstore.sessions))
+            self.metrics.gauge("raft_watchers", "Open Watch streams").set(self.kvstore.watch_hub.watchers)
+            if self.value_log:
+                self.metrics.gauge("raft_value_log_bytes", "Size of the value log file").set(self.value_log.size)
+            self.metrics.gauge("raft_is_leader", "1 if this node is the leader").set(
+                1 if self.state.state == NodeState.LEADER else 0)
+            
+            for peer_id, up in self.transport.peer_health().items():
+                self.metrics.gauge("raft_peer_up", "1 unless recent RPCs to the peer failed",
+                                   peer=peer_id).set(1 if up else 0)
+            for peer_id, streaming in self.transport.peer_streaming().items():
+                self.metrics.gauge("raft_peer_streaming", "1 while AppendEntries to the peer use a stream",
+                                   peer=peer_id).set(1 if streaming else 0)
+            
+            if self.state.state != NodeState.LEADER:
+                return
+            for peer_id, match_index in self.state.match_index.items():
+                self.metrics.gauge("raft_peer_match_lag_entries", "Leader log entries not yet on the peer",
+                                   peer=peer_id).set(last_index - match_index)
+                self.metrics.gauge("raft_peer_next_index", "Next log index to send to the peer",
+                                   peer=peer_id).set(self.state.next_index.get(peer_id, 0))
+    
+    def tick(self):
+        """
+        Run whatever timer work is due, once, without background threads
+        
+        Used instead of start() when an external scheduler drives the node
+        (see simulator.py); RPCs go out through transport.send and their
+        responses are handled when the transport delivers them.
+        """
+        if self._election_due():
+            self._start_election()
+        
+        with self.state.lock:
+            due = (self.replicate_event.is_set() or
+                   self.clock() - self.last_round_time >= self.heartbeat_interval)
+        if due and self._begin_heartbeat_round():
+            self._send_heartbeat_round()
+        
+        self._apply_ready()
+        self._propose_expiries()
     
     # ==================== Server Management ====================
     
     def start(self):
         """Start the RAFT node"""
+        self._start_threads()
+        
+        # Start gRPC server
+        workers = CONSENSUS_WORKERS + self.max_client_rpcs + self.max_watchers
+        self.server = grpc.server(futures.ThreadPoolExecutor(max_workers=workers), options=SERVER_OPTIONS)
+        raft_pb2_grpc.add_RaftServiceServicer_to_server(RaftServicer(self), self.server)
+        self.server.add_insecure_port(f'{self.host}:{self.port}')
+        self.server.start()
+        
+        role = " as learner" if self.is_learner else ""
+        self.logger.info(f"Started at {self.address}{role}")
+    
+    def _start_threads(self, heartbeats: bool = True):
+        """
+        Start background threads
+        
+        Args:
+            heartbeats: False when a MultiRaftNode sends coalesced heartbeats instead
+        """
         self.running = True
         
-        # Start threads
         self.election_timer_thread = threading.Thread(target=self._election_timer, daemon=True)
-        self.heartbeat_thread = threading.Thread(target=self._heartbeat_sender, daemon=True)
         self.apply_thread = threading.Thread(target=self._apply_committed_entries, daemon=True)
-        
         self.election_timer_thread.start()
-        self.heartbeat_thread.start()
         self.apply_thread.start()
         
-        # Start gRPC server
-        self.server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
-        raft_pb2_grpc.add_RaftServiceServicer_to_server(RaftServicer(self), self.server)
-        self.server.add_insecure_port(f'{self.host}:{self.port}')
-        self.server.start()
-        
-        print(f"[Node-{self.node_id}] Started at {self.address}")
+        if heartbeats:
+            self.heartbeat_thread = threading.Thread(target=self._heartbeat_sender, daemon=True)
+            self.heartbeat_thread.start()
+    
+    def _join_threads(self, timeout: float = 2.0):
+        """Wait for the background threads to see running is False and exit"""
+        self.replicate_event.set()
+        for thread in [self.election_timer_thread, self.heartbeat_thread, self.apply_thread]:
+            if thread and thread is not threading.current_thread():
+                thread.join(timeout=timeout)
     
     def stop(self):
-        """Stop the RAFT node"""
-        print(f"[Node-{self.node_id}] Stopping...")
+        """Stop the RAFT node, closing its files once nothing can save to them"""
+        self.logger.info("Stopping...")
         self.running = False
         
         if self.server:
-            self.server.stop(grace=1)
+            self.server.stop(grace=1).wait()
+        self._join_threads()
+        if self.value_log:
+            self.value_log.close()
+        self.durability.close()
         
-        print(f"[Node-{self.node_id}] Stopped")
+        self.logger.info("Stopped")
     
     def wait_for_termination(self):
         """Wait for server termination"""
@@ -433,10 +1469,35 @@ class RaftNode:
 
 
 class RaftServicer(raft_pb2_grpc.RaftServiceServicer):
-    """gRPC service implementation"""
+    """
+    gRPC service implementation
+    
+    Client RPCs (including ReadIndex, which followers send for their
+    clients' reads) and Watch streams run in limited numbers of slots so they
+    cannot take the workers consensus RPCs need (see admission.py).
+    """
     
     def __init__(self, node: RaftNode):
         self.node = node
+        self.client_slots = ClientSlots(node.max_client_rpcs, node.heartbeat_interval)
+        self.watch_slots = ClientSlots(node.max_watchers, 1.0, kind="watch")
+        self.rejected = node.metrics_registry.counter(
+            "raft_client_rpcs_rejected_total", "Client RPCs rejected because every client slot was busy",
+            {"node": node.node_id})
+    
+    def _client_call(self, handler, request, context):
+        """Run a client RPC handler in a client slot, rejecting it when overloaded"""
+        try:
+            self.client_slots.acquire()
+        except Overloaded as e:
+            self.rejected.inc()
+            reject(context, e)
+        try:
+            return handler(request)
+        except Overloaded as e:
+            reject(context, e)
+        finally:
+            self.client_slots.release()
     
     def RequestVote(self, request, context):
         return self.node.handle_request_vote(request)
@@ -444,8 +1505,45 @@ class RaftServicer(raft_pb2_grpc.RaftServiceServicer):
     def AppendEntries(self, request, context):
         return self.node.handle_append_entries(request)
     
+    def BatchAppendEntries(self, request, context):
+        return self.node.handle_batch_append_entries(request)
+    
+    def StreamAppendEntries(self, request_iterator, context):
+        for request in request_iterator:
+            yield self.node.handle_append_entries(request)
+    
     def SubmitCommand(self, request, context):
-        return self.node.handle_submit_command(request)
+        return self._client_call(self.node.handle_submit_command, request, context)
+    
+    def SubmitBatch(self, request, context):
+        return self._client_call(self.node.handle_submit_batch, request, context)
+    
+    def Read(self, request, context):
+        return self._client_call(self.node.handle_read, request, context)
+    
+    def Scan(self, request, context):
+        return self._client_call(self.node.handle_scan, request, context)
+    
+    def ReadIndex(self, request, context):
+        # Sent for a follower's client read, and holds a worker for a heartbeat round
+        return self._client_call(self.node.handle_read_index, request, context)
+    
+    def GetStatus(self, request, context):
+        return self.node.handle_get_status(request)
+    
+    def Watch(self, request, context):
+        try:
+            self.watch_slots.acquire()
+        except Overloaded as e:
+            reject(context, e)
+        try:
+            yield from self.node.handle_watch(request, context.is_active)
+        except WatchExpired as e:
+            context.abort(grpc.StatusCode.OUT_OF_RANGE, f"{e} (events up to index {e.index} may be missing)")
+        except MissingValue as e:
+            context.abort(grpc.StatusCode.DATA_LOSS, str(e))
+        finally:
+            self.watch_slots.release()
     
     def Isolate(self, request, context):
         return self.node.handle_isolate(request)
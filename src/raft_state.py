@@ -8,6 +8,13 @@ from enum import Enum
 from typing import List, Optional, Dict
 import time
 
+from logger import get_logger
+from durability import DurabilityPolicy
+
+
+# Command of the entry a new leader appends on election; applying it is a no-op
+NOOP_COMMAND = "NOOP"
+
 
 class NodeState(Enum):
     """RAFT node states"""
@@ -17,23 +24,43 @@ class NodeState(Enum):
 
 
 class LogEntry:
-    """Represents a single log entry"""
+    """
+    Represents a single log entry
     
-    def __init__(self, term: int, command: str, index: int):
+    Commands sent in a client session also carry the session fields, so
+    every replica's state machine can drop duplicates the same way. The
+    leader also stamps every entry with its clock, which replicas use as the
+    current time when applying it (for session and key TTL expiry).
+    """
+    
+    def __init__(self, term: int, command: str, index: int, client_id: str = "",
+                 sequence: int = 0, acked: int = 0, timestamp: float = 0.0, size: int = None):
         self.term = term
         self.command = command
+        # Bytes of the command with any value-log value inline, for admission (not saved)
+        self.size = len(command) if size is None else size
         self.index = index
+        self.client_id = client_id  # session of the command ("" for none)
+        self.sequence = sequence  # client's sequence number of the command
+        self.acked = acked  # client has responses for every sequence up to this
+        self.timestamp = timestamp  # leader's clock at append, for session and key expiry
     
     def to_dict(self):
-        return {
+        data = {
             "term": self.term,
             "command": self.command,
             "index": self.index
         }
+        if self.client_id:
+            data.update(client_id=self.client_id, sequence=self.sequence, acked=self.acked)
+        if self.timestamp:
+            data["timestamp"] = self.timestamp
+        return data
     
     @staticmethod
     def from_dict(data):
-        return LogEntry(data["term"], data["command"], data["index"])
+        return LogEntry(data["term"], data["command"], data["index"], data.get("client_id", ""),
+                        data.get("sequence", 0), data.get("acked", 0), data.get("timestamp", 0.0))
     
     def __repr__(self):
         return f"LogEntry(index={self.index}, term={self.term}, cmd={self.command})"
@@ -45,20 +72,28 @@ class RaftState:
     Implements persistent and volatile state as per RAFT paper
     """
     
-    def __init__(self, node_id: str, data_dir: str = "data"):
+    def __init__(self, node_id: str, data_dir: str = "data", metrics=None, clock=None,
+                 durability: DurabilityPolicy = None):
         """
         Initialize RAFT state
         
         Args:
             node_id: Unique identifier for this node
             data_dir: Directory for persistent state
+            metrics: Optional NodeMetrics to report save and lock timings to
+            clock: Function returning the current time in seconds (default: time.time)
+            durability: How saves reach the disk (default: fsync on every save)
         """
         self.node_id = node_id
         self.data_dir = data_dir
         self.state_file = os.path.join(data_dir, f"node_{node_id}_state.json")
+        self.logger = get_logger("State", node_id)
+        self.metrics = metrics
+        self.clock = clock or time.time
+        self.durability = durability or DurabilityPolicy(node_id, metrics=metrics)
         
         # Thread safety
-        self.lock = threading.RLock()
+        self.lock = metrics.instrumented_lock() if metrics else threading.RLock()
         
         # Persistent state (must be saved to disk)
         self.current_term = 0
@@ -66,11 +101,12 @@ class RaftState:
         self.log: List[LogEntry] = []
         
         # Volatile state on all servers
-        self.commit_index = 0  # index of highest log entry known to be committed
+        self._commit_index = 0  # index of highest log entry known to be committed
+        self.uncommitted_bytes = 0  # command sizes of the entries after commit_index
         self.last_applied = 0  # index of highest log entry applied to state machine
         self.state = NodeState.FOLLOWER
         self.current_leader: Optional[str] = None
-        self.last_heartbeat = time.time()
+        self.last_heartbeat = self.clock()
         
         # Volatile state on leaders (reinitialized after election)
         self.next_index: Dict[str, int] = {}  # for each server, index of next log entry to send
@@ -79,11 +115,24 @@ class RaftState:
         # Election state
         self.votes_received = set()
         
+        # Saving: every snapshot of the persistent state gets a version, and a
+        # write is skipped if a newer snapshot is already on disk. save_lock
+        # orders the writes, including those made outside self.lock (save_log).
+        self.save_lock = threading.Lock()
+        self.save_version = 0  # version of the latest snapshot taken
+        self.saved_version = 0  # version of the snapshot on disk
+        self.durable_index = 0  # last log index on disk
+        
+        # Disk I/O counters (see get_io_stats)
+        self.io_stats = {"state_writes": 0, "bytes_written": 0}
+        
         # Create data directory
         os.makedirs(data_dir, exist_ok=True)
         
         # Load persistent state
         self._load_state()
+        self.durable_index = len(self.log)
+        self.recount_uncommitted_bytes()
     
     def _load_state(self):
         """Load persistent state from disk"""
@@ -94,22 +143,91 @@ class RaftState:
                     self.current_term = data.get("current_term", 0)
                     self.voted_for = data.get("voted_for")
                     self.log = [LogEntry.from_dict(entry) for entry in data.get("log", [])]
-                    print(f"[State-{self.node_id}] Loaded state: term={self.current_term}, log_len={len(self.log)}")
+                    self.logger.info(f"Loaded state: term={self.current_term}, log_len={len(self.log)}")
         except Exception as e:
-            print(f"[State-{self.node_id}] Error loading state: {e}")
+            self.logger.error(f"Error loading state: {e}")
+    
+    @property
+    def commit_index(self) -> int:
+        """Index of highest log entry known to be committed"""
+        return self._commit_index
+    
+    @commit_index.setter
+    def commit_index(self, index: int):
+        """Move the commit index, keeping uncommitted_bytes up to date"""
+        low, high = sorted((self._commit_index, index))
+        moved = sum(entry.size for entry in self.log[low:high])
+        self.uncommitted_bytes += moved if index < self._commit_index else -moved
+        self._commit_index = index
+    
+    def recount_uncommitted_bytes(self):
+        """Recount uncommitted_bytes from the log (after a load, truncation or change of entry sizes)"""
+        with self.lock:
+            self.uncommitted_bytes = sum(entry.size for entry in self.log[self._commit_index:])
     
     def _save_state(self):
-        """Save persistent state to disk"""
-        try:
-            data = {
-                "current_term": self.current_term,
-                "voted_for": self.voted_for,
-                "log": [entry.to_dict() for entry in self.log]
-            }
-            with open(self.state_file, 'w') as f:
-                json.dump(data, f, indent=2)
-        except Exception as e:
-            print(f"[State-{self.node_id}] Error saving state: {e}")
+        """Save persistent state to disk (called with self.lock held)"""
+        self._write_snapshot(*self._snapshot())
+    
+    def save_log(self) -> bool:
+        """
+        Save entries appended with persist=False, writing without holding the lock
+        
+        The leader calls this after appending client commands, so its own disk
+        write overlaps with replicating the same entries to followers.
+        
+        Returns:
+            True if this call wrote the file (False if nothing was new, or a
+            concurrent save already wrote a newer snapshot)
+        """
+        with self.lock:
+            if len(self.log) <= self.durable_index:
+                return False
+            snapshot = self._snapshot()
+        return self._write_snapshot(*snapshot)
+    
+    def _snapshot(self):
+        """Capture the persistent state for saving (called with self.lock held)"""
+        self.save_version += 1
+        # Entries are never modified once appended, so a shallow copy is enough
+        return self.save_version, self.current_term, self.voted_for, list(self.log)
+    
+    def _write_snapshot(self, version: int, current_term: int, voted_for: Optional[str],
+                        log: List[LogEntry]) -> bool:
+        """
+        Write a snapshot to disk (atomically, see DurabilityPolicy) unless a newer one is there
+        
+        Returns:
+            True if the snapshot was written
+        """
+        start = time.perf_counter()
+        with self.save_lock:
+            if version <= self.saved_version:
+                return False
+            try:
+                data = {
+                    "current_term": current_term,
+                    "voted_for": voted_for,
+                    "log": [entry.to_dict() for entry in log]
+                }
+                content = json.dumps(data)  # compact: the C encoder is much faster than indent=2
+                self.durability.write(self.state_file, content)
+                self.saved_version = version
+                self.durable_index = len(log)
+                self.io_stats["state_writes"] += 1
+                self.io_stats["bytes_written"] += len(content)
+            except Exception as e:
+                self.logger.error(f"Error saving state: {e}")
+                return False
+        
+        if self.metrics:
+            self.metrics.state_save_seconds.observe(time.perf_counter() - start)
+        return True
+    
+    def get_io_stats(self) -> Dict[str, int]:
+        """Get a copy of the disk write counters"""
+        with self.lock:
+            return dict(self.io_stats)
     
     def update_term(self, term: int):
         """Update current term and reset voted_for"""
@@ -118,7 +236,9 @@ class RaftState:
                 self.current_term = term
                 self.voted_for = None
                 self._save_state()
-                print(f"[State-{self.node_id}] Updated term to {term}")
+                if self.metrics:
+                    self.metrics.term_changes.inc()
+                self.logger.info(f"Updated term to {term}")
                 return True
             return False
     
@@ -127,23 +247,63 @@ class RaftState:
         with self.lock:
             self.voted_for = candidate_id
             self._save_state()
-            print(f"[State-{self.node_id}] Voted for {candidate_id} in term {self.current_term}")
+            self.logger.info(f"Voted for {candidate_id} in term {self.current_term}")
     
-    def append_log(self, term: int, command: str) -> int:
+    def append_log(self, term: int, command: str, persist: bool = True, **session) -> int:
         """
         Append a new entry to the log
         
+        Args:
+            term: Term of the entry
+            command: Command for the state machine
+            persist: Save before returning; if False the caller must call save_log
+            session: Optional client_id, sequence, acked, timestamp and size of the command
+        
         Returns:
             Index of the newly appended entry
         """
         with self.lock:
             index = len(self.log) + 1
-            entry = LogEntry(term, command, index)
+            entry = LogEntry(term, command, index, **session)
             self.log.append(entry)
-            self._save_state()
-            print(f"[State-{self.node_id}] Appended log entry: {entry}")
+            self.uncommitted_bytes += entry.size
+            if persist:
+                self._save_state()
+            self.logger.debug("Appended log entry: %s", entry)
             return index
     
+    def append_logs(self, term: int, commands: List[str], client_id: str = "",
+                    first_sequence: int = 0, acked: int = 0, timestamp: float = 0.0,
+                    persist: bool = True, sizes: List[int] = None) -> int:
+        """
+        Append several new entries to the log with a single save
+        
+        Args:
+            term: Term of the entries
+            commands: Commands for the state machine
+            client_id: Optional client session; command i gets sequence first_sequence + i
+            first_sequence: Sequence number of commands[0]
+            acked: Client has responses for every sequence up to this
+            timestamp: Leader's clock at append
+            persist: Save before returning; if False the caller must call save_log
+            sizes: Optional sizes of the commands (see LogEntry.size)
+        
+        Returns:
+            Index of the first appended entry
+        """
+        with self.lock:
+            first_index = len(self.log) + 1
+            for offset, command in enumerate(commands):
+                sequence = first_sequence + offset if client_id else 0
+                entry = LogEntry(term, command, first_index + offset, client_id,
+                                 sequence, acked, timestamp, sizes[offset] if sizes else None)
+                self.log.append(entry)
+                self.uncommitted_bytes += entry.size
+            if persist:
+                self._save_state()
+            self.logger.debug("Appended %s log entries from index %s", len(commands), first_index)
+            return first_index
+    
     def get_last_log_info(self):
         """Get (index, term) of last log entry"""
         with self.lock:
@@ -164,8 +324,22 @@ class RaftState:
         with self.lock:
             if from_index <= len(self.log):
                 self.log = self.log[:from_index - 1]
+                self.recount_uncommitted_bytes()
                 self._save_state()
-                print(f"[State-{self.node_id}] Truncated log from index {from_index}")
+                self.logger.info(f"Truncated log from index {from_index}")
+    
+    def matches_log(self, prev_log_index: int, prev_log_term: int) -> bool:
+        """Check if the log contains an entry at prev_log_index with term prev_log_term"""
+        with self.lock:
+            if prev_log_index > 0:
+                if prev_log_index > len(self.log):
+                    self.logger.debug("Log too short: need %s, have %s", prev_log_index, len(self.log))
+                    return False
+                
+                if self.log[prev_log_index - 1].term != prev_log_term:
+                    self.logger.debug("Term mismatch at %s", prev_log_index)
+                    return False
+            return True
     
     def append_entries(self, prev_log_index: int, prev_log_term: int, 
                       entries: List[LogEntry]) -> bool:
@@ -176,34 +350,29 @@ class RaftState:
             True if entries were appended successfully
         """
         with self.lock:
-            # Check if log contains entry at prev_log_index with term prev_log_term
-            if prev_log_index > 0:
-                if prev_log_index > len(self.log):
-                    print(f"[State-{self.node_id}] Log too short: need {prev_log_index}, have {len(self.log)}")
-                    return False
-                
-                if self.log[prev_log_index - 1].term != prev_log_term:
-                    print(f"[State-{self.node_id}] Term mismatch at {prev_log_index}")
-                    return False
+            if not self.matches_log(prev_log_index, prev_log_term):
+                return False
             
             # Delete conflicting entries and append new ones
-            if entries:
-                # Find where new entries should start
-                log_index = prev_log_index
-                for entry in entries:
-                    log_index += 1
-                    if log_index <= len(self.log):
-                        # Check for conflict
-                        if self.log[log_index - 1].term != entry.term:
-                            # Delete this and all following entries
-                            self.log = self.log[:log_index - 1]
-                            self.log.append(entry)
-                    else:
-                        # Append new entry
-                        self.log.append(entry)
-                
+            changed = False
+            log_index = prev_log_index
+            for entry in entries:
+                log_index += 1
+                if log_index <= len(self.log):
+                    if self.log[log_index - 1].term == entry.term:
+                        # Already present, nothing to do
+                        continue
+                    # Conflict: delete this and all following entries
+                    self.log = self.log[:log_index - 1]
+                    self.recount_uncommitted_bytes()
+                self.log.append(entry)
+                self.uncommitted_bytes += entry.size
+                changed = True
+            
+            # Only touch the disk when the log actually changed
+            if changed:
                 self._save_state()
-                print(f"[State-{self.node_id}] Appended {len(entries)} entries, log_len={len(self.log)}")
+                self.logger.debug("Appended %s entries, log_len=%s", len(entries), len(self.log))
             
             return True
     
@@ -212,16 +381,20 @@ class RaftState:
         with self.lock:
             if leader_commit > self.commit_index:
                 self.commit_index = min(leader_commit, len(self.log))
-                print(f"[State-{self.node_id}] Updated commit_index to {self.commit_index}")
+                self.logger.debug("Updated commit_index to %s", self.commit_index)
     
     def become_follower(self, term: int, leader_id: Optional[str] = None):
-        """Transition to follower state"""
+        """Transition to follower state (persists only if the term increases)"""
         with self.lock:
+            changed = (self.state != NodeState.FOLLOWER or
+                       self.current_leader != leader_id or
+                       term > self.current_term)
             self.state = NodeState.FOLLOWER
             self.current_leader = leader_id
             self.update_term(term)
-            self.last_heartbeat = time.time()
-            print(f"[State-{self.node_id}] Became FOLLOWER in term {term}, leader={leader_id}")
+            self.last_heartbeat = self.clock()
+            if changed:
+                self.logger.info(f"Became FOLLOWER in term {term}, leader={leader_id}")
     
     def become_candidate(self):
         """Transition to candidate state"""
@@ -231,8 +404,11 @@ class RaftState:
             self.voted_for = self.node_id
             self.votes_received = {self.node_id}
             self.current_leader = None
+            self.last_heartbeat = self.clock()  # Restart the election timer
             self._save_state()
-            print(f"[State-{self.node_id}] Became CANDIDATE in term {self.current_term}")
+            if self.metrics:
+                self.metrics.term_changes.inc()
+            self.logger.info(f"Became CANDIDATE in term {self.current_term}")
     
     def become_leader(self, peer_ids: List[str]):
         """Transition to leader state"""
@@ -245,7 +421,7 @@ class RaftState:
             self.next_index = {peer_id: next_index for peer_id in peer_ids}
             self.match_index = {peer_id: 0 for peer_id in peer_ids}
             
-            print(f"[State-{self.node_id}] Became LEADER in term {self.current_term}")
+            self.logger.info(f"Became LEADER in term {self.current_term}")
     
     def record_vote(self, voter_id: str):
         """Record a vote received"""
@@ -260,9 +436,9 @@ class RaftState:
     def update_heartbeat(self):
         """Update last heartbeat time"""
         with self.lock:
-            self.last_heartbeat = time.time()
+            self.last_heartbeat = self.clock()
     
     def time_since_heartbeat(self) -> float:
         """Get time since last heartbeat"""
         with self.lock:
-            return time.time() - self.last_heartbeat
+            return self.clock() - self.last_heartbeat
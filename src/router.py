@@ -0,0 +1,86 @@
+"""
+Key routers for Multi-Raft - map keys to Raft groups
+"""
+import bisect
+import zlib
+from typing import List
+
+
+def key_of(command: str) -> str:
+    """
+    Extract the key from a command string
+    
+    Args:
+        command: Command string such as "SET key value", "GET key" or "DELETE key"
+    
+    Returns:
+        The key, or "" if the command has none
+    """
+    parts = command.split(maxsplit=2)
+    return parts[1] if len(parts) > 1 else ""
+
+
+class HashRouter:
+    """Spread keys evenly over groups by CRC32 hash"""
+    
+    def __init__(self, num_groups: int):
+        """
+        Initialize the router
+        
+        Args:
+            num_groups: Number of Raft groups (group ids 0..num_groups-1)
+        """
+        if num_groups < 1:
+            raise ValueError("num_groups must be at least 1")
+        self.num_groups = num_groups
+    
+    def group_for(self, key: str) -> int:
+        """Get the group id owning a key"""
+        return zlib.crc32(key.encode("utf-8")) % self.num_groups
+
+
+class RangeRouter:
+    """
+    Assign contiguous key ranges to groups
+    
+    With split keys [s1, s2, ...], group 0 owns keys < s1, group 1 owns
+    s1 <= key < s2, and so on; the last group owns everything above the last split.
+    """
+    
+    def __init__(self, splits: List[str]):
+        """
+        Initialize the router
+        
+        Args:
+            splits: Sorted, distinct split keys (num_groups - 1 of them)
+        """
+        if list(splits) != sorted(set(splits)):
+            raise ValueError("Range splits must be sorted and distinct")
+        self.splits = list(splits)
+        self.num_groups = len(self.splits) + 1
+    
+    def group_for(self, key: str) -> int:
+        """Get the group id owning a key"""
+        return bisect.bisect_right(self.splits, key)
+
+
+def build_router(kind: str, num_groups: int, splits: List[str] = None):
+    """
+    Build a router from command-line style settings
+    
+    Args:
+        kind: "hash" or "range"
+        num_groups: Number of Raft groups
+        splits: Split keys for a range router
+    
+    Returns:
+        HashRouter or RangeRouter
+    """
+    if kind == "hash":
+        return HashRouter(num_groups)
+    if kind == "range":
+        router = RangeRouter(splits or [])
+        if router.num_groups != num_groups:
+            raise ValueError(f"{num_groups} groups need {num_groups - 1} range splits, got {len(router.splits)}")
+        return router
+    raise ValueError(f"Unknown router '{kind}'")
@@ -0,0 +1,412 @@
+"""
+Deterministic in-memory RAFT cluster simulator
+
+Runs real RaftNodes without threads or sockets: a virtual clock, seeded
+random generators and a single event queue decide when nodes tick and when
+messages arrive, so every scenario replays exactly from its seed. The
+simulated network can delay, drop, reorder and partition messages, and a
+SafetyChecker verifies Raft's safety properties while the cluster runs.
+
+Nodes save without fsync (durability "none"): a simulated crash loses no
+file writes anyway. The leader's save of its new proposals instead waits a
+random virtual disk latency, so replication overtakes it and a crash can
+lose proposals the leader has already sent.
+"""
+import heapq
+import os
+import random
+import shutil
+import tempfile
+from typing import Callable, Dict, List, Optional
+
+from node import RaftNode
+from raft_state import NodeState
+from transport import Transport, TransportError
+
+# RPCs the simulated network can deliver, and the RaftNode handler for each
+HANDLERS = {
+    "RequestVote": "handle_request_vote",
+    "AppendEntries": "handle_append_entries",
+    "GetStatus": "handle_get_status",
+}
+
+
+class SimNetwork:
+    """Virtual clock, event queue and lossy network shared by all simulated nodes"""
+    
+    def __init__(self, rng: random.Random, latency=(0.001, 0.010), drop_rate: float = 0.0,
+                 reorder_rate: float = 0.0):
+        """
+        Initialize the network
+        
+        Args:
+            rng: Random generator deciding latencies and drops
+            latency: (min, max) one-way message delay in seconds
+            drop_rate: Probability that a message is lost
+            reorder_rate: Probability that a message is held back long enough
+                to be overtaken by later ones
+        """
+        self.rng = rng
+        self.latency = latency
+        self.drop_rate = drop_rate
+        self.reorder_rate = reorder_rate
+        self.now = 0.0
+        self.events = []  # heap of (time, seq, action)
+        self.seq = 0
+        self.nodes: Dict[str, Optional[RaftNode]] = {}  # None while a node is crashed
+        self.partition_of: Dict[str, int] = {}  # empty when fully connected
+        self.stats = {"sent": 0, "delivered": 0, "dropped": 0}
+    
+    def clock(self) -> float:
+        """Current virtual time in seconds"""
+        return self.now
+    
+    def schedule(self, delay: float, action: Callable[[], None]):
+        """Run action after delay virtual seconds"""
+        self.seq += 1
+        heapq.heappush(self.events, (self.now + delay, self.seq, action))
+    
+    def run_until(self, end_time: float):
+        """Process events in time order up to end_time"""
+        while self.events and self.events[0][0] <= end_time:
+            when, _, action = heapq.heappop(self.events)
+            self.now = when
+            action()
+        self.now = end_time
+    
+    def partition(self, groups: List[List[str]]):
+        """Split the network; nodes can only reach nodes in their own group"""
+        self.partition_of = {node_id: i for i, group in enumerate(groups) for node_id in group}
+    
+    def heal(self):
+        """Remove all partitions"""
+        self.partition_of = {}
+    
+    def connected(self, a: str, b: str) -> bool:
+        """Check if a and b are on the same side of the partition"""
+        return self.partition_of.get(a, -1) == self.partition_of.get(b, -1)
+    
+    def _lost(self, src: str, dst: str) -> bool:
+        return (not self.connected(src, dst) or self.nodes.get(dst) is None or
+                self.rng.random() < self.drop_rate)
+    
+    def _delay(self) -> float:
+        delay = self.rng.uniform(*self.latency)
+        if self.rng.random() < self.reorder_rate:
+            delay += self.rng.uniform(0, 5 * self.latency[1])
+        return delay
+    
+    def deliver(self, transport: "SimTransport", peer_id: str, method: str, request,
+                timeout: float, callback: Callable[[object], None]):
+        """Carry an RPC to peer_id and its response back, or fail it at the timeout"""
+        src = transport.node_id
+        self.stats["sent"] += 1
+        
+        def fail():
+            if transport.alive:
+                callback(None)
+        
+        if transport.is_isolated_from(peer_id) or self._lost(src, peer_id):
+            self.stats["dropped"] += 1
+            self.schedule(timeout, fail)
+            return
+        
+        deadline = self.now + timeout
+        request_delay = self._delay()
+        
+        def arrive():
+            target = self.nodes.get(peer_id)
+            if target is None or not self.connected(src, peer_id):
+                self.stats["dropped"] += 1
+                self.schedule(max(0.0, deadline - self.now), fail)
+                return
+            
+            response = getattr(target, HANDLERS[method])(request)
+            self.stats["delivered"] += 1
+            
+            response_delay = self._delay()
+            if self._lost(peer_id, src) or self.now + response_delay > deadline:
+                self.stats["dropped"] += 1
+                self.schedule(max(0.0, deadline - self.now), fail)
+                return
+            
+            def respond():
+                if transport.alive:
+                    callback(response)
+            
+            self.schedule(response_delay, respond)
+        
+        self.schedule(request_delay, arrive)
+
+
+class SimTransport(Transport):
+    """Transport of one simulated node incarnation"""
+    
+    def __init__(self, network: SimNetwork, node_id: str):
+        super().__init__()
+        self.network = network
+        self.node_id = node_id
+        self.alive = True  # False once the node crashed; late responses are discarded
+    
+    def connect(self, peer_id: str, address: str):
+        """Nothing to do - simulated nodes are addressed by id"""
+    
+    def call(self, peer_id: str, method: str, request, timeout: float):
+        """Blocking calls would stall the virtual clock"""
+        raise TransportError("Synchronous RPCs are not available in the simulator")
+    
+    def send(self, peer_id: str, method: str, request, timeout: float,
+             callback: Callable[[object], None]):
+        """Hand the RPC to the simulated network"""
+        self.network.deliver(self, peer_id, method, request, timeout, callback)
+
+
+class SafetyChecker:
+    """
+    Checks Raft's safety properties against the live state of every node
+    
+    - Election safety: at most one leader per term
+    - State machine safety: no two nodes commit different entries at an index
+    - Leader completeness: a new leader's log holds every committed entry
+    """
+    
+    def __init__(self):
+        self.leaders: Dict[int, str] = {}  # term -> leader id
+        self.committed: Dict[int, tuple] = {}  # index -> (term, command)
+        self.checked: Dict[str, tuple] = {}  # node id -> (node, highest index checked)
+        self.checked_leaders = set()  # terms whose leader's log was checked
+        self.violations: List[str] = []
+    
+    def check(self, nodes: Dict[str, Optional[RaftNode]], now: float):
+        """Check every live node, recording violations"""
+        for node_id, node in nodes.items():
+            if node is None:
+                continue
+            state = node.state
+            
+            if state.state == NodeState.LEADER:
+                leader = self.leaders.setdefault(state.current_term, node_id)
+                if leader != node_id:
+                    self._violation(now, f"{leader} and {node_id} are both leader of term {state.current_term}")
+                elif state.current_term not in self.checked_leaders:
+                    self.checked_leaders.add(state.current_term)
+                    for index, expected in self.committed.items():
+                        if self._entry(node, index) != expected:
+                            self._violation(now, f"Leader {node_id} of term {state.current_term} "
+                                                 f"lacks committed entry {index} {expected}")
+                            break
+            
+            checked_node, upto = self.checked.get(node_id, (None, 0))
+            if checked_node is not node:
+                upto = 0  # restarted node, check its log from the start
+            elif upto and self._entry(node, upto) != self.committed[upto]:
+                # Log matching: the entry at the watermark vouches for the whole prefix
+                self._violation(now, f"{node_id} replaced committed entry {upto}")
+            
+            for index in range(upto + 1, state.commit_index + 1):
+                entry = self._entry(node, index)
+                expected = self.committed.setdefault(index, entry)
+                if entry != expected:
+                    self._violation(now, f"{node_id} committed {entry} at index {index}, "
+                                         f"others committed {expected}")
+            self.checked[node_id] = (node, max(upto, state.commit_index))
+    
+    @staticmethod
+    def _entry(node: RaftNode, index: int):
+        entry = node.state.get_log_entry(index)
+        return (entry.term, entry.command) if entry else None
+    
+    def _violation(self, now: float, message: str):
+        self.violations.append(f"t={now:.3f}s: {message}")
+
+
+class Simulation:
+    """A cluster of RaftNodes on a SimNetwork, driven by virtual-time ticks"""
+    
+    def __init__(self, num_nodes: int = 5, seed: int = 0, latency=(0.001, 0.010),
+                 drop_rate: float = 0.0, reorder_rate: float = 0.0,
+                 election_timeout_range=(150, 300), heartbeat_interval=50,
+                 tick_interval: float = 0.01, data_dir: str = None, disk_latency=(0.001, 0.010)):
+        """
+        Initialize the simulation
+        
+        Args:
+            num_nodes: Cluster size
+            seed: Seed for the network and every node's random generator
+            latency: (min, max) one-way message delay in seconds
+            drop_rate: Probability that a message is lost
+            reorder_rate: Probability that a message is delayed past later ones
+            election_timeout_range: Range for random election timeout in ms
+            heartbeat_interval: Leader heartbeat interval in ms
+            tick_interval: Virtual seconds between node ticks
+            data_dir: Directory for node state (default: a temporary directory)
+            disk_latency: (min, max) virtual seconds a leader's save of new proposals takes
+        """
+        self.seed = seed
+        self.network = SimNetwork(random.Random(seed), latency, drop_rate, reorder_rate)
+        self.node_ids = [f"node{i}" for i in range(1, num_nodes + 1)]
+        self.election_timeout_range = election_timeout_range
+        self.heartbeat_interval = heartbeat_interval
+        self.tick_interval = tick_interval
+        self.disk_latency = disk_latency
+        self.saves = {"deferred": 0, "lost": 0}  # leader saves of new proposals
+        self.owns_data_dir = data_dir is None
+        self.data_dir = data_dir or tempfile.mkdtemp(prefix="raft_sim_")
+        self.checker = SafetyChecker()
+        self.incarnations = {node_id: 0 for node_id in self.node_ids}
+        
+        for node_id in self.node_ids:
+            self.start_node(node_id)
+        self.network.schedule(tick_interval, self._tick)
+    
+    @property
+    def nodes(self) -> Dict[str, Optional[RaftNode]]:
+        return self.network.nodes
+    
+    def start_node(self, node_id: str):
+        """Start (or restart from its persisted state) a node"""
+        self.incarnations[node_id] += 1
+        peers = {peer_id: peer_id for peer_id in self.node_ids if peer_id != node_id}
+        self.network.nodes[node_id] = RaftNode(
+            node_id, "sim", 0, peers,
+            election_timeout_range=self.election_timeout_range,
+            heartbeat_interval=self.heartbeat_interval,
+            data_dir=os.path.join(self.data_dir, node_id),
+            transport=SimTransport(self.network, node_id),
+            quiesce_interval=0,
+            durability="none",
+            clock=self.network.clock,
+            rng=random.Random(f"{self.seed}/{node_id}/{self.incarnations[node_id]}"),
+            defer_save=lambda save: self._defer_save(node_id, save)
+        )
+    
+    def _defer_save(self, node_id: str, save: Callable[[], None]):
+        """Run a leader's save after the disk latency, unless the node crashes first"""
+        incarnation = self.incarnations[node_id]
+        self.saves["deferred"] += 1
+        
+        def finish():
+            if self.nodes.get(node_id) is not None and self.incarnations[node_id] == incarnation:
+                save()
+            else:
+                self.saves["lost"] += 1
+        
+        self.network.schedule(self.network.rng.uniform(*self.disk_latency), finish)
+    
+    def crash(self, node_id: str):
+        """Stop a node; its volatile state and in-flight RPCs are lost"""
+        node = self.network.nodes.get(node_id)
+        if node is not None:
+            node.transport.alive = False
+            self.network.nodes[node_id] = None
+    
+    def leader(self) -> Optional[RaftNode]:
+        """The live leader with the highest term, if any"""
+        leaders = [node for node in self.nodes.values()
+                   if node is not None and node.state.state == NodeState.LEADER]
+        return max(leaders, key=lambda node: node.state.current_term, default=None)
+    
+    def propose(self, command: str) -> Optional[int]:
+        """Submit a command to the current leader, returning its log index"""
+        leader = self.leader()
+        return leader.propose(command) if leader else None
+    
+    def run_until(self, end_time: float):
+        """Advance virtual time to end_time"""
+        self.network.run_until(end_time)
+    
+    def _tick(self):
+        for node in list(self.nodes.values()):
+            if node is not None:
+                node.tick()
+        self.checker.check(self.nodes, self.network.now)
+        self.network.schedule(self.tick_interval, self._tick)
+    
+    def close(self):
+        """Remove the temporary data directory"""
+        if self.owns_data_dir:
+            shutil.rmtree(self.data_dir, ignore_errors=True)
+
+
+def run_scenario(seed: int, num_nodes: int = 5, duration: float = 2.0, faults: bool = True,
+                 max_drop_rate: float = 0.05, proposal_rate: float = 20.0,
+                 fault_rate: float = 2.0) -> dict:
+    """
+    Run one randomized scenario: proposals under crashes, restarts and partitions
+    
+    After `duration` virtual seconds the network heals, every crashed node
+    restarts and the cluster gets two more seconds to settle.
+    
+    Args:
+        seed: Scenario seed (the same seed always replays the same run)
+        num_nodes: Cluster size
+        duration: Virtual seconds of faulty operation
+        faults: False to run without crashes or partitions
+        max_drop_rate: Upper bound of the randomly chosen message drop rate
+        proposal_rate: Client proposals per virtual second
+        fault_rate: Crash / restart / partition / heal events per virtual second
+    
+    Returns:
+        Dictionary with the violations found and run statistics
+    """
+    rng = random.Random(f"scenario/{seed}")
+    sim = Simulation(num_nodes, seed,
+                     drop_rate=rng.uniform(0, max_drop_rate) if faults else 0.0,
+                     reorder_rate=rng.uniform(0, 0.2) if faults else 0.0)
+    step = 0.01
+    proposals = 0
+    try:
+        now = 0.0
+        while now < duration and not sim.checker.violations:
+            now += step
+            sim.run_until(now)
+            
+            if rng.random() < proposal_rate * step:
+                if sim.propose(f"SET k{proposals % 50} v{proposals}") is not None:
+                    proposals += 1
+            
+            if faults and rng.random() < fault_rate * step:
+                _inject_fault(sim, rng)
+        
+        # Settle: heal everything and check the cluster still makes progress
+        sim.network.heal()
+        for node_id in sim.node_ids:
+            if sim.nodes[node_id] is None:
+                sim.start_node(node_id)
+        sim.run_until(now + 1.5)
+        sim.propose("SET settled yes")
+        sim.run_until(now + 2.0)
+        
+        leader = sim.leader()
+        return {
+            "seed": seed,
+            "violations": sim.checker.violations,
+            "virtual_seconds": sim.network.now,
+            "proposals": proposals,
+            "committed": len(sim.checker.committed),
+            "terms": max(node.state.current_term for node in sim.nodes.values()),
+            "leader": leader.node_id if leader else None,
+            "lost_saves": sim.saves["lost"],
+            **sim.network.stats,
+        }
+    finally:
+        sim.close()
+
+
+def _inject_fault(sim: Simulation, rng: random.Random):
+    """Apply one random crash, restart, partition or heal"""
+    crashed = [node_id for node_id in sim.node_ids if sim.nodes[node_id] is None]
+    live = [node_id for node_id in sim.node_ids if sim.nodes[node_id] is not None]
+    action = rng.choice(["crash", "restart", "partition", "heal"])
+    
+    if action == "crash" and live:
+        sim.crash(rng.choice(live))
+    elif action == "restart" and crashed:
+        sim.start_node(rng.choice(crashed))
+    elif action == "partition":
+        shuffled = list(sim.node_ids)
+        rng.shuffle(shuffled)
+        cut = rng.randint(1, len(shuffled) - 1)
+        sim.network.partition([shuffled[:cut], shuffled[cut:]])
+    else:
+        sim.network.heal()
@@ -0,0 +1,276 @@
+"""
+Smart RAFT client - leader caching, jittered retries, pipelining and batching
+
+Unlike the interactive RaftClient in scripts/client.py, SmartClient keeps
+the leader it learned (from successes and redirects) across calls, backs off
+with full jitter instead of sleeping a fixed second, and lets callers keep
+many commands in flight through futures. Commands submitted while earlier
+batches are outstanding are coalesced into one SubmitBatch RPC, so the
+leader appends and saves them together.
+
+Every client is a session: each command carries the client id and a
+sequence number, so the cluster applies a retried command at most once and
+retries after timeouts are safe. A node at capacity rejects requests with
+RESOURCE_EXHAUSTED and a retry-after hint; the client waits that long (plus
+jitter) before trying the same node again.
+
+watch() streams the mutations applied to a key or prefix, reconnecting and
+resuming after the last event it delivered.
+"""
+import queue
+import random
+import threading
+import time
+import uuid
+import sys
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import grpc
+
+# Add proto directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'proto'))
+
+import raft_pb2
+from transport import get_channel_pool
+from admission import retry_after
+
+
+class ClientError(Exception):
+    """A command could not be committed within the retry budget"""
+
+
+class SmartClient:
+    """
+    Pipelined, batching client for a single-group RAFT cluster
+    
+    Commands in one batch commit in submission order; with max_inflight > 1,
+    concurrent batches may commit in any order.
+    
+    Example:
+        client = SmartClient({"node1": "localhost:5001", "node2": "localhost:5002"})
+        futures = [client.submit(f"SET k{i} v") for i in range(100)]
+        results = [f.result() for f in futures]  # "OK: SET k0=v", ...
+        client.close()
+    """
+    
+    def __init__(self, nodes, max_batch: int = 64, max_inflight: int = 8, timeout: float = 5.0,
+                 retry_timeout: float = 15.0, initial_backoff: float = 0.05, max_backoff: float = 1.0,
+                 rng: random.Random = None, client_id: str = None):
+        """
+        Initialize the client
+        
+        Args:
+            nodes: Dict of {node_id: "host:port"}, or a list of addresses (named node1, node2, ...)
+            max_batch: Most commands sent in one SubmitBatch RPC
+            max_inflight: Most SubmitBatch RPCs outstanding at once
+            timeout: Deadline of each RPC in seconds
+            retry_timeout: Seconds a batch is retried before its futures fail with ClientError
+            initial_backoff: First retry backoff in seconds (doubles per attempt, full jitter)
+            max_backoff: Upper bound of the retry backoff in seconds
+            rng: random.Random for node choice and jitter (default: a new unseeded one)
+            client_id: Session id (default: a random UUID); reuse one only after the
+                previous client with that id has stopped
+        """
+        if not isinstance(nodes, dict):
+            nodes = {f"node{i}": address for i, address in enumerate(nodes, 1)}
+        self.nodes: Dict[str, str] = dict(nodes)
+        self.stubs = {node_id: get_channel_pool().stub(address) for node_id, address in self.nodes.items()}
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self.retry_timeout = retry_timeout
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.rng = rng or random.Random()
+        
+        self.leader: Optional[str] = None  # cached leader id
+        self.lock = threading.Lock()
+        self.client_id = client_id or uuid.uuid4().hex
+        self.next_sequence = 1
+        self.unanswered = set()  # first sequence of every batch still in flight
+        self.pending = queue.Queue()  # (command, sequence, future); None stops the sender
+        self.slots = threading.Semaphore(max_inflight)
+        self.executor = ThreadPoolExecutor(max_workers=max_inflight)
+        self.closed = False
+        self.sender = threading.Thread(target=self._send_loop, daemon=True)
+        self.sender.start()
+    
+    def submit(self, command: str) -> Future:
+        """
+        Submit a command without waiting
+        
+        Returns:
+            Future resolving to the command's result, or failing with ClientError
+        """
+        future = Future()
+        if self.closed:
+            future.set_exception(ClientError("Client is closed"))
+            return future
+        with self.lock:
+            # Sequence numbers enter the queue in order, so every batch is a contiguous range
+            self.pending.put((command, self.next_sequence, future))
+            self.next_sequence += 1
+        return future
+    
+    def execute(self, command: str, timeout: float = None) -> str:
+        """
+        Submit a command and wait for it to be applied
+        
+        Raises:
+            ClientError: If the command could not be committed
+        
+        Returns:
+            The command's result, e.g. "OK: SET key=value"
+        """
+        return self.submit(command).result(timeout)
+    
+    def watch(self, key: str, prefix: bool = False, from_index: int = 0):
+        """
+        Stream the applied mutations of a key or key prefix
+        
+        Watches a random node. If the stream breaks, it reconnects (to any
+        node, with backoff) from the index after the last event it yielded,
+        so no event is skipped or repeated. Before the first event a
+        reconnect with from_index 0 starts from that node's present.
+        
+        Args:
+            key: Key to watch, or the prefix if prefix is True
+            prefix: Watch every key starting with key
+            from_index: First log index to deliver (0 = from now on)
+        
+        Yields:
+            raft_pb2.WatchEvent with index, type ("SET", "DELETE" or "EXPIRE"), key and value
+        
+        Raises:
+            ClientError: If the events to resume from are no longer buffered; re-read
+                the keys, then watch again from now on
+        """
+        attempt = 0
+        while not self.closed:
+            with self.lock:
+                node_id = self.rng.choice(list(self.stubs))
+            call = self.stubs[node_id].Watch(raft_pb2.WatchRequest(key=key, prefix=prefix,
+                                                                   from_index=from_index))
+            try:
+                for response in call:
+                    attempt = 0
+                    for event in response.events:
+                        from_index = event.index + 1
+                        yield event
+            except grpc.RpcError as e:
+                if e.code() == grpc.StatusCode.OUT_OF_RANGE:
+                    raise ClientError(f"Cannot resume watch from index {from_index}: {e.details()}")
+            finally:
+                call.cancel()
+            self._backoff(attempt)
+            attempt += 1
+    
+    def close(self):
+        """Stop accepting commands; outstanding ones still complete"""
+        self.closed = True
+        self.pending.put(None)
+        self.sender.join()
+        self.executor.shutdown(wait=True)
+    
+    def _send_loop(self):
+        """Drain submitted commands into batches, one free in-flight slot at a time"""
+        while True:
+            item = self.pending.get()
+            if item is None:
+                return
+            
+            # Commands queue up while every slot is busy, which is what makes batches
+            self.slots.acquire()
+            batch = [item]
+            while len(batch) < self.max_batch:
+                try:
+                    item = self.pending.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self.pending.put(None)  # stop once this batch is sent
+                    break
+                batch.append(item)
+            with self.lock:
+                self.unanswered.add(batch[0][1])
+            self.executor.submit(self._run_batch, batch)
+    
+    def _run_batch(self, batch: List[tuple]):
+        """Send one batch and resolve its futures"""
+        first_sequence = batch[0][1]
+        try:
+            results = self._submit_batch([command for command, _, _ in batch], first_sequence)
+            for (_, _, future), result in zip(batch, results):
+                future.set_result(result)
+        except ClientError as e:
+            for _, _, future in batch:
+                future.set_exception(e)
+        finally:
+            with self.lock:
+                self.unanswered.discard(first_sequence)
+            self.slots.release()
+    
+    def _submit_batch(self, commands: List[str], first_sequence: int) -> List[str]:
+        """
+        Send a batch to the leader, following redirects and retrying with backoff
+        
+        Returns:
+            The result of each command
+        """
+        request = raft_pb2.ClientBatchRequest(commands=commands, client_id=self.client_id,
+                                              first_sequence=first_sequence)
+        deadline = time.monotonic() + self.retry_timeout
+        attempt = 0
+        redirected = False
+        
+        while True:
+            node_id = self._target()
+            with self.lock:
+                # Every sequence below the oldest unanswered batch has its response
+                request.acked = min(self.unanswered) - 1
+            try:
+                response = self.stubs[node_id].SubmitBatch(request, timeout=self.timeout)
+                if response.success:
+                    with self.lock:
+                        self.leader = node_id
+                    return list(response.results)
+                error = f"{node_id}: {response.message}"
+                hint = response.leader_id if response.leader_id in self.stubs else None
+            except grpc.RpcError as e:
+                error = f"{node_id}: {e.code()}"
+                delay = retry_after(e)
+                if delay is not None:
+                    # The node is up but at capacity: keep it cached and wait as it asks
+                    if time.monotonic() + delay >= deadline:
+                        raise ClientError(f"Batch of {len(commands)} not committed within "
+                                          f"{self.retry_timeout}s ({error})")
+                    with self.lock:
+                        delay *= self.rng.uniform(1.0, 2.0)
+                    time.sleep(delay)
+                    continue
+                hint = None
+            
+            with self.lock:
+                if self.leader in (None, node_id):
+                    self.leader = hint if hint != node_id else None
+            if hint and hint != node_id and not redirected:
+                redirected = True
+                continue  # follow a fresh redirect right away, back off on the next failure
+            redirected = False
+            
+            if time.monotonic() >= deadline:
+                raise ClientError(f"Batch of {len(commands)} not committed within {self.retry_timeout}s ({error})")
+            self._backoff(attempt)
+            attempt += 1
+    
+    def _target(self) -> str:
+        """The cached leader, or a random node if none is known"""
+        with self.lock:
+            return self.leader or self.rng.choice(list(self.stubs))
+    
+    def _backoff(self, attempt: int):
+        """Sleep a full-jitter exponential backoff"""
+        with self.lock:
+            delay = self.rng.uniform(0, min(self.max_backoff, self.initial_backoff * 2 ** attempt))
+        time.sleep(delay)
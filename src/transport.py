@@ -0,0 +1,407 @@
+"""
+Transports - how a RAFT node sends RPCs to its peers
+
+RaftNode only talks to peers through a Transport, so the same node code runs
+over real gRPC channels (GrpcTransport) or inside the deterministic
+in-memory network of the simulator (simulator.SimTransport).
+"""
+import threading
+import time
+import queue
+import sys
+import os
+from collections import deque
+from typing import Callable, Dict, Iterable, Optional
+
+import grpc
+
+# Add proto directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'proto'))
+
+import raft_pb2_grpc
+
+
+# Largest gRPC message accepted or sent (large AppendEntries batches)
+MAX_MESSAGE_BYTES = 64 * 1024 * 1024
+
+# Options for every outgoing channel: keepalive pings detect dead peers on idle
+# connections, and reconnects back off exponentially instead of retrying hot
+CHANNEL_OPTIONS = [
+    ("grpc.keepalive_time_ms", 10000),
+    ("grpc.keepalive_timeout_ms", 5000),
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.http2.max_pings_without_data", 0),
+    ("grpc.initial_reconnect_backoff_ms", 100),
+    ("grpc.min_reconnect_backoff_ms", 100),
+    ("grpc.max_reconnect_backoff_ms", 1000),
+    ("grpc.max_send_message_length", MAX_MESSAGE_BYTES),
+    ("grpc.max_receive_message_length", MAX_MESSAGE_BYTES),
+]
+
+# Options for node servers, matching CHANNEL_OPTIONS (servers reject
+# keepalive pings more frequent than they allow)
+SERVER_OPTIONS = [
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.http2.min_ping_interval_without_data_ms", 5000),
+    ("grpc.max_send_message_length", MAX_MESSAGE_BYTES),
+    ("grpc.max_receive_message_length", MAX_MESSAGE_BYTES),
+]
+
+# RPC failures that mean the peer (or the path to it) is down
+_DOWN_CODES = (grpc.StatusCode.UNAVAILABLE, grpc.StatusCode.DEADLINE_EXCEEDED)
+
+# RPCs sent even to a peer that is down: a candidate must reach a restarted
+# peer at once, and elections are rare enough not to need the backoff
+_UNGATED_METHODS = {"RequestVote"}
+
+
+class ChannelPool:
+    """Process-wide cache of gRPC channels, one per address"""
+    
+    def __init__(self, options=None):
+        self.options = CHANNEL_OPTIONS if options is None else options
+        self.channels: Dict[str, grpc.Channel] = {}
+        self.lock = threading.Lock()
+    
+    def channel(self, address: str) -> grpc.Channel:
+        """Get the shared channel to an address, opening it on first use"""
+        with self.lock:
+            channel = self.channels.get(address)
+            if channel is None:
+                channel = grpc.insecure_channel(address, options=self.options)
+                self.channels[address] = channel
+            return channel
+    
+    def stub(self, address: str) -> raft_pb2_grpc.RaftServiceStub:
+        """Get a RaftService stub on the shared channel to an address"""
+        return raft_pb2_grpc.RaftServiceStub(self.channel(address))
+    
+    def close(self):
+        """Close every channel"""
+        with self.lock:
+            for channel in self.channels.values():
+                channel.close()
+            self.channels = {}
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_channel_pool() -> ChannelPool:
+    """Get the process-wide channel pool"""
+    global _default_pool
+    
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = ChannelPool()
+        return _default_pool
+
+
+class PeerHealth:
+    """
+    Up/down state of one peer
+    
+    After a failure the peer counts as down and is skipped until a backoff
+    expires (doubling with every consecutive failure); then one RPC is let
+    through as a probe. Any success marks the peer up again.
+    """
+    
+    def __init__(self, initial_backoff: float = 0.05, max_backoff: float = 1.0, clock=time.monotonic):
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.clock = clock
+        self.failures = 0
+        self.retry_at = 0.0
+        self.lock = threading.Lock()
+    
+    @property
+    def up(self) -> bool:
+        return self.failures == 0
+    
+    def available(self) -> bool:
+        """True if the peer is up, or down but due for a probe"""
+        with self.lock:
+            if self.failures == 0:
+                return True
+            if self.clock() >= self.retry_at:
+                # Let this RPC probe; hold back others until it fails again
+                self.retry_at = self.clock() + self._backoff()
+                return True
+            return False
+    
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+    
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.retry_at = self.clock() + self._backoff()
+    
+    def _backoff(self) -> float:
+        return min(self.max_backoff, self.initial_backoff * 2 ** min(self.failures - 1, 20))
+
+
+class ReplicationStream:
+    """
+    Long-lived bidirectional StreamAppendEntries call to one peer
+    
+    Requests are written to the stream as they are sent and the peer answers
+    them in order, so each response completes the oldest pending callback.
+    If a response is overdue, the call fails or the stream sits idle for
+    idle_timeout, the stream closes and every pending callback gets None.
+    """
+    
+    def __init__(self, stub, idle_timeout: float = 5.0, on_close: Callable[[bool], None] = None):
+        """
+        Open the stream
+        
+        Args:
+            stub: RaftService stub of the peer
+            idle_timeout: Close the stream after this many seconds without requests
+            on_close: Called once with True if the stream broke (False if closed idle)
+        """
+        self.idle_timeout = idle_timeout
+        self.on_close = on_close
+        self.requests = queue.Queue()
+        self.pending = deque()  # (deadline, callback) in request order
+        self.last_send = time.monotonic()
+        self.closed = False
+        self.cond = threading.Condition()
+        self.call = stub.StreamAppendEntries(iter(self.requests.get, None))
+        threading.Thread(target=self._read, daemon=True).start()
+        threading.Thread(target=self._watch, daemon=True).start()
+    
+    def send(self, request, timeout: float, callback: Callable[[object], None]) -> bool:
+        """
+        Write a request to the stream
+        
+        Returns:
+            False if the stream is closed (callback will not be called)
+        """
+        with self.cond:
+            if self.closed:
+                return False
+            self.last_send = time.monotonic()
+            self.pending.append((self.last_send + timeout, callback))
+            self.requests.put(request)
+            self.cond.notify()
+            return True
+    
+    def close(self, broken: bool = False):
+        """Close the stream, failing every pending callback"""
+        with self.cond:
+            if self.closed:
+                return
+            self.closed = True
+            pending, self.pending = self.pending, deque()
+            self.requests.put(None)
+            self.cond.notify()
+        self.call.cancel()
+        if self.on_close:
+            self.on_close(broken)
+        for _, callback in pending:
+            callback(None)
+    
+    def _read(self):
+        """Complete pending callbacks with responses as they arrive"""
+        try:
+            for response in self.call:
+                with self.cond:
+                    if not self.pending:
+                        break
+                    _, callback = self.pending.popleft()
+                callback(response)
+        except grpc.RpcError:
+            pass
+        self.close(broken=True)
+    
+    def _watch(self):
+        """Close the stream when a response is overdue or it has been idle too long"""
+        broken = False
+        with self.cond:
+            while not self.closed:
+                now = time.monotonic()
+                if self.pending:
+                    wait = self.pending[0][0] - now
+                    broken = True
+                else:
+                    wait = self.last_send + self.idle_timeout - now
+                    broken = False
+                if wait <= 0:
+                    break
+                self.cond.wait(wait)
+        self.close(broken)
+
+
+class TransportError(Exception):
+    """An RPC could not be delivered or was not answered"""
+
+
+class Transport:
+    """
+    Interface for sending RPCs to peers
+    
+    Methods are RPC names of RaftService ("RequestVote", "AppendEntries", ...).
+    Outgoing traffic to isolated peers fails as if the network dropped it.
+    """
+    
+    def __init__(self):
+        self.isolated = set()
+        self.isolation_lock = threading.Lock()
+    
+    def connect(self, peer_id: str, address: str):
+        """Register a peer reachable at address"""
+        raise NotImplementedError
+    
+    def call(self, peer_id: str, method: str, request, timeout: float):
+        """
+        Send an RPC and wait for the response
+        
+        Raises:
+            TransportError: If the peer is unreachable or did not answer in time
+        """
+        raise NotImplementedError
+    
+    def send(self, peer_id: str, method: str, request, timeout: float,
+             callback: Callable[[object], None]):
+        """
+        Send an RPC without waiting
+        
+        callback(response) runs once the response arrives, or callback(None)
+        if the RPC failed or timed out.
+        """
+        raise NotImplementedError
+    
+    def isolate(self, peer_ids: Iterable[str]):
+        """Drop all traffic to the given peers (replaces any earlier isolation)"""
+        with self.isolation_lock:
+            self.isolated = set(peer_ids)
+    
+    def is_isolated_from(self, peer_id: str) -> bool:
+        """Check if traffic to a peer is being dropped"""
+        with self.isolation_lock:
+            return peer_id in self.isolated
+    
+    def peer_health(self) -> Dict[str, bool]:
+        """Get {peer_id: up} for every known peer"""
+        return {}
+    
+    def peer_streaming(self) -> Dict[str, bool]:
+        """Get {peer_id: True if AppendEntries currently goes over a stream}"""
+        return {}
+
+
+class GrpcTransport(Transport):
+    """
+    Transport over pooled gRPC channels
+    
+    Peers that failed recently are skipped without an RPC until their
+    backoff expires, so a dead or partitioned peer does not cost a full
+    timeout on every heartbeat. RequestVote is always sent.
+    
+    With streaming enabled, asynchronous AppendEntries go over one
+    ReplicationStream per peer instead of a unary call each. When a stream
+    breaks, AppendEntries fall back to unary calls until a new stream is
+    tried after stream_retry seconds.
+    """
+    
+    def __init__(self, pool: ChannelPool = None, streaming: bool = True, stream_retry: float = 1.0):
+        super().__init__()
+        self.pool = pool or get_channel_pool()
+        self.stubs = {}
+        self.health: Dict[str, PeerHealth] = {}
+        self.streaming = streaming
+        self.stream_retry = stream_retry
+        self.streams: Dict[str, ReplicationStream] = {}
+        self.stream_retry_at: Dict[str, float] = {}
+        self.stream_lock = threading.Lock()
+    
+    def connect(self, peer_id: str, address: str):
+        """Use the pooled channel to a peer"""
+        self.stubs[peer_id] = self.pool.stub(address)
+        self.health[peer_id] = PeerHealth()
+    
+    def peer_health(self) -> Dict[str, bool]:
+        """Get {peer_id: up} for every known peer"""
+        return {peer_id: health.up for peer_id, health in self.health.items()}
+    
+    def peer_streaming(self) -> Dict[str, bool]:
+        """Get {peer_id: True if AppendEntries currently goes over a stream}"""
+        with self.stream_lock:
+            return {peer_id: peer_id in self.streams for peer_id in self.stubs}
+    
+    def _stream(self, peer_id: str, stub) -> Optional[ReplicationStream]:
+        """Get the peer's replication stream, opening one unless backing off"""
+        with self.stream_lock:
+            stream = self.streams.get(peer_id)
+            if stream is None and time.monotonic() >= self.stream_retry_at.get(peer_id, 0.0):
+                
+                def on_close(broken, peer_id=peer_id):
+                    with self.stream_lock:
+                        if self.streams.get(peer_id) is stream:
+                            del self.streams[peer_id]
+                        if broken:
+                            self.stream_retry_at[peer_id] = time.monotonic() + self.stream_retry
+                    if broken:
+                        self.health[peer_id].record_failure()
+                
+                stream = ReplicationStream(stub, on_close=on_close)
+                self.streams[peer_id] = stream
+            return stream
+    
+    def _stub(self, peer_id: str, method: str):
+        if self.is_isolated_from(peer_id):
+            raise TransportError(f"Isolated from {peer_id}")
+        stub = self.stubs.get(peer_id)
+        if stub is None:
+            raise TransportError(f"Unknown peer {peer_id}")
+        if method not in _UNGATED_METHODS and not self.health[peer_id].available():
+            raise TransportError(f"{peer_id} is down")
+        return stub
+    
+    def _record(self, peer_id: str, error):
+        """Update a peer's health after an RPC (error is None on success)"""
+        if error is None:
+            self.health[peer_id].record_success()
+        elif isinstance(error, grpc.Call) and error.code() in _DOWN_CODES:
+            self.health[peer_id].record_failure()
+    
+    def call(self, peer_id: str, method: str, request, timeout: float):
+        """Send an RPC and wait for the response"""
+        stub = self._stub(peer_id, method)
+        try:
+            response = getattr(stub, method)(request, timeout=timeout)
+        except grpc.RpcError as e:
+            self._record(peer_id, e)
+            raise TransportError(f"{method} to {peer_id} failed: {e.code()}") from e
+        self._record(peer_id, None)
+        return response
+    
+    def send(self, peer_id: str, method: str, request, timeout: float,
+             callback: Callable[[object], None]):
+        """Send an RPC without waiting; callback runs on a gRPC thread"""
+        try:
+            stub = self._stub(peer_id, method)
+        except TransportError:
+            callback(None)
+            return
+        
+        if method == "AppendEntries" and self.streaming:
+            stream = self._stream(peer_id, stub)
+            
+            def streamed(response):
+                if response is not None:
+                    self._record(peer_id, None)
+                callback(response)
+            
+            if stream is not None and stream.send(request, timeout, streamed):
+                return
+        
+        def done(future):
+            error = future.exception()
+            self._record(peer_id, error)
+            callback(future.result() if error is None else None)
+        
+        getattr(stub, method).future(request, timeout=timeout).add_done_callback(done)
@@ -0,0 +1,265 @@
+"""
+Value log: large values stored once, outside the Raft log and the store
+
+Without it a SET's value sits in the log entry's command, so it is held in
+memory twice (log and store), rewritten with the whole log file and the
+whole store file on every save, and kept in every retained log entry. With
+a value log, values of at least `threshold` bytes are appended once to an
+append-only blob file, and the command in the log and the value in the
+store hold only a reference to it.
+
+Values are addressed by their SHA-256 digest, so a reference means the same
+value on every node and identical values are stored once. Replication
+still sends values inline: the leader resolves references when it builds
+AppendEntries, and each follower moves the values into its own value log as
+it appends the entries.
+
+A record is "<digest> <length>\\n<value bytes>\\n". A torn record at the
+end of the file (a crash during an append) is cut off when the file is
+loaded. Values nothing refers to any more are garbage; collect_garbage
+rewrites the file with the live ones only.
+"""
+import hashlib
+import os
+import threading
+from typing import Dict, Iterable, Set, Tuple
+
+from logger import get_logger
+from durability import DurabilityPolicy
+from kvstore import MissingValue, split_ttl
+
+
+# Marks a reference: VALUE_REF + 64 hex digits of the value's SHA-256 digest.
+# A client value that looks like an unknown reference is kept as it is.
+VALUE_REF = "\x00vlog:"
+DIGEST_LENGTH = 64
+
+# Commands whose last argument is a value, and the number of words before it
+VALUE_COMMANDS = {"SET": 2, "CAS": 3}
+
+
+class ValueLog:
+    """Append-only file of large values, addressed by digest"""
+    
+    def __init__(self, node_id: str, path: str, threshold: int, durability: DurabilityPolicy = None):
+        """
+        Open (or create) the value log
+        
+        Args:
+            node_id: Node the file belongs to (for logging)
+            path: Path of the blob file
+            threshold: Smallest value in bytes stored in the value log
+            durability: When appends are fsynced (default: before every sync returns)
+        """
+        self.path = path
+        self.threshold = threshold
+        self.durability = durability or DurabilityPolicy(node_id)
+        self.logger = get_logger("ValueLog", node_id)
+        self.lock = threading.Lock()
+        self.index: Dict[str, Tuple[int, int]] = {}  # {digest: (offset, length)} of the values
+        self.dirty = False  # appended since the last sync
+        
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if not os.path.exists(path):
+            self.durability.write(path, b"", now=True)
+        self._load()
+        self.file = open(path, "a+b")
+    
+    def _load(self):
+        """Index the records in the file, cutting off a torn one at the end"""
+        with open(self.path, "r+b") as f:
+            offset = 0
+            while True:
+                header = f.readline()
+                if not header:
+                    break
+                try:
+                    digest, length = header.decode().split()
+                    length = int(length)
+                except ValueError:
+                    break
+                value_offset = offset + len(header)
+                if len(f.read(length + 1)) != length + 1:
+                    break
+                self.index[digest] = (value_offset, length)
+                offset = value_offset + length + 1
+            if offset != os.path.getsize(self.path):
+                self.logger.warning(f"Cutting off a torn record at offset {offset}")
+                f.truncate(offset)
+        self.logger.info(f"Loaded {len(self.index)} values")
+    
+    @property
+    def size(self) -> int:
+        """Bytes in the file"""
+        with self.lock:
+            self.file.seek(0, os.SEEK_END)
+            return self.file.tell()
+    
+    def put(self, value: str) -> str:
+        """
+        Store a value (once, however often it is put) without syncing
+        
+        Returns:
+            A reference to the value
+        """
+        data = value.encode()
+        digest = hashlib.sha256(data).hexdigest()
+        with self.lock:
+            if digest not in self.index:
+                header = f"{digest} {len(data)}\n".encode()
+                self.file.seek(0, os.SEEK_END)
+                offset = self.file.tell() + len(header)
+                self.file.write(header + data + b"\n")
+                self.index[digest] = (offset, len(data))
+                self.dirty = True
+        return VALUE_REF + digest
+    
+    def get(self, ref: str) -> str:
+        """
+        Get the value of a reference
+        
+        Raises:
+            KeyError: If the value is not in the value log
+        """
+        digest = ref[len(VALUE_REF):]
+        with self.lock:
+            if digest not in self.index:
+                raise KeyError(f"Value {digest} is not in the value log")
+            offset, length = self.index[digest]
+            self.file.flush()
+            self.file.seek(offset)
+            return self.file.read(length).decode()
+    
+    def sync(self):
+        """Make every value put so far durable (call before saving entries that refer to them; see sync_append)"""
+        with self.lock:
+            if self.dirty:
+                self.durability.sync_append(self.file)
+                self.dirty = False
+    
+    def externalize(self, command: str) -> str:
+        """
+        Move the value of a large SET or CAS command into the value log
+        
+        Returns:
+            The command with the value replaced by a reference (unchanged if
+            it has no value of at least threshold bytes)
+        """
+        if len(command) < self.threshold:
+            return command
+        words = command.split(maxsplit=1)
+        fields = VALUE_COMMANDS.get(words[0].upper()) if words else None
+        if not fields:
+            return command
+        parts = command.split(maxsplit=fields)
+        if len(parts) <= fields:
+            return command
+        
+        argument = parts[fields]
+        try:
+            value, _ = split_ttl(argument)  # keep a TTL suffix in the command
+        except ValueError:
+            return command  # left for the store to reject
+        if len(value.encode()) < self.threshold or value.startswith(VALUE_REF):
+            return command
+        return " ".join(parts[:fields] + [self.put(value) + argument[len(value):]])
+    
+    def internalize(self, command: str) -> str:
+        """
+        Replace a reference in a command with its value (for sending the command to a peer)
+        
+        A reference whose value is missing is sent as it is, so replication
+        goes on; reads of it fail on the peer as they do here.
+        """
+        start = command.find(VALUE_REF)
+        if start < 0:
+            return command
+        end = start + len(VALUE_REF) + DIGEST_LENGTH
+        try:
+            return command[:start] + self.resolve(command[start:end]) + command[end:]
+        except MissingValue as e:
+            self.logger.error(f"Sending a reference as it is: {e}")
+            return command
+    
+    def holds(self, value: str) -> bool:
+        """True if a stored value is a reference to a value in the value log (without reading it)"""
+        if not value.startswith(VALUE_REF):
+            return False
+        with self.lock:
+            return value[len(VALUE_REF):] in self.index
+    
+    def inline_size(self, command: str) -> int:
+        """Length of a command with its referenced value inline (without reading the value)"""
+        start = command.find(VALUE_REF)
+        if start < 0:
+            return len(command)
+        digest = command[start + len(VALUE_REF):start + len(VALUE_REF) + DIGEST_LENGTH]
+        with self.lock:
+            if digest not in self.index:
+                return len(command)
+            length = self.index[digest][1]
+        return len(command) - len(VALUE_REF) - DIGEST_LENGTH + length
+    
+    def resolve(self, value: str) -> str:
+        """
+        Get the value a stored value stands for (itself unless it is a reference)
+        
+        Raises:
+            MissingValue: If it is a well-formed reference whose value is not in the value log
+        """
+        if not value.startswith(VALUE_REF):
+            return value
+        try:
+            return self.get(value)
+        except KeyError:
+            digest = value[len(VALUE_REF):]
+            if len(digest) != DIGEST_LENGTH or not all(c in "0123456789abcdef" for c in digest):
+                return value  # a client's value that only looks like a reference
+            raise MissingValue(f"Value {digest} is missing from the value log") from None
+    
+    def collect_garbage(self, texts: Iterable[str]) -> int:
+        """
+        Rewrite the file with only the values the given texts refer to
+        
+        Args:
+            texts: Every command and stored value that may hold a reference
+        
+        Returns:
+            Bytes reclaimed
+        """
+        live: Set[str] = set()
+        for text in texts:
+            start = text.find(VALUE_REF)
+            if start >= 0:
+                live.add(text[start + len(VALUE_REF):start + len(VALUE_REF) + DIGEST_LENGTH])
+        
+        with self.lock:
+            if live >= set(self.index):
+                return 0
+            records = []
+            index = {}
+            offset = 0
+            for digest in live & set(self.index):
+                value_offset, length = self.index[digest]
+                self.file.flush()
+                self.file.seek(value_offset)
+                header = f"{digest} {length}\n".encode()
+                records.append(header + self.file.read(length) + b"\n")
+                index[digest] = (offset + len(header), length)
+                offset += len(records[-1])
+            
+            self.file.seek(0, os.SEEK_END)
+            reclaimed = self.file.tell() - offset
+            self.file.close()
+            self.durability.write(self.path, b"".join(records), now=True)
+            self.file = open(self.path, "a+b")
+            self.index = index
+            self.dirty = False
+        self.logger.info(f"Collected {reclaimed} bytes of garbage, {len(index)} values live")
+        return reclaimed
+    
+    def close(self):
+        """Sync and close the file"""
+        self.sync()
+        with self.lock:
+            self.file.close()
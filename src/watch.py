@@ -0,0 +1,114 @@
+"""
+Change feed of applied mutations, for the Watch RPC
+
+The key-value store publishes every mutation it applies, with its log
+index, to a WatchHub. The hub keeps the latest events in one fixed-size
+ring shared by all watchers, and each watcher only holds a cursor into it.
+Publishing therefore costs the same with one watcher or a thousand and
+never waits for any of them: a watcher too slow to keep up finds its
+cursor overwritten and is disconnected. It can reconnect from the index of
+its last event, as long as the events after it are still in the ring.
+"""
+import threading
+from typing import List, Optional, Tuple
+
+
+class WatchExpired(Exception):
+    """The events a watcher needs are no longer in the ring"""
+    
+    def __init__(self, message: str, index: int):
+        """
+        Args:
+            message: What was lost
+            index: Highest log index whose events may be missing
+        """
+        super().__init__(message)
+        self.index = index
+
+
+class WatchHub:
+    """
+    Ring buffer of applied mutations shared by all watchers
+    
+    Events are (index, op, key, value) tuples: op is "SET", "DELETE" or
+    "EXPIRE" (a key deleted by its TTL), and value is empty unless op is
+    "SET". Every event gets a sequence number; event sequence s lives in
+    ring slot s % capacity while s >= first_sequence.
+    """
+    
+    def __init__(self, capacity: int = 4096, start_index: int = 0):
+        """
+        Initialize the hub
+        
+        Args:
+            capacity: Events kept for watchers to catch up on or resume from
+            start_index: Index already applied before the hub existed; events
+                up to it were never published and cannot be watched
+        """
+        self.capacity = capacity
+        self.ring: List[Optional[Tuple[int, str, str, str]]] = [None] * capacity
+        self.first_sequence = 0  # oldest event still in the ring
+        self.next_sequence = 0  # sequence of the next event
+        self.horizon = start_index  # events up to this index may be missing
+        self.watchers = 0  # open watch streams (maintained by their handlers)
+        self.condition = threading.Condition()
+    
+    def publish(self, events: List[Tuple[int, str, str, str]]):
+        """Add applied events (in index order) and wake the watchers"""
+        if not events:
+            return
+        with self.condition:
+            for event in events:
+                if self.next_sequence - self.first_sequence == self.capacity:
+                    self.horizon = self.ring[self.first_sequence % self.capacity][0]
+                    self.first_sequence += 1
+                self.ring[self.next_sequence % self.capacity] = event
+                self.next_sequence += 1
+            self.condition.notify_all()
+    
+    def cursor(self, from_index: int = 0) -> int:
+        """
+        Get a cursor for a new watcher
+        
+        Args:
+            from_index: First log index to deliver (0 = only events published from now on)
+        
+        Returns:
+            Sequence of the first event to deliver
+        
+        Raises:
+            WatchExpired: If events at or after from_index are no longer in the ring
+        """
+        with self.condition:
+            if not from_index:
+                return self.next_sequence
+            if from_index <= self.horizon:
+                raise WatchExpired(f"Events from index {from_index} are no longer available", self.horizon)
+            
+            # Binary search for the first buffered event at or after from_index
+            low, high = self.first_sequence, self.next_sequence
+            while low < high:
+                middle = (low + high) // 2
+                if self.ring[middle % self.capacity][0] < from_index:
+                    low = middle + 1
+                else:
+                    high = middle
+            return low
+    
+    def read(self, cursor: int, timeout: float) -> Tuple[List[Tuple[int, str, str, str]], int]:
+        """
+        Get the events from cursor on, waiting up to timeout for one
+        
+        Returns:
+            (events, cursor to read from next); events is empty on timeout
+        
+        Raises:
+            WatchExpired: If the ring overwrote events at the cursor (the watcher fell behind)
+        """
+        with self.condition:
+            if cursor == self.next_sequence:
+                self.condition.wait(timeout)
+            if cursor < self.first_sequence:
+                raise WatchExpired("Watcher fell behind the change feed", self.horizon)
+            events = [self.ring[sequence % self.capacity] for sequence in range(cursor, self.next_sequence)]
+            return events, self.next_sequence
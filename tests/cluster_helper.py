@@ -0,0 +1,107 @@
+"""
+Helpers for tests that run nodes inside the test process, in temporary
+data directories that are removed when the test is done
+"""
+import sys
+import os
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from node import RaftNode
+
+def start_nodes(ports, **options):
+    """
+    Start one RaftNode per port in this process, each with a fresh data directory
+    
+    Args:
+        ports: Dictionary of {node_id: port} on localhost
+        **options: Further RaftNode arguments given to every node
+    
+    Returns:
+        Dictionary of {node_id: RaftNode}; pass it to stop_nodes when done
+    """
+    nodes = {}
+    try:
+        for node_id, port in ports.items():
+            peers = {peer_id: f"localhost:{p}" for peer_id, p in ports.items() if peer_id != node_id}
+            nodes[node_id] = RaftNode(node_id, "localhost", port, peers, data_dir=tempfile.mkdtemp(),
+                                      **options)
+            nodes[node_id].start()
+    except Exception:
+        stop_nodes(nodes)
+        raise
+    return nodes
+
+def stop_nodes(nodes):
+    """Stop the nodes, then remove their data directories once no thread can write to them"""
+    errors = []
+    for node in nodes.values():
+        try:
+            node.stop()
+        except Exception as e:
+            errors.append(e)
+    for node in nodes.values():
+        shutil.rmtree(node.kvstore.data_dir, ignore_errors=True)
+    if errors:
+        raise errors[0]
+
+class TempNodes:
+    """
+    In-process nodes and data directories of one test, all stopped and removed by cleanup()
+    
+    Use it in a try/finally so nothing is left behind when a step fails:
+    
+        nodes = TempNodes()
+        try:
+            leader = nodes.leader("leader", {"p1": "localhost:1"})
+            ...
+        finally:
+            nodes.cleanup()
+    """
+    
+    def __init__(self):
+        self.nodes = []
+        self.dirs = []
+    
+    def data_dir(self) -> str:
+        """Create a temporary directory that cleanup removes"""
+        path = tempfile.mkdtemp()
+        self.dirs.append(path)
+        return path
+    
+    def add(self, node):
+        """Have cleanup stop a node created by the test (a RaftNode or MultiRaftNode)"""
+        self.nodes.append(node)
+        return node
+    
+    def node(self, node_id, peers=None, port=0, data_dir=None, **options) -> RaftNode:
+        """
+        Create a RaftNode (not started) on localhost
+        
+        Args:
+            node_id: Node identifier
+            peers: Dictionary of {peer_id: address} (default: none)
+            port: Port to serve on if the test starts the node
+            data_dir: Data directory to reuse, e.g. to restart a node (default: a new one)
+            **options: Further RaftNode arguments
+        """
+        return self.add(RaftNode(node_id, "localhost", port, peers or {}, data_dir=data_dir or self.data_dir(),
+                                 **options))
+    
+    def leader(self, node_id="leader", peers=None, term=1, **options) -> RaftNode:
+        """Create a RaftNode (not started) that is already leader of the given term"""
+        node = self.node(node_id, peers, **options)
+        node.state.update_term(term)
+        node.state.become_leader(node.peer_ids)
+        return node
+    
+    def cleanup(self):
+        """Stop every node, then remove every data directory"""
+        try:
+            for node in self.nodes:
+                node.stop()
+        finally:
+            for path in self.dirs:
+                shutil.rmtree(path, ignore_errors=True)
@@ -28,6 +28,23 @@ def main():
         ("test_leader_failure.py", "Leader Failure Test"),
         ("test_follower_failure.py", "Follower Failure Test"),
         ("test_network_partition.py", "Network Partition Test"),
+        ("test_follower_io.py", "Follower Disk I/O Test"),
+        ("test_simulation.py", "Deterministic Simulation Test"),
+        ("test_compression.py", "AppendEntries Compression Test"),
+        ("test_streaming.py", "Streaming Replication Test"),
+        ("test_smart_client.py", "Smart Client Test"),
+        ("test_restart_apply.py", "Restart Apply Test"),
+        ("test_durability.py", "Durability Policy Test"),
+        ("test_leader_persist.py", "Leader Persistence Test"),
+        ("test_forwarding.py", "Proposal Forwarding Test"),
+        ("test_admission.py", "Admission Control Test"),
+        ("test_watch.py", "Watch Test"),
+        ("test_scan.py", "Scan Test"),
+        ("test_ttl.py", "Key TTL Test"),
+        ("test_revisions.py", "Revisions Test"),
+        ("test_value_log.py", "Value Log Test"),
+        ("test_read_index.py", "Read Index Test"),
+        ("test_multi_raft.py", "Multi-Raft Test"),
     ]
     
     print("\n" + "=" * 80)
@@ -0,0 +1,142 @@
+"""
+Test: Admission Control
+Verifies that the leader caps its uncommitted entries and bytes, that busy
+client slots reject client RPCs with RESOURCE_EXHAUSTED and a retry-after
+hint while consensus RPCs are still served (ReadIndex counts as a client
+RPC), and that SmartClient waits and retries after such a rejection
+(runs in-process on local port 7331, no cluster needed)
+"""
+import sys
+import os
+import time
+import threading
+
+import grpc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'proto'))
+
+import raft_pb2
+import raft_pb2_grpc
+from raft_state import NodeState
+from admission import Overloaded, retry_after
+from smart_client import SmartClient
+from cluster_helper import TempNodes
+
+def test_admission():
+    """Test the uncommitted limits and the client slots"""
+    print("\n" + "=" * 70)
+    print("TEST: Admission Control")
+    print("=" * 70)
+    
+    nodes = TempNodes()
+    try:
+        print("\n1. Proposing past the uncommitted entry limit...")
+        node = nodes.leader("leader", {"p1": "localhost:1", "p2": "localhost:2"},
+                            max_uncommitted_entries=5, max_uncommitted_bytes=100)
+        for i in range(5):
+            node.propose(f"SET k{i} v")
+        try:
+            node.propose("SET k5 v")
+            print("\n✗ TEST FAILED: The sixth uncommitted entry should be rejected")
+            return False
+        except Overloaded as e:
+            print(f"   Rejected: {e} (retry after {e.retry_after}s)")
+        
+        print("\n2. Proposing past the uncommitted byte limit...")
+        with node.state.lock:
+            node.state.commit_index = 4
+        try:
+            node.propose_batch(["SET big " + "x" * 100])
+            print("\n✗ TEST FAILED: A batch over the byte limit should be rejected")
+            return False
+        except Overloaded as e:
+            print(f"   Rejected: {e}")
+        
+        print("\n3. Proposing once everything has committed...")
+        with node.state.lock:
+            node.state.commit_index = len(node.state.log)
+        index = node.propose_batch(["SET big " + "x" * 100])
+        rejected = sum(counter.value for counter in node.metrics.rejected_proposals.values())
+        print(f"   Appended at index {index}, rejections counted: {rejected}, "
+              f"uncommitted bytes: {node.state.uncommitted_bytes}")
+        if index != 6 or rejected != 2 or node.state.uncommitted_bytes != len("SET big " + "x" * 100):
+            print("\n✗ TEST FAILED: An empty uncommitted tail should admit any batch")
+            return False
+        
+        print("\n4. Truncating the uncommitted tail...")
+        node.state.truncate_log(index)
+        node.propose("SET k6 v")
+        print(f"   Uncommitted bytes: {node.state.uncommitted_bytes}")
+        if node.state.uncommitted_bytes != len("SET k6 v"):
+            print("\n✗ TEST FAILED: Truncation should reset the uncommitted byte count")
+            return False
+        
+        print("\n5. Sending a client RPC while the only client slot is busy...")
+        server = nodes.node("solo", port=7331, max_client_rpcs=1)
+        gate = threading.Event()
+        handle = server.handle_submit_command
+        server.handle_submit_command = lambda request: gate.wait(10) and handle(request)
+        server.start()
+        channel = grpc.insecure_channel("localhost:7331")
+        stub = raft_pb2_grpc.RaftServiceStub(channel)
+        client = SmartClient({"solo": "localhost:7331"}, retry_timeout=10)
+        try:
+            deadline = time.time() + 10
+            while server.state.state != NodeState.LEADER and time.time() < deadline:
+                time.sleep(0.05)
+            
+            held = stub.SubmitCommand.future(raft_pb2.ClientRequest(command="SET held yes"), timeout=10)
+            time.sleep(0.2)
+            start = time.time()
+            try:
+                stub.SubmitBatch(raft_pb2.ClientBatchRequest(commands=["SET other yes"]), timeout=5)
+                print("\n✗ TEST FAILED: The client RPC should be rejected while the slot is busy")
+                return False
+            except grpc.RpcError as e:
+                hint = retry_after(e)
+                print(f"   {e.code()} after {time.time() - start:.3f}s, retry after {hint}s")
+                if e.code() != grpc.StatusCode.RESOURCE_EXHAUSTED or hint is None or time.time() - start > 1:
+                    print("\n✗ TEST FAILED: Expected a fast RESOURCE_EXHAUSTED with a retry-after hint")
+                    return False
+            
+            try:
+                stub.ReadIndex(raft_pb2.ReadIndexRequest(requester_id="follower"), timeout=5)
+                print("\n✗ TEST FAILED: ReadIndex should need a client slot too")
+                return False
+            except grpc.RpcError as e:
+                print(f"   ReadIndex: {e.code()}")
+                if e.code() != grpc.StatusCode.RESOURCE_EXHAUSTED:
+                    print("\n✗ TEST FAILED: ReadIndex should be rejected while the slot is busy")
+                    return False
+            
+            status = stub.GetStatus(raft_pb2.StatusRequest(), timeout=5)
+            print(f"   Status still served: {status.node_id} is {status.role}")
+            
+            print("\n6. Submitting through SmartClient while the slot is busy...")
+            future = client.submit("SET smart yes")
+            time.sleep(0.3)
+            waiting = not future.done()
+            gate.set()
+            result = future.result(timeout=10)
+            print(f"   Waiting while busy: {waiting}, result: {result}, held: {held.result().success}")
+            if not waiting or result != "OK: SET smart=yes":
+                print("\n✗ TEST FAILED: SmartClient should wait and retry after a rejection")
+                return False
+        finally:
+            gate.set()
+            client.close()
+            channel.close()
+            server.stop()
+        
+        print("\n" + "=" * 70)
+        print("✓ TEST PASSED: Overloaded leaders reject client requests quickly")
+        print("=" * 70 + "\n")
+        
+        return True
+    finally:
+        nodes.cleanup()
+
+if __name__ == "__main__":
+    success = test_admission()
+    sys.exit(0 if success else 1)
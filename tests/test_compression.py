@@ -0,0 +1,99 @@
+"""
+Test: AppendEntries Compression
+Verifies that large batches are compressed and replicated intact while
+heartbeats and small batches are sent as is
+(runs in-process, no cluster needed)
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'proto'))
+import raft_pb2
+
+from cluster_helper import TempNodes
+from compression import compress_entries
+from metrics import MetricsRegistry, NodeMetrics
+
+def make_request(prev_index, commands):
+    """AppendEntries request in term 1 carrying the given commands"""
+    return raft_pb2.AppendEntriesRequest(
+        term=1,
+        leader_id="leader",
+        prev_log_index=prev_index,
+        prev_log_term=1 if prev_index else 0,
+        entries=[raft_pb2.LogEntry(term=1, command=c, index=prev_index + i)
+                 for i, c in enumerate(commands, 1)],
+        leader_commit=0
+    )
+
+def decisions(metrics):
+    """Current compression decision counts"""
+    return {name: counter.value for name, counter in metrics.compression_decisions.items()}
+
+def test_compression():
+    """Test compression decisions and follower decoding"""
+    print("\n" + "=" * 70)
+    print("TEST: AppendEntries Compression")
+    print("=" * 70)
+    
+    nodes = TempNodes()
+    try:
+        metrics = NodeMetrics(MetricsRegistry(), "leader")
+        node = nodes.node("follower", {"leader": "localhost:1"})
+        
+        print("\n1. Heartbeat...")
+        request = make_request(0, [])
+        compressed = compress_entries(request, "zlib", 1024, metrics)
+        print(f"   Compressed: {compressed}, decisions: {decisions(metrics)}")
+        if compressed or any(decisions(metrics).values()):
+            print("\n✗ TEST FAILED: Heartbeats must not be measured or compressed")
+            return False
+        
+        print("\n2. Small batch below the threshold...")
+        request = make_request(0, ["SET a 1", "SET b 2"])
+        compressed = compress_entries(request, "zlib", 1024, metrics)
+        response = node.handle_append_entries(request)
+        print(f"   Compressed: {compressed}, follower success: {response.success}")
+        if compressed or not response.success or decisions(metrics)["below_threshold"] != 1:
+            print("\n✗ TEST FAILED: Small batches should be sent as is")
+            return False
+        
+        print("\n3. Large batch (zlib)...")
+        commands = [f"SET key{i} {'value' * 200}" for i in range(3, 203)]
+        request = make_request(2, commands)
+        raw_size = request.ByteSize()
+        compressed = compress_entries(request, "zlib", 1024, metrics)
+        response = node.handle_append_entries(request)
+        log = [entry.command for entry in node.state.log[2:]]
+        print(f"   Compressed: {compressed}, {raw_size} -> {request.ByteSize()} bytes, "
+              f"follower success: {response.success}")
+        if not compressed or request.entries or request.ByteSize() * 2 > raw_size:
+            print("\n✗ TEST FAILED: Large repetitive batch should compress at least 2x")
+            return False
+        if not response.success or log != commands:
+            print("\n✗ TEST FAILED: Follower should append the decompressed entries")
+            return False
+        
+        print("\n4. Large batch (gzip) and compression disabled...")
+        commands = [f"SET key{i} {'other' * 200}" for i in range(203, 253)]
+        request = make_request(202, commands)
+        gzipped = compress_entries(request, "gzip", 1024, metrics)
+        response = node.handle_append_entries(request)
+        raw = compress_entries(make_request(0, commands), "none", 0, metrics)
+        print(f"   gzip compressed: {gzipped}, follower success: {response.success}, 'none' compressed: {raw}")
+        if not gzipped or not response.success or node.state.log[-1].command != commands[-1] or raw:
+            print("\n✗ TEST FAILED: gzip batch should round-trip and 'none' should never compress")
+            return False
+        
+        print("\n" + "=" * 70)
+        print("✓ TEST PASSED: Only large batches are compressed, and they replicate intact")
+        print("=" * 70 + "\n")
+        
+        return True
+    finally:
+        nodes.cleanup()
+
+if __name__ == "__main__":
+    success = test_compression()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,124 @@
+"""
+Test: Durability Policy
+Verifies atomic file replacement, when each durability mode fsyncs, and
+that batch mode group-commits the latest content of each file
+(runs in-process, no cluster needed)
+"""
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from cluster_helper import TempNodes
+from durability import DurabilityPolicy
+from raft_state import RaftState
+from kvstore import KeyValueStore
+
+class UnsyncedPolicy(DurabilityPolicy):
+    """Durability policy whose fsyncs fail once failing is set, like a write lost in a crash"""
+    
+    failing = False
+    
+    def _fsync(self, fd):
+        if self.failing:
+            raise OSError("fsync failed")
+        super()._fsync(fd)
+
+def test_durability():
+    """Test the always, batch and none durability modes"""
+    print("\n" + "=" * 70)
+    print("TEST: Durability Policy")
+    print("=" * 70)
+    
+    nodes = TempNodes()
+    try:
+        print("\n1. Saving with durability 'always'...")
+        data_dir = nodes.data_dir()
+        policy = DurabilityPolicy("node1", "always")
+        state = RaftState("node1", data_dir, durability=policy)
+        for i in range(5):
+            state.append_log(1, f"SET key{i} value")
+        fsyncs = policy.get_stats()["fsyncs"]
+        leftovers = [name for name in os.listdir(data_dir) if name.endswith(".tmp")]
+        print(f"   fsyncs: {fsyncs}, temp files left: {leftovers}")
+        if fsyncs != 10 or leftovers:
+            print("\n✗ TEST FAILED: Every save should fsync the file and its directory")
+            return False
+        
+        print("\n2. Loading after a crash mid-save (a stray temp file)...")
+        with open(state.state_file + ".tmp", "w") as f:
+            f.write('{"current_term": 9, "log": [')
+        reloaded = RaftState("node1", data_dir, durability=policy)
+        print(f"   term: {reloaded.current_term}, log length: {len(reloaded.log)}")
+        if reloaded.current_term != 0 or len(reloaded.log) != 5:
+            print("\n✗ TEST FAILED: A torn temp file must not replace the saved state")
+            return False
+        
+        print("\n3. Saving 50 times with durability 'batch'...")
+        policy = DurabilityPolicy("node2", "batch", batch_interval=0.05)
+        store = KeyValueStore("node2", nodes.data_dir(), durability=policy)
+        for i in range(50):
+            store.apply_command(f"SET key{i} value")
+        immediate = policy.get_stats()["fsyncs"]
+        on_disk = os.path.exists(store.db_file)
+        time.sleep(0.3)
+        grouped = policy.get_stats()["fsyncs"]
+        policy.close()
+        reloaded = KeyValueStore("node2", store.data_dir, durability=policy)
+        print(f"   fsyncs right after saving: {immediate} (file on disk: {on_disk}), "
+              f"after the flush interval: {grouped}, keys after the last commit: {len(reloaded.data)}")
+        if immediate != 0 or on_disk or not 0 < grouped <= 6:
+            print("\n✗ TEST FAILED: Batch mode should write and fsync the latest content once per interval")
+            return False
+        if len(reloaded.data) != 50:
+            print("\n✗ TEST FAILED: Closing should commit the queued saves")
+            return False
+        
+        print("\n4. Failing the fsync of a group commit with durability 'batch'...")
+        path = os.path.join(nodes.data_dir(), "file")
+        policy = UnsyncedPolicy("node2", "batch", batch_interval=60.0)
+        policy.write(path, "old", now=True)
+        policy.write(path, "new")
+        policy.failing = True
+        try:
+            policy.flush()
+        finally:
+            policy.failing = False
+            policy.close()
+        with open(path) as f:
+            content = f.read()
+        print(f"   Content: {content}")
+        if content != "old":
+            print("\n✗ TEST FAILED: Unsynced content must not replace the old file")
+            return False
+        
+        print("\n5. Saving with durability 'none'...")
+        policy = DurabilityPolicy("node3", "none")
+        store = KeyValueStore("node3", nodes.data_dir(), durability=policy)
+        store.apply_command("SET key value")
+        reloaded = KeyValueStore("node3", store.data_dir, durability=policy)
+        print(f"   fsyncs: {policy.get_stats()['fsyncs']}, reloaded value: {reloaded.get('key')}")
+        if policy.get_stats()["fsyncs"] != 0 or reloaded.get("key") != "value":
+            print("\n✗ TEST FAILED: Mode 'none' should save without fsync")
+            return False
+        
+        print("\n6. Rejecting an unknown mode...")
+        try:
+            DurabilityPolicy("node4", "sometimes")
+            print("\n✗ TEST FAILED: Unknown modes should raise ValueError")
+            return False
+        except ValueError as e:
+            print(f"   {e}")
+        
+        print("\n" + "=" * 70)
+        print("✓ TEST PASSED: Saves are atomic and fsynced per the durability mode")
+        print("=" * 70 + "\n")
+        
+        return True
+    finally:
+        nodes.cleanup()
+
+if __name__ == "__main__":
+    success = test_durability()
+    sys.exit(0 if success else 1)
@@ -10,8 +10,10 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
 
 import grpc
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'proto'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 import raft_pb2
 import raft_pb2_grpc
+from transport import get_channel_pool
 
 def test_follower_failure():
     """Test follower failure and recovery"""
@@ -34,7 +36,7 @@ def test_follower_failure():
     test_node = nodes[0][1]  # Use first node
     
     try:
-        channel = grpc.insecure_channel(test_node)
+        channel = get_channel_pool().channel(test_node)
         stub = raft_pb2_grpc.RaftServiceStub(channel)
         
         for i in range(3):
@@ -53,7 +55,7 @@ def test_follower_failure():
     
     print("\n4. Testing cluster with failed followers...")
     try:
-        channel = grpc.insecure_channel(test_node)
+        channel = get_channel_pool().channel(test_node)
         stub = raft_pb2_grpc.RaftServiceStub(channel)
         
         request = raft_pb2.ClientRequest(command="SET during_failure test_value")
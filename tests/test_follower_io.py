@@ -0,0 +1,83 @@
+"""
+Test: Follower Disk I/O
+Verifies that heartbeats and already-present entries cause no disk writes
+(runs in-process, no cluster needed)
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'proto'))
+import raft_pb2
+
+from cluster_helper import TempNodes
+
+def append_entries(node, term, prev_index, prev_term, entries, commit):
+    """Deliver an AppendEntries request from 'leader' to the node"""
+    request = raft_pb2.AppendEntriesRequest(
+        term=term,
+        leader_id="leader",
+        prev_log_index=prev_index,
+        prev_log_term=prev_term,
+        entries=[raft_pb2.LogEntry(term=t, command=c, index=i) for i, t, c in entries],
+        leader_commit=commit
+    )
+    return node.handle_append_entries(request)
+
+def test_follower_io():
+    """Test that the follower hot path persists only real changes"""
+    print("\n" + "=" * 70)
+    print("TEST: Follower Disk I/O")
+    print("=" * 70)
+    
+    nodes = TempNodes()
+    try:
+        node = nodes.node("follower", {"leader": "localhost:1"})
+        
+        print("\n1. First heartbeat from a new leader (term 1)...")
+        append_entries(node, 1, 0, 0, [], 0)
+        writes = node.state.get_io_stats()["state_writes"]
+        print(f"   State writes: {writes}")
+        if writes != 1:
+            print("\n✗ TEST FAILED: Term change should be persisted exactly once")
+            return False
+        
+        print("\n2. Replicating two entries...")
+        response = append_entries(node, 1, 0, 0, [(1, 1, "SET a 1"), (2, 1, "SET b 2")], 0)
+        writes = node.state.get_io_stats()["state_writes"]
+        print(f"   Success: {response.success}, state writes: {writes}")
+        if not response.success or writes != 2:
+            print("\n✗ TEST FAILED: New entries should be persisted in one write")
+            return False
+        
+        print("\n3. Sending 100 heartbeats and a duplicate batch...")
+        before = node.state.get_io_stats()
+        for _ in range(100):
+            append_entries(node, 1, 2, 1, [], 1)
+        append_entries(node, 1, 0, 0, [(1, 1, "SET a 1"), (2, 1, "SET b 2")], 1)
+        after = node.state.get_io_stats()
+        print(f"   State writes: {before['state_writes']} -> {after['state_writes']}")
+        if after != before:
+            print("\n✗ TEST FAILED: Heartbeats and duplicate entries must not write to disk")
+            return False
+        
+        print("\n4. Conflicting entry from a newer term...")
+        response = append_entries(node, 2, 1, 1, [(2, 2, "SET b 3")], 2)
+        writes = node.state.get_io_stats()["state_writes"]
+        entry = node.state.get_log_entry(2)
+        print(f"   Success: {response.success}, entry 2: {entry}, state writes: {writes}")
+        if not response.success or entry.term != 2 or writes != after["state_writes"] + 2:
+            print("\n✗ TEST FAILED: Term change and log replacement should each be persisted")
+            return False
+        
+        print("\n" + "=" * 70)
+        print("✓ TEST PASSED: Follower heartbeat path does zero disk writes")
+        print("=" * 70 + "\n")
+        
+        return True
+    finally:
+        nodes.cleanup()
+
+if __name__ == "__main__":
+    success = test_follower_io()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,167 @@
+"""
+Test: Proposal Forwarding
+Verifies that followers started with forward_proposals forward client
+commands to the leader and relay its response, hold commands during an
+election instead of rejecting them, and never resend a forward the leader
+may have received
+(runs in-process on local ports 7321-7323, no cluster needed)
+"""
+import sys
+import os
+import time
+
+import grpc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'proto'))
+
+import raft_pb2
+import raft_pb2_grpc
+from raft_state import NodeState
+from transport import Transport, TransportError
+from cluster_helper import TempNodes, start_nodes, stop_nodes
+
+PORTS = {"node1": 7321, "node2": 7322, "node3": 7323}
+
+class FailedCall(grpc.RpcError, grpc.Call):
+    """A gRPC failure with the given status code"""
+    
+    def __init__(self, code):
+        self._code = code
+    
+    def code(self):
+        return self._code
+    
+    def details(self):
+        return self._code.name
+    
+    def initial_metadata(self):
+        return ()
+    
+    def trailing_metadata(self):
+        return ()
+    
+    def is_active(self):
+        return False
+    
+    def time_remaining(self):
+        return None
+    
+    def cancel(self):
+        return False
+    
+    def add_callback(self, callback):
+        return False
+
+class FailingTransport(Transport):
+    """Fails every call with the given status code, counting the attempts"""
+    
+    def __init__(self, code):
+        super().__init__()
+        self.code = code
+        self.calls = 0
+    
+    def connect(self, peer_id, address):
+        pass
+    
+    def call(self, peer_id, method, request, timeout):
+        self.calls += 1
+        raise TransportError(f"{method} to {peer_id} failed") from FailedCall(self.code)
+
+def forward_failing(nodes, code):
+    """Submit through a follower whose forwards fail with code; returns (response, attempts)"""
+    transport = FailingTransport(code)
+    node = nodes.node("follower", {"leader": "localhost:1"}, transport=transport, forward_proposals=True)
+    node.forward_hold = 0.3
+    node.state.become_follower(1, "leader")
+    response = node.handle_submit_command(raft_pb2.ClientRequest(command="SET once value"))
+    return response, transport.calls
+
+def wait_for_leader(nodes, timeout=10):
+    """Wait until one of the nodes is leader"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        for node in nodes:
+            if node.state.state == NodeState.LEADER:
+                return node
+        time.sleep(0.05)
+    return None
+
+def test_forwarding():
+    """Test forwarding through a follower, also across a leader change"""
+    print("\n" + "=" * 70)
+    print("TEST: Proposal Forwarding")
+    print("=" * 70)
+    
+    nodes = start_nodes(PORTS, forward_proposals=True)
+    channels = {node_id: grpc.insecure_channel(f"localhost:{port}") for node_id, port in PORTS.items()}
+    stubs = {node_id: raft_pb2_grpc.RaftServiceStub(channel) for node_id, channel in channels.items()}
+    try:
+        leader = wait_for_leader(nodes.values())
+        if leader is None:
+            print("\n✗ TEST FAILED: No leader elected")
+            return False
+        follower = next(node for node in nodes.values() if node is not leader)
+        
+        print(f"\n1. Submitting a command to follower {follower.node_id}...")
+        response = stubs[follower.node_id].SubmitCommand(
+            raft_pb2.ClientRequest(command="SET forwarded yes"), timeout=10)
+        print(f"   success: {response.success}, message: {response.message}")
+        with leader.state.lock:
+            commands = [entry.command for entry in leader.state.log]
+        if not response.success or "SET forwarded yes" not in commands:
+            print("\n✗ TEST FAILED: The follower should forward the command to the leader")
+            return False
+        
+        print(f"\n2. Submitting a session batch to follower {follower.node_id}...")
+        request = raft_pb2.ClientBatchRequest(commands=["SET a 1", "SET b 2"], client_id="fwd",
+                                              first_sequence=1)
+        response = stubs[follower.node_id].SubmitBatch(request, timeout=10)
+        print(f"   success: {response.success}, results: {list(response.results)}")
+        if not response.success or list(response.results) != ["OK: SET a=1", "OK: SET b=2"]:
+            print("\n✗ TEST FAILED: The leader's results should be relayed to the client")
+            return False
+        if follower.metrics.forwarded_proposals.value != 2:
+            print("\n✗ TEST FAILED: The follower should count both forwarded requests")
+            return False
+        
+        print(f"\n3. Stopping leader {leader.node_id} and submitting to {follower.node_id} right away...")
+        leader.stop()
+        leader.transport.isolate(PORTS)
+        start = time.time()
+        response = stubs[follower.node_id].SubmitCommand(
+            raft_pb2.ClientRequest(command="SET during election"), timeout=20)
+        print(f"   success: {response.success} after {time.time() - start:.2f}s, message: {response.message}")
+        if not response.success:
+            print("\n✗ TEST FAILED: The command should be held until a new leader is elected")
+            return False
+    finally:
+        for channel in channels.values():
+            channel.close()
+        stop_nodes(nodes)
+    
+    print("\n4. Forwarding to a leader that times out or is unavailable...")
+    temp_nodes = TempNodes()
+    try:
+        timed_out, timed_out_calls = forward_failing(temp_nodes, grpc.StatusCode.DEADLINE_EXCEEDED)
+        unavailable, unavailable_calls = forward_failing(temp_nodes, grpc.StatusCode.UNAVAILABLE)
+    finally:
+        temp_nodes.cleanup()
+    print(f"   Timed out: {timed_out_calls} attempt(s), {timed_out.message}")
+    print(f"   Unavailable: {unavailable_calls} attempts, {unavailable.message}")
+    if timed_out_calls != 1 or timed_out.success or "may have been applied" not in timed_out.message:
+        print("\n✗ TEST FAILED: A forward that may have reached the leader must not be sent again")
+        return False
+    if unavailable_calls < 2 or unavailable.success:
+        print("\n✗ TEST FAILED: A forward the leader never received should be retried until the hold ends")
+        return False
+    
+    print("\n" + "=" * 70)
+    print("✓ TEST PASSED: Followers forward commands to the leader")
+    print("=" * 70 + "\n")
+    
+    return True
+
+if __name__ == "__main__":
+    success = test_forwarding()
+    sys.exit(0 if success else 1)
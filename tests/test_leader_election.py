@@ -10,8 +10,10 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
 
 import grpc
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'proto'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 import raft_pb2
 import raft_pb2_grpc
+from transport import get_channel_pool
 
 def test_leader_election():
     """Test that a leader is elected"""
@@ -36,7 +38,7 @@ def test_leader_election():
     
     for node_id, addr in nodes:
         try:
-            channel = grpc.insecure_channel(addr)
+            channel = get_channel_pool().channel(addr)
             stub = raft_pb2_grpc.RaftServiceStub(channel)
             
             # Try to submit a command to see if it's the leader
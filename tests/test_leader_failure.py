@@ -12,14 +12,16 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
 
 import grpc
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'proto'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 import raft_pb2
 import raft_pb2_grpc
+from transport import get_channel_pool
 
 def find_leader(nodes):
     """Find the current leader"""
     for node_id, addr in nodes:
         try:
-            channel = grpc.insecure_channel(addr)
+            channel = get_channel_pool().channel(addr)
             stub = raft_pb2_grpc.RaftServiceStub(channel)
             
             request = raft_pb2.ClientRequest(command="GET test")
@@ -82,7 +84,7 @@ def test_leader_failure():
     
     print("\n5. Testing cluster functionality...")
     try:
-        channel = grpc.insecure_channel(new_leader_addr)
+        channel = get_channel_pool().channel(new_leader_addr)
         stub = raft_pb2_grpc.RaftServiceStub(channel)
         
         request = raft_pb2.ClientRequest(command="SET test_after_failure success")
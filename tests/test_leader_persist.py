@@ -0,0 +1,79 @@
+"""
+Test: Leader Persistence
+Verifies that the leader replicates new entries while its own disk write
+is still running, and counts itself toward the quorum and applies the
+entries only once the write has finished
+(runs in-process, no cluster needed)
+"""
+import sys
+import os
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from cluster_helper import TempNodes
+
+def test_leader_persist():
+    """Test that the leader's disk write overlaps replication"""
+    print("\n" + "=" * 70)
+    print("TEST: Leader Persistence")
+    print("=" * 70)
+    
+    nodes = TempNodes()
+    try:
+        node = nodes.leader("leader", {"p1": "localhost:1", "p2": "localhost:2"})
+        
+        # Hold the leader's disk writes until released
+        disk = threading.Event()
+        write = node.durability.write
+        node.durability.write = lambda path, content: disk.wait(10) and write(path, content)
+        
+        print("\n1. Proposing a command while the leader's disk is slow...")
+        proposer = threading.Thread(target=node.propose, args=("SET key value",))
+        proposer.start()
+        proposer.join(0.2)
+        request, _, num_entries = node._build_append_entries("p1")
+        print(f"   Entries ready for p1: {num_entries}, leader's durable index: {node.state.durable_index}")
+        if num_entries != 1 or node.state.durable_index != 0:
+            print("\n✗ TEST FAILED: The entry should be sent before the leader's write finishes")
+            return False
+        
+        print("\n2. One follower acknowledges...")
+        with node.state.lock:
+            node.state.match_index["p1"] = 1
+        node._advance_commit_index()
+        print(f"   Commit index: {node.state.commit_index}")
+        if node.state.commit_index != 0:
+            print("\n✗ TEST FAILED: The leader must not count itself before its write finishes")
+            return False
+        
+        print("\n3. The other follower acknowledges too...")
+        with node.state.lock:
+            node.state.match_index["p2"] = 1
+        node._advance_commit_index()
+        node._apply_ready()
+        print(f"   Commit index: {node.state.commit_index}, last applied: {node.state.last_applied}")
+        if node.state.commit_index != 1 or node.state.last_applied != 0 or node.kvstore.get("key") is not None:
+            print("\n✗ TEST FAILED: The leader must not apply entries that are not on its disk")
+            return False
+        
+        print("\n4. The leader's write finishes...")
+        disk.set()
+        proposer.join(5)
+        node._apply_ready()
+        print(f"   Durable index: {node.state.durable_index}, last applied: {node.state.last_applied}")
+        if node.state.durable_index != 1 or node.state.last_applied != 1 or node.kvstore.get("key") != "value":
+            print("\n✗ TEST FAILED: The entry should be applied once the leader's write finishes")
+            return False
+        
+        print("\n" + "=" * 70)
+        print("✓ TEST PASSED: Leader writes its log in parallel with replication")
+        print("=" * 70 + "\n")
+        
+        return True
+    finally:
+        nodes.cleanup()
+
+if __name__ == "__main__":
+    success = test_leader_persist()
+    sys.exit(0 if success else 1)
@@ -10,8 +10,10 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
 
 import grpc
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'proto'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 import raft_pb2
 import raft_pb2_grpc
+from transport import get_channel_pool
 
 def test_log_replication():
     """Test that commands are replicated"""
@@ -41,7 +43,7 @@ def test_log_replication():
     submitted = False
     for node_addr in nodes:
         try:
-            channel = grpc.insecure_channel(node_addr)
+            channel = get_channel_pool().channel(node_addr)
             stub = raft_pb2_grpc.RaftServiceStub(channel)
             
             for cmd in commands:
@@ -74,7 +76,7 @@ def test_log_replication():
     replication_success = 0
     for node_addr in nodes:
         try:
-            channel = grpc.insecure_channel(node_addr)
+            channel = get_channel_pool().channel(node_addr)
             stub = raft_pb2_grpc.RaftServiceStub(channel)
             
             request = raft_pb2.ClientRequest(command=f"GET {test_key}")
@@ -0,0 +1,162 @@
+"""
+Test: Multi-Raft
+Verifies that the hash and range routers map keys to groups, that a
+MultiRaftNode only serves keys its group owns, and that the heartbeats of
+all groups led by a node go out as one BatchAppendEntries per peer, with
+at most one batch in flight per peer, and that stopping closes each
+group's value log
+(runs in-process, no cluster needed)
+"""
+import sys
+import os
+import re
+import time
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'proto'))
+import raft_pb2
+
+from cluster_helper import TempNodes
+from multi_raft import MultiRaftNode
+from router import HashRouter, RangeRouter, key_of
+from transport import Transport
+
+NUM_GROUPS = 4
+
+class LocalTransport(Transport):
+    """Delivers RPCs to in-process nodes on timer threads, counting them per peer"""
+    
+    def __init__(self, nodes, delays):
+        super().__init__()
+        self.nodes = nodes
+        self.delays = delays
+        self.sent = {peer_id: [] for peer_id in delays}
+    
+    def connect(self, peer_id, address):
+        pass
+    
+    def send(self, peer_id, method, request, timeout, callback):
+        self.sent[peer_id].append(method)
+        handler = getattr(self.nodes[peer_id], "handle_" + re.sub(r"(?<!^)(?=[A-Z])", "_", method).lower())
+        threading.Timer(self.delays[peer_id], lambda: callback(handler(request))).start()
+
+def make_cluster(temp_nodes, delays):
+    """Create node a leading every group, with followers b and c answering after the given delays"""
+    nodes = {}
+    transport = LocalTransport(nodes, delays)
+    for node_id in ["a", "b", "c"]:
+        peers = {peer_id: "localhost:0" for peer_id in ["a", "b", "c"] if peer_id != node_id}
+        nodes[node_id] = temp_nodes.add(MultiRaftNode(node_id, "localhost", 0, peers, NUM_GROUPS,
+                                                      data_dir=temp_nodes.data_dir(),
+                                                      transport=transport if node_id == "a" else None))
+        for group in nodes[node_id].groups.values():
+            group.state.update_term(1)
+    for group in nodes["a"].groups.values():
+        group.state.become_leader(group.peer_ids)
+    return nodes, transport
+
+def heartbeat_round(node):
+    """Start a coalesced heartbeat round for every group due one"""
+    node.replicate_event.set()
+    due = [group for group in node.groups.values() if group._begin_heartbeat_round()]
+    node._send_heartbeat_round(due)
+    return due
+
+def test_multi_raft():
+    """Test key routing and coalesced heartbeats"""
+    print("\n" + "=" * 70)
+    print("TEST: Multi-Raft")
+    print("=" * 70)
+    
+    nodes = TempNodes()
+    try:
+        print("\n1. Routing keys with the hash and range routers...")
+        hashed = HashRouter(NUM_GROUPS)
+        spread = [hashed.group_for(f"key{i}") for i in range(1000)]
+        counts = [spread.count(group_id) for group_id in range(NUM_GROUPS)]
+        ranged = RangeRouter(["g", "p"])
+        owners = [ranged.group_for(key) for key in ["apple", "g", "kiwi", "p", "zebra"]]
+        print(f"   Hash spread: {counts}, range owners: {owners}")
+        if min(counts) < 200 or spread != [hashed.group_for(f"key{i}") for i in range(1000)]:
+            print("\n✗ TEST FAILED: The hash router should spread keys evenly and stably")
+            return False
+        if owners != [0, 1, 1, 2, 2] or key_of("SET k v w") != "k" or key_of("STATUS") != "":
+            print("\n✗ TEST FAILED: The range router should give split keys to the group above them")
+            return False
+        try:
+            RangeRouter(["p", "g"])
+            print("\n✗ TEST FAILED: Unsorted range splits should be rejected")
+            return False
+        except ValueError as e:
+            print(f"   Unsorted splits: {e}")
+        
+        print("\n2. Sending commands to the wrong group...")
+        cluster, transport = make_cluster(nodes, {"b": 0.0, "c": 0.0})
+        leader = cluster["a"]
+        owner = leader.router.group_for("user1")
+        wrong = (owner + 1) % NUM_GROUPS
+        submitted = leader.handle_submit_command(raft_pb2.ClientRequest(command="SET user1 x", group_id=wrong))
+        read = leader.handle_read(raft_pb2.ReadRequest(key="user1", group_id=wrong))
+        print(f"   Submit: {submitted.message}, read: {read.message}")
+        if submitted.success or submitted.group_id != owner or read.success or read.group_id != owner:
+            print("\n✗ TEST FAILED: Commands for keys of another group should name the owner")
+            return False
+        
+        print("\n3. Replicating writes to every group with coalesced heartbeats...")
+        for i in range(20):
+            key = f"user{i}"
+            leader.groups[leader.router.group_for(key)].propose(f"SET {key} {i}")
+        heartbeat_round(leader)
+        time.sleep(0.2)
+        heartbeat_round(leader)
+        time.sleep(0.2)
+        committed = [group.state.commit_index for group in leader.groups.values()]
+        logs = [len(group.state.log) for group in cluster["b"].groups.values()]
+        print(f"   RPCs to b: {transport.sent['b']}, commit indexes: {committed}, b's logs: {logs}")
+        if transport.sent["b"] != ["BatchAppendEntries"] * 2:
+            print("\n✗ TEST FAILED: Each round should send one BatchAppendEntries per peer")
+            return False
+        if logs != [len(group.state.log) for group in leader.groups.values()] or sum(committed) != 20:
+            print("\n✗ TEST FAILED: Every group's entries should replicate and commit")
+            return False
+        
+        print("\n4. Sending rounds while peer c answers slowly...")
+        cluster, transport = make_cluster(nodes, {"b": 0.0, "c": 0.3})
+        leader = cluster["a"]
+        start = time.time()
+        for _ in range(3):
+            heartbeat_round(leader)
+            time.sleep(0.01)
+        elapsed = time.time() - start
+        time.sleep(0.4)
+        print(f"   Rounds sent in {elapsed:.2f}s, RPCs to b: {len(transport.sent['b'])}, "
+              f"to c: {len(transport.sent['c'])}")
+        if elapsed > 0.25 or len(transport.sent["b"]) != 3:
+            print("\n✗ TEST FAILED: A slow peer should not hold up the heartbeat sender")
+            return False
+        if len(transport.sent["c"]) != 1 or leader.inflight:
+            print("\n✗ TEST FAILED: At most one batch should be in flight per peer")
+            return False
+        
+        print("\n5. Stopping a node whose groups keep value logs...")
+        node = nodes.add(MultiRaftNode("a", "localhost", 0, {}, NUM_GROUPS,
+                                       data_dir=os.path.join(nodes.data_dir(), "data"), value_log_threshold=1024))
+        node.stop()
+        closed = [group.value_log.file.closed for group in node.groups.values()]
+        print(f"   Value logs closed: {closed}")
+        if not all(closed):
+            print("\n✗ TEST FAILED: Stopping should close every group's value log")
+            return False
+        
+        print("\n" + "=" * 70)
+        print("✓ TEST PASSED: Keys are routed and heartbeats coalesced per peer")
+        print("=" * 70 + "\n")
+        
+        return True
+    finally:
+        nodes.cleanup()
+
+if __name__ == "__main__":
+    success = test_multi_raft()
+    sys.exit(0 if success else 1)
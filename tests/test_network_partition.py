@@ -10,13 +10,15 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
 
 import grpc
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'proto'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 import raft_pb2
 import raft_pb2_grpc
+from transport import get_channel_pool
 
 def isolate_nodes(node_addr, isolated_from):
     """Tell a node to isolate from others"""
     try:
-        channel = grpc.insecure_channel(node_addr)
+        channel = get_channel_pool().channel(node_addr)
         stub = raft_pb2_grpc.RaftServiceStub(channel)
         
         request = raft_pb2.IsolateRequest(isolated_nodes=isolated_from)
@@ -52,7 +54,7 @@ def test_network_partition():
     
     print("\n2. Submitting commands before partition...")
     try:
-        channel = grpc.insecure_channel(group_a[0][1])
+        channel = get_channel_pool().channel(group_a[0][1])
         stub = raft_pb2_grpc.RaftServiceStub(channel)
         
         request = raft_pb2.ClientRequest(command="SET before_partition initial")
@@ -84,7 +86,7 @@ def test_network_partition():
     
     print("\n5. Testing Group A (majority - should work)...")
     try:
-        channel = grpc.insecure_channel(group_a[0][1])
+        channel = get_channel_pool().channel(group_a[0][1])
         stub = raft_pb2_grpc.RaftServiceStub(channel)
         
         request = raft_pb2.ClientRequest(command="SET partition_test group_a_value")
@@ -99,7 +101,7 @@ def test_network_partition():
     
     print("\n6. Testing Group B (minority - should fail to commit)...")
     try:
-        channel = grpc.insecure_channel(group_b[0][1])
+        channel = get_channel_pool().channel(group_b[0][1])
         stub = raft_pb2_grpc.RaftServiceStub(channel)
         
         request = raft_pb2.ClientRequest(command="SET partition_test group_b_value")
@@ -125,7 +127,7 @@ def test_network_partition():
     
     print("\n9. Testing healed cluster...")
     try:
-        channel = grpc.insecure_channel(group_a[0][1])
+        channel = get_channel_pool().channel(group_a[0][1])
         stub = raft_pb2_grpc.RaftServiceStub(channel)
         
         request = raft_pb2.ClientRequest(command="SET after_partition healed")
@@ -0,0 +1,78 @@
+"""
+Test: Read Index
+Verifies that the leader confirms its leadership for a ReadIndex read with
+all voters at once, answering after the quorum's round-trip instead of the
+sum of every peer's
+(runs in-process, no cluster needed)
+"""
+import sys
+import os
+import time
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'proto'))
+import raft_pb2
+
+from cluster_helper import TempNodes
+from transport import Transport
+
+class DelayedTransport(Transport):
+    """Answers AppendEntries from each peer after a fixed delay (None = never)"""
+    
+    def __init__(self, delays):
+        super().__init__()
+        self.delays = delays
+    
+    def send(self, peer_id, method, request, timeout, callback):
+        delay = self.delays[peer_id]
+        response = raft_pb2.AppendEntriesResponse(term=request.term, success=True)
+        if delay is None:
+            threading.Timer(timeout, callback, [None]).start()
+        else:
+            threading.Timer(delay, callback, [response]).start()
+
+def make_leader(nodes, delays):
+    """Create a leader of a 5-node cluster whose peers answer after the given delays"""
+    peers = {peer_id: f"localhost:{i}" for i, peer_id in enumerate(delays, 1)}
+    return nodes.leader("leader", peers, transport=DelayedTransport(delays))
+
+def test_read_index():
+    """Test that leadership is confirmed in parallel"""
+    print("\n" + "=" * 70)
+    print("TEST: Read Index")
+    print("=" * 70)
+    
+    nodes = TempNodes()
+    try:
+        print("\n1. Confirming with two fast peers (0.2s) and two that never answer...")
+        node = make_leader(nodes, {"p1": 0.2, "p2": 0.2, "p3": None, "p4": None})
+        start = time.time()
+        confirmed = node._confirm_leadership()
+        elapsed = time.time() - start
+        print(f"   Confirmed: {confirmed} in {elapsed:.2f}s")
+        if not confirmed or elapsed > 0.35:
+            print("\n✗ TEST FAILED: Leadership should be confirmed after the quorum's round-trip")
+            return False
+        
+        print("\n2. Confirming with only one peer answering...")
+        node = make_leader(nodes, {"p1": 0.1, "p2": None, "p3": None, "p4": None})
+        start = time.time()
+        confirmed = node._confirm_leadership()
+        elapsed = time.time() - start
+        print(f"   Confirmed: {confirmed} in {elapsed:.2f}s")
+        if confirmed or elapsed > 1.0:
+            print("\n✗ TEST FAILED: Without a quorum, leadership must not be confirmed")
+            return False
+        
+        print("\n" + "=" * 70)
+        print("✓ TEST PASSED: ReadIndex confirms leadership with all voters at once")
+        print("=" * 70 + "\n")
+        
+        return True
+    finally:
+        nodes.cleanup()
+
+if __name__ == "__main__":
+    success = test_read_index()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,93 @@
+"""
+Test: Revisions
+Verifies that every key carries the log index of its last write, that CAS
+writes only when the expected revision matches, and that reads at earlier
+revisions are served from a bounded, compacted history
+(runs in-process, no cluster needed)
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'proto'))
+import raft_pb2
+
+from cluster_helper import TempNodes
+from kvstore import KeyValueStore, RevisionCompacted
+
+def test_revisions():
+    """Test revisions, compare-and-swap and point-in-time reads"""
+    print("\n" + "=" * 70)
+    print("TEST: Revisions")
+    print("=" * 70)
+    
+    nodes = TempNodes()
+    try:
+        data_dir = nodes.data_dir()
+        store = KeyValueStore("store", data_dir, history_window=5)
+        
+        print("\n1. Compare-and-swap against the revision of a key...")
+        store.apply_command("SET cfg v1", index=1)
+        results = [store.apply_command(command, index=index) for index, command in
+                   enumerate(["CAS cfg 1 v2", "CAS cfg 1 v3", "CAS lock 0 me", "CAS lock 0 you"], 2)]
+        for result in results:
+            print(f"   {result}")
+        if results[0] != "OK: CAS cfg=v2 revision 2" or not results[1].startswith("ERROR: CAS cfg revision is 2"):
+            print("\n✗ TEST FAILED: CAS should only write when the revision matches")
+            return False
+        if not results[2].startswith("OK") or not results[3].startswith("ERROR") or store.revision("lock") != 4:
+            print("\n✗ TEST FAILED: CAS with revision 0 should only create new keys")
+            return False
+        
+        print("\n2. Reading cfg at earlier revisions after deleting it...")
+        store.apply_command("DELETE cfg", index=6)
+        versions = [store.get_at("cfg", revision) for revision in range(1, 7)]
+        print(f"   Revisions 1-6: {versions}")
+        if versions != [("v1", 1)] + [("v2", 2)] * 4 + [(None, 0)]:
+            print("\n✗ TEST FAILED: Reads at a revision should see the value as of that index")
+            return False
+        
+        print("\n3. Applying 10 more writes with a history window of 5...")
+        for index in range(7, 17):
+            store.apply_command(f"SET other{index} value", index=index)
+        try:
+            store.get_at("cfg", 3)
+            print("\n✗ TEST FAILED: Revisions before the window should be compacted")
+            return False
+        except RevisionCompacted as e:
+            print(f"   {e}; history holds {len(store.history)} keys")
+        if store.history_horizon != 6 or store.history or store.get_at("cfg", 6) != (None, 0):
+            print("\n✗ TEST FAILED: Compaction should drop versions superseded before the window")
+            return False
+        
+        print("\n4. Restarting the store...")
+        restarted = KeyValueStore("store", data_dir, history_window=5)
+        print(f"   lock revision: {restarted.revision('lock')}, history horizon: {restarted.history_horizon}")
+        if restarted.revision("lock") != 4 or restarted.history_horizon != 16:
+            print("\n✗ TEST FAILED: Revisions should survive a restart")
+            return False
+        
+        print("\n5. Reading through the Read RPC at a revision...")
+        node = nodes.leader("leader", history_window=100)
+        first = node.propose("SET key first")
+        second = node.propose("SET key second")
+        node._apply_ready()
+        old = node.handle_read(raft_pb2.ReadRequest(key="key", revision=first))
+        latest = node.handle_read(raft_pb2.ReadRequest(key="key"))
+        print(f"   At {first}: {old.value} (revision {old.revision}), "
+              f"latest: {latest.value} (revision {latest.revision})")
+        if (old.value, old.revision, latest.value, latest.revision) != ("first", first, "second", second):
+            print("\n✗ TEST FAILED: Read should return the value and revision as of the requested index")
+            return False
+        
+        print("\n" + "=" * 70)
+        print("✓ TEST PASSED: Keys carry revisions for CAS and point-in-time reads")
+        print("=" * 70 + "\n")
+        
+        return True
+    finally:
+        nodes.cleanup()
+
+if __name__ == "__main__":
+    success = test_revisions()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,111 @@
+"""
+Test: Scan
+Verifies that the key-value store's sorted key index follows every SET and
+DELETE, and that range and prefix scans page through exactly the matching
+keys, through the store, the SCAN / PREFIX commands and the Scan RPC
+(runs in-process, no cluster needed)
+"""
+import sys
+import os
+import json
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'proto'))
+
+import raft_pb2
+from cluster_helper import TempNodes
+from kvstore import KeyValueStore
+
+def scan_all(store, **bounds):
+    """Collect every page of a scan, 7 keys at a time"""
+    items, start = [], bounds.pop("start", "")
+    while True:
+        page, start = store.scan(start=start, limit=7, **bounds)
+        items.extend(page)
+        if not start:
+            return items
+
+def test_scan():
+    """Test the sorted key index and scans"""
+    print("\n" + "=" * 70)
+    print("TEST: Scan")
+    print("=" * 70)
+    
+    nodes = TempNodes()
+    try:
+        print("\n1. Applying 500 random SETs and DELETEs...")
+        rng = random.Random(7)
+        store = KeyValueStore("scan", nodes.data_dir())
+        for i in range(500):
+            key = f"{rng.choice('abc')}{rng.randrange(40)}"
+            store.apply_command(f"DELETE {key}" if rng.random() < 0.3 else f"SET {key} v{i}", index=i + 1)
+        print(f"   {len(store.data)} keys, index in order: {store.sorted_keys == sorted(store.data)}")
+        if store.sorted_keys != sorted(store.data):
+            print("\n✗ TEST FAILED: The sorted key index does not match the data")
+            return False
+        
+        print("\n2. Paging through ranges and prefixes...")
+        expected = sorted(store.data.items())
+        cases = [
+            (dict(prefix="a"), [item for item in expected if item[0].startswith("a")]),
+            (dict(prefix="b1"), [item for item in expected if item[0].startswith("b1")]),
+            (dict(start="a2", end="b3"), [item for item in expected if "a2" <= item[0] < "b3"]),
+            (dict(start="b", prefix="a"), []),
+            (dict(), expected),
+        ]
+        for bounds, matching in cases:
+            items = scan_all(store, **bounds)
+            print(f"   {bounds}: {len(items)} keys")
+            if items != matching:
+                print("\n✗ TEST FAILED: Scan returned the wrong keys")
+                return False
+        
+        print("\n3. Reloading the store...")
+        reloaded = KeyValueStore("scan", store.data_dir)
+        if reloaded.sorted_keys != store.sorted_keys:
+            print("\n✗ TEST FAILED: The index should be rebuilt on load")
+            return False
+        
+        print("\n4. Running SCAN and PREFIX commands...")
+        page = json.loads(store.apply_command("PREFIX a 3")[len("OK: "):])
+        following = json.loads(store.apply_command(f"PREFIX a 3 {page['next']}")[len("OK: "):])
+        scanned = json.loads(store.apply_command("SCAN a2 b3")[len("OK: "):])
+        print(f"   PREFIX a 3: {page}")
+        if page["items"] + following["items"] != [list(item) for item in cases[0][1][:6]]:
+            print("\n✗ TEST FAILED: PREFIX pages should follow each other")
+            return False
+        if scanned["items"] != [list(item) for item in cases[2][1]] or scanned["next"]:
+            print("\n✗ TEST FAILED: SCAN returned the wrong keys")
+            return False
+        error = store.apply_command("SCAN a")
+        print(f"   SCAN a: {error}")
+        if not error.startswith("ERROR"):
+            print("\n✗ TEST FAILED: SCAN without an end should be rejected")
+            return False
+        
+        print("\n5. Scanning through the Scan RPC handler...")
+        node = nodes.node("solo", data_dir=store.data_dir)
+        node.kvstore = reloaded
+        response = node.handle_scan(raft_pb2.ScanRequest(prefix="c", limit=5, consistency="stale"))
+        matching = [item for item in expected if item[0].startswith("c")]
+        print(f"   {len(response.items)} keys, next: {response.next_key}")
+        if [(item.key, item.value) for item in response.items] != matching[:5] or response.next_key != matching[5][0]:
+            print("\n✗ TEST FAILED: Scan RPC returned the wrong page")
+            return False
+        response = node.handle_scan(raft_pb2.ScanRequest(prefix="c", consistency="eventual"))
+        if response.success:
+            print("\n✗ TEST FAILED: Unknown consistency should be rejected")
+            return False
+        
+        print("\n" + "=" * 70)
+        print("✓ TEST PASSED: Scans page through the sorted key index")
+        print("=" * 70 + "\n")
+        
+        return True
+    finally:
+        nodes.cleanup()
+
+if __name__ == "__main__":
+    success = test_scan()
+    sys.exit(0 if success else 1)
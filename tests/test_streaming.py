@@ -0,0 +1,82 @@
+"""
+Test: Streaming Replication
+Verifies that the leader replicates over one stream per follower and falls
+back to unary AppendEntries while a broken stream is re-established
+(runs in-process on local ports 7301-7303, no cluster needed)
+"""
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from raft_state import NodeState
+from cluster_helper import start_nodes, stop_nodes
+
+PORTS = {"node1": 7301, "node2": 7302, "node3": 7303}
+
+def wait_for(condition, timeout=5.0):
+    """Poll condition until it holds or the timeout expires"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+def test_streaming():
+    """Test replication over streams and the unary fallback"""
+    print("\n" + "=" * 70)
+    print("TEST: Streaming Replication")
+    print("=" * 70)
+    
+    nodes = start_nodes(PORTS)
+    try:
+        print("\n1. Waiting for a leader...")
+        leaders = lambda: [n for n in nodes.values() if n.state.state == NodeState.LEADER]
+        if not wait_for(lambda: len(leaders()) == 1):
+            print("\n✗ TEST FAILED: No leader elected")
+            return False
+        leader = leaders()[0]
+        print(f"   Leader: {leader.node_id}")
+        
+        print("\n2. Replicating 20 entries...")
+        for i in range(20):
+            leader.propose(f"SET key{i} value{i}")
+        committed = wait_for(lambda: all(n.state.commit_index >= 20 for n in nodes.values()))
+        streaming = leader.transport.peer_streaming()
+        print(f"   Committed everywhere: {committed}, streams: {streaming}")
+        if not committed or not all(streaming.values()):
+            print("\n✗ TEST FAILED: Entries should replicate over one stream per follower")
+            return False
+        
+        print("\n3. Breaking one stream...")
+        peer_id = next(iter(streaming))
+        leader.transport.streams[peer_id].call.cancel()
+        fell_back = wait_for(lambda: not leader.transport.peer_streaming()[peer_id], 1.0)
+        for i in range(20, 25):
+            leader.propose(f"SET key{i} value{i}")
+        committed = wait_for(lambda: nodes[peer_id].state.commit_index >= 25, 0.8)
+        print(f"   Fell back to unary: {fell_back}, follower caught up: {committed}")
+        if not fell_back or not committed:
+            print("\n✗ TEST FAILED: Replication should continue over unary calls")
+            return False
+        
+        print("\n4. Waiting for the stream to be re-established...")
+        restored = wait_for(lambda: leader.transport.peer_streaming()[peer_id], 3.0)
+        print(f"   Streaming again: {restored}")
+        if not restored:
+            print("\n✗ TEST FAILED: A new stream should replace the broken one")
+            return False
+    finally:
+        stop_nodes(nodes)
+    
+    print("\n" + "=" * 70)
+    print("✓ TEST PASSED: Replication streams with unary fallback")
+    print("=" * 70 + "\n")
+    
+    return True
+
+if __name__ == "__main__":
+    success = test_streaming()
+    sys.exit(0 if success else 1)
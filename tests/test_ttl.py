@@ -0,0 +1,99 @@
+"""
+Test: Key TTLs
+Verifies that keys set with a TTL expire at the leader's timestamp of their
+SET entry plus the TTL, that the leader deletes them in batched EXPIRE
+entries, and that every replica applying the log ends up with the same keys
+(runs in-process, no cluster needed)
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from cluster_helper import TempNodes
+from kvstore import KeyValueStore
+
+def run(node, rounds=10):
+    """Tick the node until its EXPIRE entries are proposed and applied"""
+    for _ in range(rounds):
+        node.tick()
+
+def test_ttl():
+    """Test deterministic, batched key expiry"""
+    print("\n" + "=" * 70)
+    print("TEST: Key TTLs")
+    print("=" * 70)
+    
+    nodes = TempNodes()
+    try:
+        now = [1000.0]
+        node = nodes.leader("leader", clock=lambda: now[0], max_expiry_batch=1000)
+        
+        print("\n1. Setting a key with a 10s TTL...")
+        node.propose("SET lease holder-1 TTL 10")
+        run(node)
+        before = node.kvstore.get("lease", now[0] + 9)
+        after = node.kvstore.get("lease", now[0] + 10)
+        print(f"   Value after 9s: {before}, after 10s: {after}")
+        if before != "holder-1" or after is not None:
+            print("\n✗ TEST FAILED: The key should read as missing once its TTL has passed")
+            return False
+        
+        print("\n2. Setting 2500 keys with a 5s TTL, one renewed without a TTL...")
+        node.propose_batch([f"SET session{i} marker TTL 5" for i in range(2500)])
+        node.propose("SET session7 kept")
+        node.propose("SET plain value")
+        run(node)
+        entries = len(node.state.log)
+        now[0] += 20
+        run(node)
+        expire_entries = [e.command for e in node.state.log[entries:] if e.command.startswith("EXPIRE")]
+        keys = node.kvstore.get_all()
+        print(f"   EXPIRE entries: {len(expire_entries)}, keys left: {sorted(keys)}")
+        if len(expire_entries) != 3 or max(len(c.split()) - 1 for c in expire_entries) != 1000:
+            print("\n✗ TEST FAILED: 2500 expiries should be proposed in 3 batches of at most 1000 keys")
+            return False
+        if sorted(keys) != ["plain", "session7"] or node.metrics.expired_keys.value != 2500:
+            print("\n✗ TEST FAILED: Only keys whose TTL passed should be deleted")
+            return False
+        
+        print("\n3. Replaying the log on a fresh replica...")
+        replica = KeyValueStore("replica", nodes.data_dir())
+        replica.apply_batch([(e.command, e.client_id, e.sequence, e.acked, e.timestamp, e.index)
+                             for e in node.state.log])
+        print(f"   Replica keys: {sorted(replica.get_all())}")
+        if replica.get_all() != node.kvstore.get_all():
+            print("\n✗ TEST FAILED: Replicas applying the same log should expire the same keys")
+            return False
+        
+        print("\n4. Restarting with a pending TTL...")
+        node.propose("SET later value TTL 30")
+        run(node)
+        restarted = KeyValueStore("leader", node.kvstore.data_dir)
+        due = restarted.due_expiries(now[0] + 31, 100)
+        print(f"   Due after 31s: {due}, heap size: {len(restarted.expiry_heap)}")
+        if due != ["later"]:
+            print("\n✗ TEST FAILED: TTLs should survive a restart")
+            return False
+        
+        print("\n5. Setting values that end in TTL followed by a word...")
+        node.propose("SET callback call TTL later")
+        node.propose("SET note remember the TTL 5")
+        run(node)
+        values = [node.kvstore.get("callback"), node.kvstore.get("note", now[0] + 10)]
+        print(f"   Values: {values}")
+        if values != ["call TTL later", None]:
+            print("\n✗ TEST FAILED: Only a numeric TTL should be taken from the value")
+            return False
+        
+        print("\n" + "=" * 70)
+        print("✓ TEST PASSED: Keys expire deterministically in batched EXPIRE entries")
+        print("=" * 70 + "\n")
+        
+        return True
+    finally:
+        nodes.cleanup()
+
+if __name__ == "__main__":
+    success = test_ttl()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,153 @@
+"""
+Test: Value Log
+Verifies that large values are stored once in the value log, with only
+references in the Raft log and the store, that followers receive the
+values and keep their own copy, that rejected requests write no values,
+that unreferenced values are collected, that values are fsynced before
+references to them are saved in batch mode, and that a reference whose
+value is missing is reported
+(runs in-process, no cluster needed)
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'proto'))
+import raft_pb2
+
+from cluster_helper import TempNodes
+from kvstore import KeyValueStore
+from durability import DurabilityPolicy
+from kvstore import MissingValue
+from value_log import VALUE_REF, ValueLog
+
+def test_value_log():
+    """Test key-value separation for large values"""
+    print("\n" + "=" * 70)
+    print("TEST: Value Log")
+    print("=" * 70)
+    
+    nodes = TempNodes()
+    try:
+        leader = nodes.leader("leader", {"follower": "localhost:1"}, value_log_threshold=1024)
+        follower = nodes.node("follower", {"leader": "localhost:1"}, value_log_threshold=1024)
+        payload = "x" * 8192
+        
+        print("\n1. Proposing an 8 KiB value and a small one...")
+        index = leader.propose(f"SET blob {payload} TTL 3600")
+        leader.propose("SET small value")
+        command = leader.state.get_log_entry(index).command
+        log_size = os.path.getsize(leader.state.state_file)
+        print(f"   Log command: {len(command)} chars, log file: {log_size} bytes, "
+              f"value log: {leader.value_log.size} bytes, uncommitted: {leader.state.uncommitted_bytes} bytes")
+        if VALUE_REF not in command or len(command) > 200 or log_size > 2048:
+            print("\n✗ TEST FAILED: The log should hold a reference, not the value")
+            return False
+        if leader.state.uncommitted_bytes != len(f"SET blob {payload} TTL 3600") + len("SET small value"):
+            print("\n✗ TEST FAILED: Admission should count the values, not their references")
+            return False
+        if leader.state.get_log_entry(index + 1).command != "SET small value":
+            print("\n✗ TEST FAILED: Small values should stay inline")
+            return False
+        
+        print("\n2. Replicating to the follower and applying...")
+        request, _, num_entries = leader._build_append_entries("follower")
+        sent = request.entries[0].command
+        follower.handle_append_entries(request)
+        with leader.state.lock:
+            leader.state.match_index["follower"] = num_entries
+        leader._advance_commit_index()
+        follower.handle_append_entries(leader._build_append_entries("follower")[0])
+        leader._apply_ready()
+        follower._apply_ready()
+        value = follower.kvstore.get("blob")
+        print(f"   Sent: {len(sent)} chars, follower's log command: "
+              f"{len(follower.state.get_log_entry(index).command)} chars, value: {len(value or '')} chars")
+        if payload not in sent or follower.state.get_log_entry(index).command != command:
+            print("\n✗ TEST FAILED: Followers should receive the value and keep the same reference")
+            return False
+        if value != payload or leader.kvstore.get("blob") != payload or VALUE_REF not in leader.kvstore.data["blob"]:
+            print("\n✗ TEST FAILED: Reads should resolve the store's reference")
+            return False
+        
+        print("\n3. Sending a new large value that is rejected...")
+        size = follower.value_log.size
+        rejected = "SET other " + "z" * 8192
+        entry = raft_pb2.LogEntry(term=1, command=rejected, index=index + 2)
+        responses = [
+            follower.handle_append_entries(raft_pb2.AppendEntriesRequest(
+                term=0, leader_id="leader", prev_log_index=index + 1, prev_log_term=1, entries=[entry])),
+            follower.handle_append_entries(raft_pb2.AppendEntriesRequest(
+                term=1, leader_id="leader", prev_log_index=index + 5, prev_log_term=1, entries=[entry])),
+        ]
+        proposed = follower.propose(rejected)
+        print(f"   Accepted: {[r.success for r in responses]}, proposed at: {proposed}, "
+              f"value log: {size} -> {follower.value_log.size} bytes")
+        if any(r.success for r in responses) or proposed is not None or follower.value_log.size != size:
+            print("\n✗ TEST FAILED: Rejected requests must not write to the value log")
+            return False
+        
+        print("\n4. Applying the SET to a store sharing the value log...")
+        store = KeyValueStore("store", nodes.data_dir(), value_log=leader.value_log)
+        results = [store.apply_command(command, timestamp=1.0), store.apply_command("SET small value")]
+        print(f"   Results: {[result[:40] for result in results]}")
+        if results != ["OK: SET blob", "OK: SET small=value"]:
+            print("\n✗ TEST FAILED: Results should leave out values kept in the value log")
+            return False
+        
+        print("\n5. Setting the same value under another key...")
+        size = leader.value_log.size
+        leader.propose(f"SET copy {payload}")
+        print(f"   Value log: {size} -> {leader.value_log.size} bytes")
+        if leader.value_log.size != size:
+            print("\n✗ TEST FAILED: Identical values should be stored once")
+            return False
+        
+        print("\n6. Restarting after a value nothing refers to was written...")
+        leader.value_log.put("y" * 5000)
+        leader.value_log.close()
+        restarted = nodes.node("leader", {"follower": "localhost:1"}, data_dir=leader.kvstore.data_dir,
+                               value_log_threshold=1024)
+        print(f"   Value log: {restarted.value_log.size} bytes, blob: {len(restarted.kvstore.get('blob') or '')} chars, "
+              f"uncommitted: {restarted.state.uncommitted_bytes} bytes")
+        if restarted.value_log.size != size or restarted.kvstore.get("blob") != payload:
+            print("\n✗ TEST FAILED: Garbage should be collected and live values kept")
+            return False
+        if restarted.state.uncommitted_bytes != len(f"SET copy {payload}"):
+            print("\n✗ TEST FAILED: Loaded entries should count their values for admission")
+            return False
+        
+        print("\n7. Syncing in batch mode and reading a missing value...")
+        durability = DurabilityPolicy("batch", "batch", batch_interval=60.0)
+        value_log = ValueLog("batch", os.path.join(nodes.data_dir(), "values.log"), 1024, durability)
+        fsyncs = durability.get_stats()["fsyncs"]
+        ref = value_log.put(payload)
+        value_log.sync()
+        fsyncs = durability.get_stats()["fsyncs"] - fsyncs
+        missing = ref[:-1] + ("0" if ref[-1] != "0" else "1")
+        try:
+            value_log.resolve(missing)
+            error = None
+        except MissingValue as e:
+            error = str(e)
+        print(f"   fsyncs after sync: {fsyncs}, missing value: {error}")
+        value_log.close()
+        durability.close()
+        if fsyncs != 1:
+            print("\n✗ TEST FAILED: Batch mode should fsync values before references are saved")
+            return False
+        if error is None or value_log.resolve(VALUE_REF + "not-a-digest") != VALUE_REF + "not-a-digest":
+            print("\n✗ TEST FAILED: Only a well-formed reference with a missing value should be an error")
+            return False
+        
+        print("\n" + "=" * 70)
+        print("✓ TEST PASSED: Large values are stored once in the value log")
+        print("=" * 70 + "\n")
+        
+        return True
+    finally:
+        nodes.cleanup()
+
+if __name__ == "__main__":
+    success = test_value_log()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,123 @@
+"""
+Test: Watch
+Verifies that Watch streams every applied mutation of a key prefix with its
+log index, resumes from an index after a reconnect, refuses to resume from
+events that are no longer buffered, and disconnects watchers that fall
+behind without slowing down the apply loop
+(runs in-process on local port 7341, no cluster needed)
+"""
+import sys
+import os
+import time
+import threading
+
+import grpc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'proto'))
+
+import raft_pb2
+import raft_pb2_grpc
+from raft_state import NodeState
+from smart_client import SmartClient, ClientError
+from watch import WatchExpired
+from cluster_helper import TempNodes
+
+def collect(events, count):
+    """Take count events from an event iterator in a background thread"""
+    received = []
+    
+    def consume():
+        for event in events:
+            received.append((event.index, event.type, event.key, event.value))
+            if len(received) == count:
+                return
+    
+    thread = threading.Thread(target=consume, daemon=True)
+    thread.start()
+    return thread, received
+
+def test_watch():
+    """Test the Watch change feed"""
+    print("\n" + "=" * 70)
+    print("TEST: Watch")
+    print("=" * 70)
+    
+    nodes = TempNodes()
+    client = SmartClient({"solo": "localhost:7341"})
+    channel = grpc.insecure_channel("localhost:7341")
+    stub = raft_pb2_grpc.RaftServiceStub(channel)
+    try:
+        node = nodes.node("solo", port=7341, watch_capacity=16)
+        node.start()
+        deadline = time.time() + 10
+        while node.state.state != NodeState.LEADER and time.time() < deadline:
+            time.sleep(0.05)
+        
+        print("\n1. Watching prefix 'user:' while writing...")
+        thread, received = collect(client.watch("user:", prefix=True), 3)
+        time.sleep(0.3)
+        for command in ["SET user:1 alice", "SET other x", "SET user:2 bob", "DELETE user:1"]:
+            client.execute(command)
+        thread.join(10)
+        for event in received:
+            print(f"   {event}")
+        if [event[1:] for event in received] != [("SET", "user:1", "alice"), ("SET", "user:2", "bob"),
+                                                 ("DELETE", "user:1", "")]:
+            print("\n✗ TEST FAILED: Expected every mutation of the prefix, in order")
+            return False
+        if [event[0] for event in received] != sorted(event[0] for event in received):
+            print("\n✗ TEST FAILED: Events should carry increasing log indexes")
+            return False
+        
+        print(f"\n2. Resuming from index {received[1][0]}...")
+        call = stub.Watch(raft_pb2.WatchRequest(key="user:", prefix=True, from_index=received[1][0]))
+        resumed = [(event.index, event.type, event.key, event.value) for event in next(call).events]
+        call.cancel()
+        print(f"   {resumed}")
+        if resumed != received[1:]:
+            print("\n✗ TEST FAILED: A resumed watch should replay from the given index")
+            return False
+        
+        print("\n3. Resuming from an index that is no longer buffered...")
+        for i in range(20):
+            client.execute(f"SET filler{i} x")
+        try:
+            next(client.watch("user:", prefix=True, from_index=received[0][0]))
+            print("\n✗ TEST FAILED: Resuming from an evicted index should fail")
+            return False
+        except ClientError as e:
+            print(f"   {e}")
+        
+        print("\n4. Writing while a watcher does not read...")
+        watcher = node.handle_watch(raft_pb2.WatchRequest(key="slow", from_index=node.state.last_applied + 1),
+                                    lambda: True)
+        client.execute("SET slow 1")
+        first = next(watcher).events[0]
+        start = time.time()
+        for i in range(20):
+            client.execute(f"SET slow {i + 2}")
+        elapsed = time.time() - start
+        try:
+            next(watcher)
+            print("\n✗ TEST FAILED: A watcher that fell behind should be disconnected")
+            return False
+        except WatchExpired as e:
+            print(f"   first event at index {first.index}, 20 writes took {elapsed:.2f}s, then: {e}")
+        if node.metrics.watch_disconnects.value != 1:
+            print("\n✗ TEST FAILED: The disconnect should be counted")
+            return False
+    finally:
+        channel.close()
+        client.close()
+        nodes.cleanup()
+    
+    print("\n" + "=" * 70)
+    print("✓ TEST PASSED: Watch streams, resumes and sheds slow watchers")
+    print("=" * 70 + "\n")
+    
+    return True
+
+if __name__ == "__main__":
+    success = test_watch()
+    sys.exit(0 if success else 1)